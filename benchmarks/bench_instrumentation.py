@@ -0,0 +1,71 @@
+"""
+Cost of step instrumentation.
+
+Runs the same chain of trivial sync steps with no hooks, with a no-op
+StepHook and with ``stats=True``. The first case runs the uninstrumented
+loop, so it should match ``bench_sequential.py``'s "sync steps" figure.
+
+    python benchmarks/bench_instrumentation.py [--steps 20] [--runs 20000]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from yaafpy.instrumentation import StepHook
+from yaafpy.sequential_flows import Workflow
+from yaafpy.types import ExecContext
+
+
+def sync_step(ctx):
+    ctx.data += 1
+    return ctx
+
+
+def build(steps: int, stats: bool = False, hook: StepHook = None) -> Workflow:
+    wf = Workflow(stats=stats)
+    for i in range(steps):
+        wf.use(sync_step, name=f"step_{i}")
+    if hook is not None:
+        wf.add_hook(hook)
+    return wf
+
+
+async def measure(runner, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        await runner(ExecContext(data=0))
+    return time.perf_counter() - start
+
+
+async def main(steps: int, runs: int) -> None:
+    # Installed then removed: must compile back to the plain loop
+    removed = StepHook()
+    detached = build(steps, hook=removed).remove_hook(removed)
+
+    cases = (
+        ("no hooks", build(steps)),
+        ("hook removed", detached),
+        ("no-op hook", build(steps, hook=StepHook())),
+        ("stats=True", build(steps, stats=True)),
+    )
+
+    total = steps * runs
+    baseline = None
+    for label, wf in cases:
+        await measure(wf.run, 100)  # warm up and compile
+        elapsed = await measure(wf.run, runs)
+        per_step = elapsed * 1e9 / total
+        baseline = baseline or per_step
+        print(f"{label:<14} {per_step:8.1f} ns/step  x{per_step / baseline:5.2f}  ({runs} runs x {steps} steps)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.steps, args.runs))
@@ -0,0 +1,82 @@
+"""
+Size and allocation cost of execution contexts.
+
+Reports bytes per context (tracemalloc), the time to create and to copy a
+context (the ``middleware`` decorator copies once per step) and run
+throughput with fresh contexts versus contexts recycled by a ContextPool.
+Expect the last two within noise of each other: a CompactExecContext is
+cheap to build, and the pool pays for it with an acquire and a release
+call. The pool saves allocations (GC pressure), not per-run time.
+
+    python benchmarks/bench_memory.py [--count 100000] [--runs 20000]
+"""
+import argparse
+import asyncio
+import copy
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from yaafpy.pool import ContextPool
+from yaafpy.sequential_flows import Workflow
+from yaafpy.types import CompactExecContext, ExecContext
+
+
+def bytes_per_context(cls, count: int) -> float:
+    tracemalloc.start()
+    keep = [cls(data=i) for i in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return current / count
+
+
+def ns_per_op(fn, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - start) * 1e9 / count
+
+
+def step(ctx):
+    ctx.shared_data["seen"] = True
+    return ctx
+
+
+async def runs_per_second(wf: Workflow, acquire, release, runs: int) -> float:
+    start = time.perf_counter()
+    for i in range(runs):
+        ctx = await wf.run(acquire(data=i))
+        if release is not None:
+            release(ctx)
+    return runs / (time.perf_counter() - start)
+
+
+async def main(count: int, runs: int) -> None:
+    for cls in (ExecContext, CompactExecContext):
+        sample = cls(data=0)
+        print(
+            f"{cls.__name__:<20} {bytes_per_context(cls, count):6.0f} B/ctx  "
+            f"new {ns_per_op(cls, count):6.0f} ns  copy {ns_per_op(lambda: copy.copy(sample), count):6.0f} ns"
+        )
+
+    wf = Workflow().use(step)
+    cases = (
+        ("fresh ExecContext", ExecContext, None),
+        ("fresh Compact", CompactExecContext, None),
+        ("pooled Compact", *(lambda pool: (pool.acquire, pool.release))(ContextPool())),
+    )
+    for label, acquire, release in cases:
+        await runs_per_second(wf, acquire, release, 100)  # warm up
+        print(f"{label:<20} {await runs_per_second(wf, acquire, release, runs):10.0f} runs/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--runs", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.count, args.runs))
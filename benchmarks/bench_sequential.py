@@ -0,0 +1,82 @@
+"""
+Per-step overhead of the sequential engine.
+
+Runs a chain of trivial steps, so the numbers are dominated by engine
+overhead. Compares async steps, sync steps (called without a coroutine) and
+sync steps registered with ``jumps=False`` (fused into a single call).
+The nested cases spread the same steps over ``--depth`` workflows chained
+with ``as_middleware``: ``inline=False`` at every level (one nested run per
+level) against the default, all levels inlined into one flat table.
+
+    python benchmarks/bench_sequential.py [--steps 20] [--runs 20000] [--depth 5]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from yaafpy.adapters import as_middleware
+from yaafpy.sequential_flows import Workflow
+from yaafpy.types import ExecContext
+
+
+async def async_step(ctx):
+    ctx.data += 1
+    return ctx
+
+
+def sync_step(ctx):
+    ctx.data += 1
+    return ctx
+
+
+def build(step, steps: int, jumps: bool = True) -> Workflow:
+    wf = Workflow()
+    for i in range(steps):
+        wf.use(step, name=f"step_{i}", jumps=jumps)
+    return wf
+
+
+def build_nested(step, steps: int, depth: int, inline: bool) -> Workflow:
+    per_level = max(steps // depth, 1)
+    wf = build(step, per_level)
+    for _ in range(depth - 1):
+        parent = build(step, per_level)
+        parent.use(as_middleware(wf, inline=inline), name="child")
+        wf = parent
+    return wf
+
+
+async def measure(runner, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        await runner(ExecContext(data=0))
+    return time.perf_counter() - start
+
+
+async def main(steps: int, runs: int, depth: int) -> None:
+    cases = (
+        ("async steps", build(async_step, steps).run),
+        ("sync steps", build(sync_step, steps).run),
+        ("fused sync steps", build(sync_step, steps, jumps=False).run),
+        (f"nested x{depth} (runs)", build_nested(sync_step, steps, depth, inline=False).run),
+        (f"nested x{depth} (inlined)", build_nested(sync_step, steps, depth, inline=True).run),
+    )
+
+    total = steps * runs
+    for label, runner in cases:
+        await measure(runner, 100)  # warm up and compile
+        elapsed = await measure(runner, runs)
+        print(f"{label:<22} {elapsed * 1e9 / total:8.1f} ns/step  ({runs} runs x {steps} steps)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=20000)
+    parser.add_argument("--depth", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.steps, args.runs, args.depth))
@@ -0,0 +1,106 @@
+"""
+Stream throughput against stage count, and per-run startup cost.
+
+Pushes items through chains of trivial ``(item, ctx)`` handlers, so the
+numbers are dominated by per-stage plumbing. Compares one async generator
+per handler (``fuse=False``) with adjacent handlers fused into one loop.
+
+The startup section runs many one-item streams over alternating handlers
+and transforms, with the stage template cached (default) and with every
+stage classified again on each run, as ``_build`` used to do.
+
+    python benchmarks/bench_stream.py [--items 20000] [--stages 1 2 5 10 20] [--runs 20000]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from yaafpy.stream_flows import StreamWorkflow
+from yaafpy.types import ExecContext
+
+
+def sync_handler(item, ctx):
+    return item + 1
+
+
+async def async_handler(item, ctx):
+    return item + 1
+
+
+async def transform(source, ctx):
+    async for item in source:
+        yield item + 1
+
+
+async def source(n: int):
+    for i in range(n):
+        yield i
+
+
+def build(handler, stages: int, fuse: bool) -> StreamWorkflow:
+    wf = StreamWorkflow(fuse=fuse)
+    for i in range(stages):
+        wf.use(handler, name=f"stage_{i}")
+    return wf
+
+
+async def measure(wf: StreamWorkflow, items: int) -> float:
+    start = time.perf_counter()
+    async for _ in wf.run(source(items), ExecContext()):
+        pass
+    return time.perf_counter() - start
+
+
+def build_mixed(stages: int) -> StreamWorkflow:
+    wf = StreamWorkflow()
+    for i in range(stages):
+        wf.use(transform if i % 2 else sync_handler, name=f"stage_{i}")
+    return wf
+
+
+def reclassify(wf: StreamWorkflow) -> None:
+    wf._specs = [spec._replace(is_transform=wf._is_transform(stage)) for stage, spec in zip(wf._middlewares, wf._specs)]
+    wf._templates.clear()
+
+
+async def measure_startup(wf: StreamWorkflow, runs: int, before_run=None) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        if before_run is not None:
+            before_run(wf)
+        async for _ in wf.run(source(1), ExecContext()):
+            pass
+    return time.perf_counter() - start
+
+
+async def main(items: int, stages_list, runs: int) -> None:
+    print(f"{'handlers':<8} {'stages':>6} {'unfused':>14} {'fused':>14} {'speedup':>8}")
+    for label, handler in (("sync", sync_handler), ("async", async_handler)):
+        for stages in stages_list:
+            rates = []
+            for fuse in (False, True):
+                wf = build(handler, stages, fuse)
+                await measure(wf, 100)  # warm up
+                rates.append(items / await measure(wf, items))
+            print(f"{label:<8} {stages:>6} {rates[0]:>10.0f} it/s {rates[1]:>10.0f} it/s {rates[1] / rates[0]:>7.2f}x")
+
+    print(f"\n{'startup':<8} {'stages':>6} {'per-run classify':>17} {'cached':>10} {'speedup':>8}")
+    for stages in stages_list:
+        wf = build_mixed(stages)
+        await measure_startup(wf, 100)  # warm up
+        per_run = await measure_startup(wf, runs, reclassify)
+        cached = await measure_startup(wf, runs)
+        print(f"{'1 item':<8} {stages:>6} {per_run * 1e6 / runs:>12.2f} us/run {cached * 1e6 / runs:>5.2f} us/run {per_run / cached:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--stages", type=int, nargs="+", default=[1, 2, 5, 10, 20])
+    parser.add_argument("--runs", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.stages, args.runs))
@@ -1,14 +1,56 @@
 from .sequential_flows import Workflow
+from .plan import ExecutionPlan
+from .batching import MicroBatcher
+from .parallel import ParallelStep, merge_branches
+from .cache import CachePolicy
+from .checkpoint import CheckpointStore, SQLiteCheckpointStore, FileCheckpointStore
+from .resilience import RetryPolicy, CircuitBreaker, CircuitOpenException
+from .instrumentation import StepHook, StatsCollector
+from .tracing import Tracer, Span, SpanExporter, RingBufferExporter, JsonlFileExporter
 from .stream_flows import StreamWorkflow
-from .types import ExecContext, WorkflowAllowException, WorkflowAbortException, Transform, StreamHandler
+from .dag_flows import DagWorkflow
+from .pool import ContextPool
+from .loops import LoopStep
+from .runner import SyncRunner
+from .resources import ResourcePool
+from .types import ExecContext, ExecContextBase, CompactExecContext, SharedDataOverlay, RunResult, WorkflowAllowException, WorkflowAbortException, WorkflowTimeoutException, WorkflowBudgetException, Transform, StreamHandler
 from .adapters import as_middleware, normalize_step_result
 
 __all__ = [
     "Workflow",
+    "ExecutionPlan",
+    "MicroBatcher",
+    "ParallelStep",
+    "merge_branches",
+    "CachePolicy",
+    "CheckpointStore",
+    "SQLiteCheckpointStore",
+    "FileCheckpointStore",
+    "RetryPolicy",
+    "CircuitBreaker",
+    "CircuitOpenException",
+    "StepHook",
+    "StatsCollector",
+    "Tracer",
+    "Span",
+    "SpanExporter",
+    "RingBufferExporter",
+    "JsonlFileExporter",
     "StreamWorkflow",
+    "DagWorkflow",
     "ExecContext",
+    "ExecContextBase",
+    "CompactExecContext",
+    "ContextPool",
+    "LoopStep",
+    "SyncRunner",
+    "ResourcePool",
+    "SharedDataOverlay",
+    "RunResult",
     "WorkflowAllowException",
     "WorkflowAbortException",
+    "WorkflowTimeoutException",
+    "WorkflowBudgetException",
     "Transform",
     "StreamHandler",
     "as_middleware",
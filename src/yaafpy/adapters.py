@@ -1,6 +1,7 @@
 import logging
 from typing import Callable, Optional, Awaitable,Union,TypeAlias
 from yaafpy.types import ExecContext
+from yaafpy.tracing import WORKFLOW, current_span, enter_span, exit_span, traced_stream
 import inspect
 from typing import AsyncIterator, Any
 
@@ -34,18 +35,25 @@ async def normalize_step_result(result) -> AsyncIterator[Any]:
 
 def as_middleware_stream(workflow: "Workflow", ctx: Optional[ExecContext] = None) -> Middleware:
     async def middleware(ctx: ExecContext):
-        async for out_ctx in workflow.run_stream(ctx):
+        stream = workflow.run_stream(ctx)
+        parent = current_span()
+        if parent is not None:
+            stream = traced_stream(stream, parent, type(workflow).__name__, WORKFLOW)
+        async for out_ctx in stream:
             yield out_ctx
     return middleware
 
 
-def as_middleware(workflow: "Workflow", ctx: Optional[ExecContext] = None) -> Middleware:
+def as_middleware(workflow: "Workflow", ctx: Optional[ExecContext] = None, inline: bool = True) -> Middleware:
     """
     Wraps a Workflow object as a middleware function.
     
     Args:
         workflow: The child workflow to execute.
         exec_ctx: Optional execution context to override/interject (currently unused by default logic).
+        inline: Let ``Workflow.compile()`` inline the child's steps into the parent.
+            The wrapper (and its log lines) only runs when the child is not inlined.
+            Traced parents never inline, so the child keeps its spans.
     Returns:
         A middleware function compatible with the workflow engine.
     """
@@ -60,14 +68,22 @@ def as_middleware(workflow: "Workflow", ctx: Optional[ExecContext] = None) -> Mi
         # However, middleware typically acts on the flow's context.
         # We will use the runtime `ctx` to maintain continuity.
         
-        logger.info(f"[Trace] Entering nested workflow with input: {ctx.input}")
+        logger.info("[Trace] Entering nested workflow with input: %s", ctx.data)
 
+        # The child's run span nests under this one (no-op when not tracing)
+        span = enter_span(type(workflow).__name__, WORKFLOW)
+        error = None
         try:
             result_ctx = await workflow.run(ctx)
-            logger.info(f"[Trace] Exiting nested workflow. Output: {result_ctx.output}")
-            return result_ctx
         except Exception as e:
-            logger.error(f"[Trace] Nested workflow failed: {e}")
+            error = e
+            logger.error("[Trace] Nested workflow failed: %s", e)
             raise e
+        finally:
+            if span is not None:
+                exit_span(span, error)
+        logger.info("[Trace] Exiting nested workflow. Output: %s", result_ctx.data)
+        return result_ctx
 
+    wrapped_step._yaaf_workflow = workflow if inline else None
     return wrapped_step
@@ -0,0 +1,120 @@
+import asyncio
+import inspect
+import logging
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+from yaafpy.types import ExecContext
+
+logger = logging.getLogger("yaaf.batching")
+
+
+BatchFn = Callable[
+    [List[ExecContext]],
+    Union[Optional[Sequence[Any]], Awaitable[Optional[Sequence[Any]]]]
+]
+
+
+class _Pending:
+    __slots__ = ("items", "futures", "timer")
+
+    def __init__(self):
+        self.items: List[ExecContext] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """
+    Step that groups contexts from concurrent runs into a single call.
+
+    Every run that reaches the step parks its context in a shared buffer and
+    waits. The buffer is flushed when it holds ``max_batch_size`` contexts or
+    when the oldest one has waited ``max_wait_ms``, whichever comes first.
+
+    ``fn`` receives the list of contexts and returns either None (contexts
+    were updated in place) or a sequence of the same length with one
+    ExecContext per input. An Exception instance in that sequence fails only
+    the matching run; an exception raised by ``fn`` fails the whole batch.
+    """
+
+    def __init__(self, fn: BatchFn, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must be >= 0")
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.__name__ = getattr(fn, "__name__", type(self).__name__)
+        # Futures belong to a loop, so buffers are kept per running loop
+        self._pending: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Pending]" = weakref.WeakKeyDictionary()
+        self._batches = 0
+        self._items = 0
+        # Strong references so flush tasks are not garbage collected mid-flight
+        self._tasks: set = set()
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(loop)
+        if pending is None:
+            pending = self._pending[loop] = _Pending()
+
+        future = loop.create_future()
+        pending.items.append(ctx)
+        pending.futures.append(future)
+
+        if len(pending.items) >= self.max_batch_size:
+            self._dispatch(loop)
+        elif pending.timer is None:
+            pending.timer = loop.call_later(self.max_wait, self._dispatch, loop)
+
+        return await future
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": self._items / self._batches if self._batches else 0.0,
+        }
+
+    def _dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        pending = self._pending.get(loop)
+        if pending is None or not pending.items:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+        self._pending[loop] = _Pending()
+        task = loop.create_task(self._flush(pending.items, pending.futures))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, items: List[ExecContext], futures: List[asyncio.Future]) -> None:
+        self._batches += 1
+        self._items += len(items)
+        try:
+            results = self.fn(items)
+            if inspect.isawaitable(results):
+                results = await results
+            if results is None:
+                results = items
+            elif len(results) != len(items):
+                raise ValueError(
+                    f"Batched step '{self.__name__}' returned {len(results)} results for {len(items)} contexts"
+                )
+        except BaseException as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for future, result in zip(futures, results):
+            # A waiting run may have been cancelled in the meantime
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
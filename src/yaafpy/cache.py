@@ -0,0 +1,224 @@
+import asyncio
+import copy
+import inspect
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from yaafpy.types import ExecContext, Middleware
+
+_MISSING = object()
+
+
+def approx_size(obj: Any, _depth: int = 0) -> int:
+    """Cheap recursive ``sys.getsizeof`` for the usual containers (bounded depth)."""
+    size = sys.getsizeof(obj)
+    if _depth >= 4:
+        return size
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += approx_size(key, _depth + 1) + approx_size(value, _depth + 1)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += approx_size(item, _depth + 1)
+    return size
+
+
+@dataclass
+class CachePolicy:
+    """
+    Memoization settings for a step registered with ``Workflow.use(..., cache=...)``.
+
+    Attributes:
+        key: Builds the cache key from the context. Returning None bypasses the cache.
+        max_entries: LRU bound on the number of entries (None for unbounded).
+        ttl: Seconds an entry stays valid (None for no expiry).
+        max_bytes: Optional bound on the estimated size of all entries.
+        sizeof: Size estimator used with ``max_bytes``.
+        copy: Applied to every cached value handed out (``data`` and each
+            changed ``shared_data`` key), so runs never share mutable objects
+            with the cache or with each other. None hands out the stored
+            objects as they are, which is only safe for values nobody mutates.
+    """
+    key: Callable[[ExecContext], Optional[Hashable]]
+    max_entries: Optional[int] = 1024
+    ttl: Optional[float] = None
+    max_bytes: Optional[int] = None
+    sizeof: Callable[[Any], int] = approx_size
+    copy: Optional[Callable[[Any], Any]] = copy.deepcopy
+
+
+class _Delta:
+    """What a step changed on the context, replayable on another context."""
+    __slots__ = ("data", "updates", "removed", "stop", "jump_to", "size")
+
+    def __init__(self, before: ExecContext, after: ExecContext, sizeof: Callable[[Any], int]):
+        shared = before.shared_data
+        self.data = after.data if after.data is not before.data else _MISSING
+        self.updates = {
+            key: value for key, value in after.shared_data.items()
+            if shared.get(key, _MISSING) is not value
+        }
+        self.removed = tuple(key for key in shared if key not in after.shared_data)
+        self.stop = after.stop
+        self.jump_to = after.jump_to
+        self.size = sizeof(self.updates) + (sizeof(self.data) if self.data is not _MISSING else 0)
+
+    def apply(self, ctx: ExecContext, copy: Optional[Callable[[Any], Any]] = None) -> ExecContext:
+        if self.data is not _MISSING:
+            ctx.data = self.data if copy is None else copy(self.data)
+        if self.updates:
+            if copy is None:
+                ctx.shared_data.update(self.updates)
+            else:
+                ctx.shared_data.update((key, copy(value)) for key, value in self.updates.items())
+        for key in self.removed:
+            ctx.shared_data.pop(key, None)
+        if self.stop:
+            ctx.stop = True
+        if self.jump_to:
+            ctx.jump_to = self.jump_to
+        return ctx
+
+
+class CachedStep:
+    """
+    Wraps a middleware with an LRU/TTL memoization cache.
+
+    On a miss the step runs on ``ctx.fork()`` and the difference between the
+    fork and the input (``data`` and changed ``shared_data`` keys) is stored.
+    On a hit that delta is applied to the context without calling the step.
+    Concurrent misses on the same key share a single execution; if that run
+    is cancelled, the waiting runs start over and one of them takes its place.
+    The store is guarded by a lock, so it is safe across runs, loops and threads.
+
+    Values are copied with ``policy.copy`` whenever the delta is applied,
+    the run that computed it included. Only rebound keys are recorded: a step
+    that mutates an object already in ``shared_data`` in place (e.g.
+    ``ctx.shared_data["history"].append(...)``) is not captured, and a hit
+    does not repeat that write.
+    """
+
+    def __init__(self, middleware: Middleware, policy: CachePolicy):
+        self.middleware = middleware
+        self.policy = policy
+        self.__name__ = getattr(middleware, "__name__", type(middleware).__name__)
+        self._entries: "OrderedDict[Hashable, Tuple[float, _Delta]]" = OrderedDict()
+        self._inflight: Dict[Hashable, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypassed = 0
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        key = self.policy.key(ctx)
+        if key is None:
+            with self._lock:
+                self.bypassed += 1
+            return await self._call(ctx)
+
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                delta = self._lookup(key)
+                if delta is not None:
+                    self.hits += 1
+                    return delta.apply(ctx, self.policy.copy)
+
+                inflight = self._inflight.get(key)
+                if inflight is not None and inflight[0] is loop:
+                    leader = inflight[1]
+                else:
+                    self.misses += 1
+                    leader = None
+                    future = loop.create_future()
+                    self._inflight[key] = (loop, future)
+
+            if leader is None:
+                break
+            # Another run is computing this key right now
+            delta = await asyncio.shield(leader)
+            if delta is not None:
+                with self._lock:
+                    self.hits += 1
+                return delta.apply(ctx, self.policy.copy)
+            # The leader was cancelled: look again, possibly taking over
+
+        try:
+            result = await self._call(ctx.fork())
+            delta = _Delta(ctx, result, self.policy.sizeof)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            if isinstance(e, asyncio.CancelledError):
+                future.set_result(None)
+            elif not future.done():
+                future.set_exception(e)
+                # Followers re-raise it; mark retrieved for the no-follower case
+                future.exception()
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, delta)
+        future.set_result(delta)
+        return delta.apply(ctx, self.policy.copy)
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    async def _call(self, ctx: ExecContext) -> ExecContext:
+        result = self.middleware(ctx)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _lookup(self, key: Hashable) -> Optional[_Delta]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, delta = entry
+        if expires and expires < time.monotonic():
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return delta
+
+    def _store(self, key: Hashable, delta: _Delta) -> None:
+        policy = self.policy
+        if policy.max_bytes is not None and delta.size > policy.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[1].size
+        expires = time.monotonic() + policy.ttl if policy.ttl is not None else 0.0
+        self._entries[key] = (expires, delta)
+        self._bytes += delta.size
+        while self._entries and (
+            (policy.max_entries is not None and len(self._entries) > policy.max_entries)
+            or (policy.max_bytes is not None and self._bytes > policy.max_bytes)
+        ):
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: Hashable) -> None:
+        _, delta = self._entries.pop(key)
+        self._bytes -= delta.size
+        self.evictions += 1
@@ -0,0 +1,194 @@
+import abc
+import asyncio
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+from yaafpy.types import ExecContext
+
+logger = logging.getLogger("yaaf.checkpoint")
+
+
+@dataclass
+class Checkpoint:
+    """Progress of a run: the next step to execute and the serialized context."""
+    run_id: str
+    cursor: int
+    fingerprint: str
+    state: bytes
+
+
+class CheckpointStore(abc.ABC):
+    """
+    Persistence backend for checkpoints.
+
+    Methods are blocking and always called from the checkpoint writer thread,
+    never from the event loop.
+    """
+
+    @abc.abstractmethod
+    def write(self, batch: Dict[str, Optional[Checkpoint]]) -> None:
+        """Upserts every checkpoint in ``batch``; a None value deletes the run."""
+
+    @abc.abstractmethod
+    def load(self, run_id: str) -> Optional[Checkpoint]:
+        """Returns the checkpoint stored for ``run_id``, or None."""
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Stores checkpoints in a single SQLite table, one row per run."""
+
+    def __init__(self, path: Union[str, Path] = ":memory:"):
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS yaaf_checkpoints ("
+                "run_id TEXT PRIMARY KEY, cursor INTEGER NOT NULL, "
+                "fingerprint TEXT NOT NULL, state BLOB NOT NULL)"
+            )
+
+    def write(self, batch: Dict[str, Optional[Checkpoint]]) -> None:
+        upserts = [(c.run_id, c.cursor, c.fingerprint, c.state) for c in batch.values() if c is not None]
+        deletes = [(run_id,) for run_id, c in batch.items() if c is None]
+        # One transaction per batch
+        with self._lock, self._conn:
+            if upserts:
+                self._conn.executemany("INSERT OR REPLACE INTO yaaf_checkpoints VALUES (?, ?, ?, ?)", upserts)
+            if deletes:
+                self._conn.executemany("DELETE FROM yaaf_checkpoints WHERE run_id = ?", deletes)
+
+    def load(self, run_id: str) -> Optional[Checkpoint]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id, cursor, fingerprint, state FROM yaaf_checkpoints WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        return Checkpoint(row[0], row[1], row[2], bytes(row[3])) if row else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class FileCheckpointStore(CheckpointStore):
+    """Stores each run in its own file under ``directory``, replaced atomically."""
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, run_id: str) -> Path:
+        return self.directory / f"{run_id}.ckpt"
+
+    def write(self, batch: Dict[str, Optional[Checkpoint]]) -> None:
+        for run_id, checkpoint in batch.items():
+            path = self._path(run_id)
+            if checkpoint is None:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                continue
+            header = json.dumps({"cursor": checkpoint.cursor, "fingerprint": checkpoint.fingerprint}).encode()
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                f.write(header + b"\n" + checkpoint.state)
+            os.replace(tmp, path)
+
+    def load(self, run_id: str) -> Optional[Checkpoint]:
+        try:
+            raw = self._path(run_id).read_bytes()
+        except FileNotFoundError:
+            return None
+        header, _, state = raw.partition(b"\n")
+        meta = json.loads(header)
+        return Checkpoint(run_id, meta["cursor"], meta["fingerprint"], state)
+
+
+class Checkpointer:
+    """
+    Write-behind front end of a CheckpointStore.
+
+    ``record`` snapshots the context synchronously (serialization only) and
+    queues it. A single writer thread drains the queue in batches, keeping
+    just the latest checkpoint per run, so storage latency never sits on the
+    step path.
+
+    A context that ``dumps`` cannot serialize (a lock, a socket, a client in
+    ``shared_data``) is logged and skipped instead of failing the run; the
+    run's previous checkpoint stays in place, so a resume repeats the steps
+    since then. Pass a ``dumps`` that filters such values to checkpoint them.
+    """
+
+    def __init__(
+        self,
+        store: CheckpointStore,
+        dumps: Callable[[Any], bytes] = pickle.dumps,
+        loads: Callable[[bytes], Any] = pickle.loads,
+    ):
+        self.store = store
+        self.dumps = dumps
+        self.loads = loads
+        self._pending: Dict[str, Optional[Checkpoint]] = {}
+        self._lock = threading.Lock()
+        self._draining = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="yaaf-checkpoint")
+
+    def record(self, run_id: str, cursor: int, fingerprint: str, ctx: ExecContext) -> None:
+        try:
+            state = self.dumps({"data": ctx.data, "shared_data": dict(ctx.shared_data)})
+        except Exception:
+            logger.exception("Skipped checkpoint of run %s at step %d: context not serializable", run_id, cursor)
+            return
+        self._enqueue(run_id, Checkpoint(run_id, cursor, fingerprint, state))
+
+    def complete(self, run_id: str) -> None:
+        self._enqueue(run_id, None)
+
+    def restore(self, checkpoint: Checkpoint) -> ExecContext:
+        state = self.loads(checkpoint.state)
+        return ExecContext(data=state["data"], shared_data=state["shared_data"], run_id=checkpoint.run_id)
+
+    async def load(self, run_id: str) -> Optional[Checkpoint]:
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.store.load, run_id)
+
+    async def flush(self) -> None:
+        """Waits until every recorded checkpoint has reached the store."""
+        # The writer is single-threaded, so a no-op queued now runs after all pending drains
+        await asyncio.wrap_future(self._executor.submit(lambda: None))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.store.close()
+
+    def _enqueue(self, run_id: str, checkpoint: Optional[Checkpoint]) -> None:
+        with self._lock:
+            self._pending[run_id] = checkpoint
+            if self._draining:
+                return
+            self._draining = True
+        self._executor.submit(self._drain)
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                batch = self._pending
+                if not batch:
+                    self._draining = False
+                    return
+                self._pending = {}
+            try:
+                self.store.write(batch)
+            except Exception:
+                logger.exception("Failed to persist %d checkpoint(s)", len(batch))
@@ -0,0 +1,193 @@
+import asyncio
+import inspect
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from yaafpy.types import ExecContext, Middleware, WorkflowAbortException, WorkflowAllowException
+
+logger = logging.getLogger("yaaf.dag")
+
+_MISSING = object()
+
+
+class DagWorkflow:
+    """
+    Workflow whose steps are scheduled by data dependencies.
+
+    Each step declares the ``shared_data`` keys it ``reads`` and ``writes``.
+    A step starts as soon as every step writing one of its reads has finished,
+    so independent steps overlap. Keys nobody writes are treated as inputs.
+
+    CONTRACT:
+    ----------
+    - Steps are regular middlewares and run on ``ctx.fork()``.
+    - Only declared writes are committed back to the shared context.
+      Use the ``DagWorkflow.DATA`` key to read or write ``ctx.data``.
+    - Several writers of one key run in registration order.
+    - WorkflowAllowException skips the step (nothing is committed, dependents still run).
+    - WorkflowAbortException (or any error) cancels in-flight steps and propagates.
+    - ``ctx.stop`` ends the run after in-flight steps are cancelled.
+    - ``jump_to`` has no meaning in a DAG and aborts the run.
+    """
+
+    DATA = "ctx.data"
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        self.max_concurrency = max_concurrency
+        self._middleware: List[Middleware] = []
+        self._registry: Dict[str, tuple[int, Optional[str]]] = {}
+        self._names: List[str] = []
+        self._reads: List[Tuple[str, ...]] = []
+        self._writes: List[Tuple[str, ...]] = []
+        self._graph: Optional[Tuple[Tuple[Tuple[int, ...], ...], Tuple[Tuple[int, ...], ...]]] = None
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        """Allows the workflow to be used as a middleware."""
+        return await self.run(ctx)
+
+    def use(self, middleware: Middleware, name: Optional[str] = None, description: Optional[str] = None, reads: Iterable[str] = (), writes: Iterable[str] = ()):
+        """
+        Registers a step.
+
+        Args:
+            middleware: Sync or async callable receiving and returning an ExecContext.
+            name: Registry label. Defaults to the function name.
+            description: Free text stored next to the label.
+            reads: shared_data keys the step needs before it can start.
+            writes: shared_data keys the step produces.
+        """
+        self._middleware.append(middleware)
+        label = name or middleware.__name__
+        self._registry[label] = (len(self._middleware) - 1, description)
+        self._names.append(label)
+        self._reads.append(tuple(reads))
+        self._writes.append(tuple(writes))
+        self._graph = None
+        return self
+
+    def dependencies(self) -> Dict[str, List[str]]:
+        """Returns, for every step, the names of the steps it waits for."""
+        deps, _ = self._build_graph()
+        return {self._names[i]: [self._names[d] for d in deps[i]] for i in range(len(deps))}
+
+    async def run(self, ctx: Optional[ExecContext] = None) -> ExecContext:
+        exec_ctx = ctx if ctx is not None else ExecContext()
+        exec_ctx.workflow = self
+
+        deps, dependents = self._build_graph()
+        waiting = [len(d) for d in deps]
+        ready = [i for i, count in enumerate(waiting) if count == 0]
+        running: Dict[asyncio.Future, int] = {}
+        cap = self.max_concurrency
+
+        try:
+            while ready or running:
+                while ready and (cap is None or len(running) < cap):
+                    index = ready.pop(0)
+                    task = asyncio.ensure_future(self._run_step(index, exec_ctx.fork()))
+                    running[task] = index
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+                # Commit in registration order so equal-time finishes are deterministic
+                for task in sorted(done, key=running.__getitem__):
+                    index = running.pop(task)
+                    self._commit(index, exec_ctx, task.result())
+                    if exec_ctx.stop:
+                        return exec_ctx
+                    for child in dependents[index]:
+                        waiting[child] -= 1
+                        if waiting[child] == 0:
+                            ready.append(child)
+                ready.sort()
+
+        except WorkflowAbortException:
+            exec_ctx.stop = True
+            raise
+
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return exec_ctx
+
+    # ==========================================================
+    # INTERNALS
+    # ==========================================================
+
+    async def _run_step(self, index: int, ctx: ExecContext) -> Optional[ExecContext]:
+        try:
+            result = self._middleware[index](ctx)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        except WorkflowAllowException:
+            return None
+
+    def _commit(self, index: int, exec_ctx: ExecContext, result: Optional[ExecContext]) -> None:
+        if result is None:
+            return
+        if result.jump_to:
+            raise WorkflowAbortException(
+                f"Invalid jump in '{self._names[index]}': DagWorkflow steps cannot set jump_to."
+            )
+        shared = exec_ctx.shared_data
+        for key in self._writes[index]:
+            if key == self.DATA:
+                exec_ctx.data = result.data
+                continue
+            value = result.shared_data.get(key, _MISSING)
+            if value is _MISSING:
+                shared.pop(key, None)
+            else:
+                shared[key] = value
+        if result.stop:
+            exec_ctx.stop = True
+
+    def _build_graph(self) -> Tuple[Tuple[Tuple[int, ...], ...], Tuple[Tuple[int, ...], ...]]:
+        if self._graph is not None:
+            return self._graph
+
+        n = len(self._middleware)
+        writers: Dict[str, List[int]] = {}
+        for index, keys in enumerate(self._writes):
+            for key in keys:
+                writers.setdefault(key, []).append(index)
+
+        deps: List[Set[int]] = [set() for _ in range(n)]
+        for index in range(n):
+            for key in self._reads[index]:
+                deps[index].update(w for w in writers.get(key, ()) if w != index)
+            for key in self._writes[index]:
+                # Earlier writers of the same key go first
+                deps[index].update(w for w in writers[key] if w < index)
+
+        dependents: List[List[int]] = [[] for _ in range(n)]
+        for index, parents in enumerate(deps):
+            for parent in parents:
+                dependents[parent].append(index)
+
+        # Kahn's algorithm: anything left over sits on a cycle
+        waiting = [len(d) for d in deps]
+        queue = [i for i in range(n) if waiting[i] == 0]
+        visited = 0
+        while queue:
+            current = queue.pop()
+            visited += 1
+            for child in dependents[current]:
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    queue.append(child)
+        if visited != n:
+            cycle = [self._names[i] for i in range(n) if waiting[i] > 0]
+            raise ValueError(f"DagWorkflow has a dependency cycle between: {cycle}")
+
+        self._graph = (
+            tuple(tuple(sorted(d)) for d in deps),
+            tuple(tuple(sorted(c)) for c in dependents),
+        )
+        return self._graph
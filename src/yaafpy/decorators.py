@@ -1,4 +1,5 @@
-from yaafpy.types import WorkflowAllowException, WorkflowAbortException, Transform, StreamHandler
+from yaafpy.types import WorkflowAllowException, WorkflowAbortException, Transform, StreamHandler, SharedDataOverlay
+from yaafpy.plan import is_async_step
 import copy
 import inspect
 import functools
@@ -50,7 +51,44 @@ def handler_to_transform(fn: StreamHandler) -> Transform:
     return wrapper
 
 
+def blocking(func):
+    """
+    Marks a sync step as blocking (file, SQLite or network I/O).
+
+    Workflows run marked steps in their thread pool instead of on the event
+    loop; see ``Workflow(executor=..., max_blocking=...)``. Works above or
+    below ``middleware``.
+    """
+    func._yaaf_blocking = True
+    return func
+
+
+def vectorized(func):
+    """
+    Marks a stream handler as working on whole batches:
+    ``handler(batch, ctx) -> batch``. See ``StreamWorkflow(batch_size=...)``.
+    """
+    func._yaaf_vectorized = True
+    return func
+
+
 def middleware(func):
+    """
+    Wraps a step with the defensive contract of the engine: stopped contexts
+    pass through, WorkflowAllowException skips the step and any other error
+    becomes a WorkflowAbortException.
+
+    The step works on a shallow copy whose ``shared_data`` is a journaled
+    SharedDataOverlay. Its writes are committed when it returns and dropped
+    when it skips or fails, so a skip hands back the untouched context.
+
+    The decorated step is always awaitable. For sync functions the plain
+    sync wrapper is kept as ``_yaaf_sync``, so the engine can call it
+    without creating a coroutine.
+    """
+    if not is_async_step(func):
+        return _awaitable(_sync_middleware(func))
+
     @functools.wraps(func)
     async def wrapper(ctx: 'ExecContext'):
         
@@ -58,8 +96,8 @@ def middleware(func):
             return ctx
 
         # Shadow copy: si el middleware falla a mitad, 
-        # devolvemos esta versión limpia al motor.
-        ctx_copy = copy.copy(ctx)
+        # devolvemos el contexto original, que sigue limpio.
+        ctx_copy = _layered_copy(ctx)
 
         try:
             result = func(ctx_copy)
@@ -68,12 +106,12 @@ def middleware(func):
             if exec_ctx is None:
                 raise ValueError(f"Middleware '{func.__name__}' retornó None")
             
-            return exec_ctx
+            return _commit(ctx, exec_ctx)
 
         except WorkflowAllowException:
-            # Caso "Skip": devolvemos el contexto previo (ctx_copy)
+            # Caso "Skip": devolvemos el contexto previo (ctx)
             # El motor simplemente incrementará el cursor y seguirá.
-            return ctx_copy
+            return ctx
 
         except WorkflowAbortException:
             # Caso "Freno Manual": el desarrollador sabe lo que hace.
@@ -87,4 +125,84 @@ def middleware(func):
                 f"Excepción no controlada en {func.__name__}: {str(e)}"
             ) from e
             
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+
+def _sync_middleware(func):
+    @functools.wraps(func)
+    def wrapper(ctx: 'ExecContext'):
+
+        if ctx.stop:
+            return ctx
+
+        ctx_copy = _layered_copy(ctx)
+
+        try:
+            exec_ctx = func(ctx_copy)
+
+            if inspect.isawaitable(exec_ctx):
+                # Sync callable handing back a coroutine: finish it on the async path
+                return _settle_async(func, exec_ctx, ctx)
+
+            if exec_ctx is None:
+                raise ValueError(f"Middleware '{func.__name__}' retornó None")
+
+            return _commit(ctx, exec_ctx)
+
+        except WorkflowAllowException:
+            return ctx
+
+        except WorkflowAbortException:
+            raise
+
+        except Exception as e:
+            raise WorkflowAbortException(
+                f"Excepción no controlada en {func.__name__}: {str(e)}"
+            ) from e
+
+    return wrapper
+
+
+def _awaitable(sync_wrapper):
+    @functools.wraps(sync_wrapper)
+    async def wrapper(ctx: 'ExecContext'):
+        result = sync_wrapper(ctx)
+        return await result if inspect.isawaitable(result) else result
+
+    wrapper._yaaf_sync = sync_wrapper
+    return wrapper
+
+
+async def _settle_async(func, result, ctx):
+    try:
+        exec_ctx = await result
+
+        if exec_ctx is None:
+            raise ValueError(f"Middleware '{func.__name__}' retornó None")
+
+        return _commit(ctx, exec_ctx)
+
+    except WorkflowAllowException:
+        return ctx
+
+    except WorkflowAbortException:
+        raise
+
+    except Exception as e:
+        raise WorkflowAbortException(
+            f"Excepción no controlada en {func.__name__}: {str(e)}"
+        ) from e
+
+
+def _layered_copy(ctx):
+    ctx_copy = copy.copy(ctx)
+    ctx_copy.shared_data = SharedDataOverlay(ctx.shared_data)
+    return ctx_copy
+
+
+def _commit(ctx, result):
+    # Fold the step's layer back into the original dict so layers never pile up
+    layer = result.shared_data
+    if isinstance(layer, SharedDataOverlay) and layer.base is ctx.shared_data:
+        result.shared_data = layer.commit()
+    return result
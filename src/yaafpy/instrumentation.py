@@ -0,0 +1,134 @@
+import bisect
+from typing import Any, Dict, Optional
+
+from yaafpy.types import ExecContext
+
+# Step outcomes reported to hooks
+OK = "ok"
+SKIP = "skip"
+JUMP = "jump"
+STOP = "stop"
+ABORT = "abort"
+ERROR = "error"
+
+
+class StepHook:
+    """
+    Observer of the sequential engine. Override only what you need.
+
+    Hooks are called synchronously on the event loop, so they must be cheap.
+    A workflow without hooks runs its uninstrumented loop and pays nothing.
+    """
+
+    def on_run_start(self, plan: "ExecutionPlan", ctx: ExecContext) -> None:
+        pass
+
+    def on_run_end(self, plan: "ExecutionPlan", ctx: ExecContext, error: Optional[BaseException]) -> None:
+        pass
+
+    def on_step_start(self, name: str, index: int, ctx: ExecContext) -> None:
+        pass
+
+    def on_step_end(self, name: str, index: int, ctx: ExecContext, elapsed: float, outcome: str) -> None:
+        pass
+
+
+# Latency buckets: 1µs doubling up to ~35 minutes
+_BOUNDS = tuple(1e-6 * 2 ** i for i in range(32))
+
+
+class StepStats:
+    """Counters and a log2 latency histogram for one registry name."""
+
+    __slots__ = ("calls", "outcomes", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.outcomes = {OK: 0, SKIP: 0, JUMP: 0, STOP: 0, ABORT: 0, ERROR: 0}
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * (len(_BOUNDS) + 1)
+
+    def record(self, elapsed: float, outcome: str) -> None:
+        self.calls += 1
+        self.outcomes[outcome] += 1
+        self.total += elapsed
+        if elapsed < self.min:
+            self.min = elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.buckets[bisect.bisect_left(_BOUNDS, elapsed)] += 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (0 < q <= 1)."""
+        if not self.calls:
+            return 0.0
+        rank = q * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(_BOUNDS[index] if index < len(_BOUNDS) else self.max, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "skips": self.outcomes[SKIP],
+            "jumps": self.outcomes[JUMP],
+            "stops": self.outcomes[STOP],
+            "aborts": self.outcomes[ABORT],
+            "errors": self.outcomes[ERROR],
+            "total_s": self.total,
+            "mean_s": self.total / self.calls if self.calls else 0.0,
+            "min_s": self.min if self.calls else 0.0,
+            "max_s": self.max,
+            "p50_s": self.percentile(0.50),
+            "p90_s": self.percentile(0.90),
+            "p99_s": self.percentile(0.99),
+            "histogram": {
+                (_BOUNDS[i] if i < len(_BOUNDS) else float("inf")): count
+                for i, count in enumerate(self.buckets) if count
+            },
+        }
+
+
+class StatsCollector(StepHook):
+    """Built-in hook behind ``Workflow.stats()``: per-step latency and outcome counts."""
+
+    def __init__(self):
+        self.runs = 0
+        self.failed_runs = 0
+        self.steps: Dict[str, StepStats] = {}
+
+    def on_run_end(self, plan, ctx, error) -> None:
+        self.runs += 1
+        if error is not None:
+            self.failed_runs += 1
+
+    def on_step_end(self, name, index, ctx, elapsed, outcome) -> None:
+        stats = self.steps.get(name)
+        if stats is None:
+            stats = self.steps[name] = StepStats()
+        stats.record(elapsed, outcome)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "failed_runs": self.failed_runs,
+            "steps": {name: stats.snapshot() for name, stats in self.steps.items()},
+        }
+
+    def reset(self) -> None:
+        self.runs = 0
+        self.failed_runs = 0
+        self.steps.clear()
+
+
+def merge_step_info(snapshot: Dict[str, Any], extra: Dict[str, Dict[str, Any]], key: str) -> None:
+    """Nests per-name counters (e.g. cache hits) under each step of a stats snapshot."""
+    steps = snapshot.setdefault("steps", {})
+    for name, info in extra.items():
+        steps.setdefault(name, {})[key] = info
+
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import pickle
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+
+from yaafpy.plan import current_budget
+from yaafpy.resilience import call_step
+from yaafpy.types import ExecContext, Middleware, WorkflowBudgetException, WorkflowTimeoutException
+
+logger = logging.getLogger("yaaf.loop")
+
+ConvergeKey = Callable[[ExecContext], Hashable]
+
+
+def data_digest(ctx: ExecContext) -> Hashable:
+    """Value fingerprint of ``ctx.data``: pickled bytes when possible, ``repr`` otherwise."""
+    try:
+        raw = pickle.dumps(ctx.data, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        raw = repr(ctx.data).encode()
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+class LoopStep:
+    """
+    Runs ``body`` repeatedly on the context: the agent-loop primitive.
+
+    After every iteration the loop exits when the body stopped the run or set
+    ``jump_to`` (the jump is left for the engine), when ``until(ctx)`` is true,
+    or, with ``converge``, when the iteration left ``converge(ctx)`` unchanged.
+    ``max_iterations`` and ``max_elapsed`` bound it; ``on_limit`` decides
+    whether reaching them aborts (WorkflowBudgetException) or continues with
+    the last context.
+
+    Each run's report (iterations, per-iteration seconds, exit reason) is
+    written to ``ctx.shared_data["metadata"]["loops"][name]``.
+    """
+
+    def __init__(
+        self,
+        body: Union["Workflow", Middleware],
+        until: Optional[Callable[[ExecContext], bool]] = None,
+        max_iterations: int = 10,
+        max_elapsed: Optional[float] = None,
+        converge: Union[bool, ConvergeKey, None] = None,
+        on_limit: str = "abort",
+        name: Optional[str] = None,
+    ):
+        if max_iterations < 1:
+            raise ValueError("max_iterations must be >= 1")
+        if max_elapsed is not None and max_elapsed <= 0:
+            raise ValueError("max_elapsed must be > 0")
+        if on_limit not in ("abort", "continue"):
+            raise ValueError(f"on_limit must be 'abort' or 'continue', got {on_limit!r}")
+        self.body = body
+        self.until = until
+        self.max_iterations = max_iterations
+        self.max_elapsed = max_elapsed
+        self.converge = data_digest if converge is True else converge or None
+        self.on_limit = on_limit
+        self.__name__ = name or f"loop:{getattr(body, '__name__', type(body).__name__)}"
+        # Workflow bodies (direct or through as_middleware) spend the step budget per step
+        self._spends = not (hasattr(type(body), "compile") or hasattr(body, "_yaaf_workflow"))
+        self.runs = 0
+        self.iterations = 0
+        self.exits: Dict[str, int] = {}
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        self.runs += 1
+        key = self.converge
+        previous = key(ctx) if key is not None else None
+        started = time.perf_counter()
+        durations = []
+        reason = None
+
+        while reason is None:
+            if ctx.deadline is not None and ctx.time_left() <= 0:
+                raise WorkflowTimeoutException(f"Deadline exceeded in loop '{self.__name__}'")
+            if self._spends:
+                budget = current_budget()
+                if budget is not None:
+                    budget.spend(1, self.__name__)
+
+            iteration_started = time.perf_counter()
+            ctx = await call_step(self.body, ctx)
+            durations.append(time.perf_counter() - iteration_started)
+
+            converged = False
+            if key is not None:
+                current = key(ctx)
+                converged = current == previous
+                previous = current
+
+            if ctx.stop:
+                reason = "stop"
+            elif ctx.jump_to:
+                reason = "jump"
+            elif self.until is not None and self.until(ctx):
+                reason = "until"
+            elif converged:
+                reason = "converged"
+            elif len(durations) >= self.max_iterations:
+                reason = "max_iterations"
+            elif self.max_elapsed is not None and time.perf_counter() - started >= self.max_elapsed:
+                reason = "max_elapsed"
+
+        self.iterations += len(durations)
+        self.exits[reason] = self.exits.get(reason, 0) + 1
+        self._report(ctx, {
+            "iterations": len(durations),
+            "elapsed": time.perf_counter() - started,
+            "iteration_times": durations,
+            "exit": reason,
+        })
+
+        if reason in ("max_iterations", "max_elapsed"):
+            message = f"Loop '{self.__name__}' hit {reason} after {len(durations)} iteration(s)"
+            if self.on_limit == "abort":
+                raise WorkflowBudgetException(message)
+            logger.warning("%s", message)
+        return ctx
+
+    def info(self) -> Dict[str, Any]:
+        return {"runs": self.runs, "iterations": self.iterations, "exits": dict(self.exits)}
+
+    def _report(self, ctx: ExecContext, report: Dict[str, Any]) -> None:
+        # New dicts on every write: forks and overlays share the nested ones
+        shared = ctx.shared_data
+        metadata = dict(shared.get("metadata") or {})
+        loops = dict(metadata.get("loops") or {})
+        loops[self.__name__] = report
+        metadata["loops"] = loops
+        shared["metadata"] = metadata
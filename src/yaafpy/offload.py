@@ -0,0 +1,89 @@
+import asyncio
+import contextvars
+import weakref
+from concurrent.futures import Executor
+from typing import Optional
+
+from yaafpy.decorators import _commit, _layered_copy
+from yaafpy.plan import is_async_step, sync_impl
+from yaafpy.types import ExecContext, Middleware
+
+
+def is_blocking(fn: Middleware) -> bool:
+    """True for steps marked with the ``blocking`` decorator."""
+    return getattr(fn, "_yaaf_blocking", False)
+
+
+class BlockingLimiter:
+    """
+    Caps the blocking calls a workflow has in flight, per event loop.
+
+    An asyncio.Semaphore binds to the first loop that waits on it, so one is
+    created for each running loop the workflow is used from (``asyncio.run``
+    twice, ``run_sync`` after ``asyncio.run``...).
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+    def semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+
+class BlockingStep:
+    """
+    Runs a sync step in a thread so it does not stall the event loop.
+
+    The thread gets a shallow copy of the context whose ``shared_data`` is a
+    SharedDataOverlay; the layer is committed on the event loop thread once
+    the step returns. The caller's context is therefore never written from
+    another thread, and an abandoned call (timeout, losing hedge) leaves it
+    untouched. Objects reached through ``ctx.data`` are shared, not copied.
+
+    ``limiter`` caps the calls a workflow has in flight; extra calls wait for
+    a free slot on the event loop instead of queueing in the executor.
+    Context variables (trace, step budget) are visible inside the thread.
+    """
+
+    def __init__(self, middleware: Middleware, executor: Optional[Executor] = None, limiter: Optional[BlockingLimiter] = None):
+        if is_async_step(sync_impl(middleware)):
+            raise ValueError(f"Only sync steps can run in a thread, '{getattr(middleware, '__name__', middleware)}' is async")
+        self.middleware = middleware
+        self.executor = executor
+        self.limiter = limiter
+        self.__name__ = getattr(middleware, "__name__", type(middleware).__name__)
+        self.calls = 0
+        self.waits = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        self.calls += 1
+        if self.limiter is None:
+            return await self._offload(ctx)
+        limiter = self.limiter.semaphore()
+        if limiter.locked():
+            self.waits += 1
+        async with limiter:
+            return await self._offload(ctx)
+
+    async def _offload(self, ctx: ExecContext) -> ExecContext:
+        work = _layered_copy(ctx)
+        context = contextvars.copy_context()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, context.run, sync_impl(self.middleware), work)
+        finally:
+            self.in_flight -= 1
+        if result is None:
+            raise ValueError(f"Middleware '{self.__name__}' returned None")
+        return _commit(ctx, result)
+
+    def info(self) -> dict:
+        return {"calls": self.calls, "waits": self.waits, "in_flight": self.in_flight, "max_in_flight": self.max_in_flight}
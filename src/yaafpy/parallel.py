@@ -0,0 +1,89 @@
+import asyncio
+import inspect
+from typing import Callable, List, Optional, Sequence, Union
+
+from yaafpy.types import ExecContext, Middleware, WorkflowAllowException
+
+_MISSING = object()
+
+Branch = Union["Workflow", Middleware]
+MergeFn = Callable[[ExecContext, List[Optional[ExecContext]]], ExecContext]
+
+
+def merge_branches(ctx: ExecContext, results: List[Optional[ExecContext]]) -> ExecContext:
+    """
+    Default merge policy for ``Workflow.parallel``.
+
+    Applies what each branch changed relative to ``ctx``, in branch order, so
+    on conflicting keys the later branch wins. ``data`` is replaced when a
+    branch assigned a new object, and ``stop`` is set if any branch stopped.
+    Skipped branches (None) contribute nothing.
+    """
+    base = ctx.shared_data
+    original = dict(base)
+    original_data = ctx.data
+
+    for result in results:
+        if result is None:
+            continue
+        shared = result.shared_data
+        for key, value in shared.items():
+            if original.get(key, _MISSING) is not value:
+                base[key] = value
+        for key in original:
+            if key not in shared:
+                base.pop(key, None)
+        if result.data is not original_data:
+            ctx.data = result.data
+        if result.stop:
+            ctx.stop = True
+    return ctx
+
+
+class ParallelStep:
+    """
+    Step that runs several branches concurrently on forks of the context.
+
+    Each branch (a Workflow or a middleware) gets ``ctx.fork()``, so branches
+    never see each other's writes. Once all of them finish, ``merge`` folds
+    the results back into the context. The first branch that raises cancels
+    the rest and the error propagates to the engine. A branch raising
+    WorkflowAllowException is skipped and passed to ``merge`` as None.
+    """
+
+    def __init__(self, branches: Sequence[Branch], merge: Optional[MergeFn] = None):
+        if not branches:
+            raise ValueError("parallel() needs at least one branch")
+        self.branches = tuple(branches)
+        self.merge = merge or merge_branches
+        self.__name__ = "parallel:" + ",".join(
+            getattr(branch, "__name__", type(branch).__name__) for branch in self.branches
+        )
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        tasks = [asyncio.ensure_future(self._run_branch(branch, ctx.fork())) for branch in self.branches]
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        result = self.merge(ctx, [task.result() for task in tasks])
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    @staticmethod
+    async def _run_branch(branch: Branch, ctx: ExecContext) -> Optional[ExecContext]:
+        try:
+            result = branch(ctx)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        except WorkflowAllowException:
+            return None
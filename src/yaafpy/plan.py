@@ -0,0 +1,462 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import time
+import uuid
+from contextvars import ContextVar
+from types import AsyncGeneratorType, MappingProxyType
+from typing import Any, Mapping, Optional, Tuple
+
+from yaafpy.types import ExecContext, ExecContextBase, WorkflowAbortException, WorkflowAllowException, WorkflowBudgetException, WorkflowTimeoutException, Middleware
+from yaafpy.checkpoint import Checkpointer
+from yaafpy.instrumentation import ABORT, ERROR, JUMP, OK, SKIP, STOP, StepHook
+from yaafpy.tracing import active_tracer
+
+
+def is_async_step(fn: Any) -> bool:
+    """Returns True when calling ``fn`` produces a coroutine that must be awaited."""
+    while isinstance(fn, functools.partial):
+        fn = fn.func
+    if inspect.iscoroutinefunction(fn):
+        return True
+    # Callable objects (e.g. a Workflow used directly as middleware)
+    return inspect.iscoroutinefunction(getattr(type(fn), "__call__", None))
+
+
+def sync_impl(fn: Any) -> Any:
+    """
+    Returns the synchronous implementation behind ``fn`` when it has one
+    (``@middleware`` on a sync function), otherwise ``fn`` itself.
+    """
+    return getattr(fn, "_yaaf_sync", fn)
+
+
+class StepBudget:
+    """
+    Maximum number of steps a run may execute, nested runs included.
+
+    The active budget travels in a context variable, so loop bodies and child
+    workflows spend from the same budget. A budget opened inside another one
+    also spends from its parent.
+    """
+
+    __slots__ = ("limit", "used", "parent")
+
+    def __init__(self, limit: int, parent: Optional["StepBudget"] = None):
+        if limit < 1:
+            raise ValueError("max_steps must be >= 1")
+        self.limit = limit
+        self.used = 0
+        self.parent = parent
+
+    def spend(self, steps: int, name: str) -> None:
+        budget = self
+        while budget is not None:
+            budget.used += steps
+            if budget.used > budget.limit:
+                raise WorkflowBudgetException(f"Step budget of {budget.limit} exhausted at step '{name}'")
+            budget = budget.parent
+
+
+_budget: ContextVar[Optional[StepBudget]] = ContextVar("yaaf_step_budget", default=None)
+
+
+def current_budget() -> Optional[StepBudget]:
+    return _budget.get()
+
+
+async def run_with_budget(plan: "ExecutionPlan", ctx: Optional[ExecContext], max_steps: int) -> ExecContext:
+    token = _budget.set(StepBudget(max_steps, _budget.get()))
+    try:
+        return await plan.run(ctx)
+    finally:
+        _budget.reset(token)
+
+
+def fuse_sync_steps(steps: Tuple[Middleware, ...]) -> Middleware:
+    """
+    Collapses consecutive sync steps into a single call.
+
+    Only valid for steps that never set ``jump_to``; ``stop`` is still
+    honoured between steps and a step raising WorkflowAllowException is
+    skipped on its own, as it would be unfused.
+    """
+    def fused(ctx: ExecContext) -> ExecContext:
+        for step in steps:
+            try:
+                result = step(ctx)
+            except WorkflowAllowException:
+                continue
+            if not isinstance(result, ExecContextBase):
+                raise TypeError(
+                    f"Fused step '{getattr(step, '__name__', step)}' returned {type(result).__name__}; "
+                    "steps registered with jumps=False must be synchronous."
+                )
+            ctx = result
+            if ctx.stop:
+                break
+        return ctx
+
+    fused.__name__ = "+".join(getattr(step, "__name__", "step") for step in steps)
+    return fused
+
+
+class ExecutionPlan:
+    """
+    Immutable, pre-resolved view of a Workflow.
+
+    The middleware list is frozen into tuples, every jump label is resolved
+    to an index once and each step is classified as sync or async, so the
+    run loop only does index arithmetic. Sync steps are called directly
+    (no coroutine is created) and runs of consecutive sync steps registered
+    with ``jumps=False`` are fused into one call.
+
+    Built with ``Workflow.compile()``. Later calls to ``Workflow.use()`` do
+    not affect an existing plan.
+
+    A flattened plan (nested workflows inlined by ``Workflow.compile()``)
+    carries, per step, the workflow that owns it and that workflow's label
+    table: ``ctx.workflow`` is switched only where the owner changes and
+    jumps resolve within the owner's labels, as they would in a nested run.
+
+    A step raising WorkflowAllowException is skipped: the run continues with
+    the context it had before the step.
+    """
+
+    __slots__ = (
+        "workflow", "steps", "names", "labels", "is_async", "fingerprint", "checkpointer", "hooks", "inlined",
+        "_labels", "_calls", "_call_names", "_next", "_n", "_owners", "_scopes", "_switch", "_exits",
+    )
+
+    def __init__(
+        self,
+        workflow: "Workflow",
+        steps: Tuple[Middleware, ...],
+        names: Tuple[str, ...],
+        labels: Mapping[str, int],
+        jumps: Optional[Tuple[bool, ...]] = None,
+        checkpointer: Optional[Checkpointer] = None,
+        hooks: Tuple[StepHook, ...] = (),
+        owners: Optional[Tuple["Workflow", ...]] = None,
+        scopes: Optional[Tuple[Mapping[str, int], ...]] = None,
+        inlined: Tuple[Tuple["Workflow", int], ...] = (),
+        ends: Tuple[int, ...] = (),
+        fingerprint: Optional[str] = None,
+    ):
+        self.workflow = workflow
+        self.steps = steps
+        self.names = names
+        self._labels = dict(labels)
+        self.labels = MappingProxyType(self._labels)
+        # Decorated sync steps are awaitable for callers, the plan calls them directly
+        impls = tuple(sync_impl(step) for step in steps)
+        self.is_async = tuple(is_async_step(step) for step in impls)
+        self._n = len(steps)
+        self.checkpointer = checkpointer
+        self.hooks = tuple(hooks)
+        self._owners = owners
+        # (child workflow, version) pairs inlined into this plan
+        self.inlined = inlined
+        self._scopes = scopes
+        # Identifies the step layout; checkpoints only resume on a matching plan
+        self.fingerprint = fingerprint or hashlib.sha1("\x1f".join(names).encode()).hexdigest()
+
+        # _calls[i] is what runs when the cursor lands on i and _next[i] is
+        # where the cursor goes afterwards. Inside a fused group every index
+        # gets the fused suffix, so jumping into the middle still works.
+        calls = list(impls)
+        call_names = list(names)
+        nexts = list(range(1, self._n + 1))
+        fusable = [
+            not is_async and not (jumps[i] if jumps is not None else True)
+            for i, is_async in enumerate(self.is_async)
+        ]
+        i = 0
+        while i < self._n:
+            j = i
+            # Groups never straddle an inlined workflow boundary
+            while j < self._n and fusable[j] and (owners is None or owners[j] is owners[i]):
+                j += 1
+            if j - i >= 2:
+                for k in range(i, j - 1):
+                    calls[k] = fuse_sync_steps(impls[k:j])
+                    call_names[k] = "+".join(names[k:j])
+                    nexts[k] = j
+            i = max(j, i + 1)
+        # _switch[i] is the workflow entered at step i (an inlined segment
+        # starts or ends there), so the loop sets ctx.workflow only there
+        self._switch = None
+        if owners is not None:
+            switch = []
+            previous = workflow
+            for owner in owners:
+                switch.append(owner if owner is not previous else None)
+                previous = owner
+            self._switch = tuple(switch)
+        # _exits[i]: leaving step i normally also ends an inlined child (``ends``
+        # holds the last index of each child segment), so the child's own
+        # end-of-run generator check runs there
+        self._exits = tuple(nexts[i] - 1 in ends for i in range(self._n)) if owners is not None else None
+        self._calls = tuple(calls)
+        # Hooks see a fused group as one step named "a+b+c"
+        self._call_names = tuple(call_names)
+        self._next = tuple(nexts)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __repr__(self) -> str:
+        return f"ExecutionPlan(steps={list(self.names)!r})"
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        """Allows the plan to be used as a middleware."""
+        return await self.run(ctx)
+
+    async def run(self, ctx: Optional[ExecContext] = None) -> ExecContext:
+        exec_ctx = ctx if ctx is not None else ExecContext()
+        cursor = 0 if exec_ctx.jump_to is None else self._labels[exec_ctx.jump_to]
+        exec_ctx.jump_to = None
+        return await self.execute(exec_ctx, cursor)
+
+    async def execute(self, exec_ctx: ExecContext, cursor: int) -> ExecContext:
+        """Runs the plan from step index ``cursor`` (used by ``run`` and ``Workflow.resume``)."""
+        owners = self._owners
+        exec_ctx.workflow = self.workflow if owners is None or cursor >= self._n else owners[cursor]
+        hooks = self.hooks
+        tracer = active_tracer()
+        if tracer is not None and tracer not in hooks:
+            # Called from a traced step: join the caller's trace
+            hooks = hooks + (tracer,)
+        if hooks or self.checkpointer is not None or exec_ctx.deadline is not None or _budget.get() is not None:
+            return await self._execute_observed(exec_ctx, cursor, hooks)
+
+        if self._switch is not None:
+            return await self._execute_inlined(exec_ctx, cursor)
+
+        calls = self._calls
+        nexts = self._next
+        is_async = self.is_async
+        n = self._n
+
+        try:
+            while cursor < n:
+                try:
+                    if is_async[cursor]:
+                        exec_ctx = await calls[cursor](exec_ctx)
+                    else:
+                        exec_ctx = calls[cursor](exec_ctx)
+                        # A sync callable may still hand back an awaitable (e.g. a lambda wrapping a coroutine)
+                        if not isinstance(exec_ctx, ExecContextBase) and inspect.isawaitable(exec_ctx):
+                            exec_ctx = await exec_ctx
+                except WorkflowAllowException:
+                    cursor = nexts[cursor]
+                    continue
+
+                if exec_ctx.stop:
+                    return exec_ctx
+
+                if exec_ctx.jump_to:
+                    cursor = self._resolve_jump(exec_ctx, cursor)
+                    continue
+
+                cursor = nexts[cursor]
+
+            if isinstance(exec_ctx.data, AsyncGeneratorType):
+                raise RuntimeError("Generator leak detected at the end of the flow.")
+
+        except WorkflowAbortException:
+            exec_ctx.stop = True
+            raise
+
+        return exec_ctx
+
+    async def _execute_inlined(self, exec_ctx: ExecContext, cursor: int) -> ExecContext:
+        """``execute``'s loop for a flattened plan: also switches ``ctx.workflow`` between owners."""
+        calls = self._calls
+        nexts = self._next
+        is_async = self.is_async
+        switch = self._switch
+        exits = self._exits
+        n = self._n
+
+        try:
+            while cursor < n:
+                owner = switch[cursor]
+                if owner is not None:
+                    exec_ctx.workflow = owner
+                try:
+                    if is_async[cursor]:
+                        exec_ctx = await calls[cursor](exec_ctx)
+                    else:
+                        exec_ctx = calls[cursor](exec_ctx)
+                        if not isinstance(exec_ctx, ExecContextBase) and inspect.isawaitable(exec_ctx):
+                            exec_ctx = await exec_ctx
+                except WorkflowAllowException:
+                    if exits[cursor] and isinstance(exec_ctx.data, AsyncGeneratorType):
+                        raise RuntimeError("Generator leak detected at the end of the flow.")
+                    cursor = nexts[cursor]
+                    continue
+
+                if exec_ctx.stop:
+                    return exec_ctx
+
+                if exec_ctx.jump_to:
+                    cursor = self._resolve_jump(exec_ctx, cursor)
+                    continue
+
+                # Leaving an inlined child: its run would check for leaks here
+                if exits[cursor] and isinstance(exec_ctx.data, AsyncGeneratorType):
+                    raise RuntimeError("Generator leak detected at the end of the flow.")
+                cursor = nexts[cursor]
+
+            if isinstance(exec_ctx.data, AsyncGeneratorType):
+                raise RuntimeError("Generator leak detected at the end of the flow.")
+
+        except WorkflowAbortException:
+            exec_ctx.stop = True
+            raise
+
+        return exec_ctx
+
+    async def _execute_observed(self, exec_ctx: ExecContext, cursor: int, hooks: Tuple[StepHook, ...]) -> ExecContext:
+        """
+        Same loop as ``execute`` plus the optional per-step work: hooks,
+        checkpoints, the step budget and the context deadline (each step gets
+        the remaining time).
+        """
+        nexts = self._next
+        n = self._n
+        checkpointer = self.checkpointer
+        fingerprint = self.fingerprint
+        deadline = exec_ctx.deadline
+        budget = _budget.get()
+        switch = self._switch
+
+        run_id = exec_ctx.run_id
+        if checkpointer is not None and run_id is None:
+            run_id = exec_ctx.run_id = uuid.uuid4().hex
+
+        for hook in hooks:
+            hook.on_run_start(self, exec_ctx)
+
+        error = None
+        try:
+            while cursor < n:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise WorkflowTimeoutException(f"Deadline exceeded before step '{self.names[cursor]}'")
+                if budget is not None:
+                    # A fused group counts as all of its steps
+                    budget.spend(nexts[cursor] - cursor, self.names[cursor])
+                if switch is not None and switch[cursor] is not None:
+                    exec_ctx.workflow = switch[cursor]
+
+                if not hooks:
+                    try:
+                        exec_ctx = await self._call(cursor, exec_ctx, deadline)
+                    except WorkflowAllowException:
+                        self._check_exit(exec_ctx, cursor)
+                        cursor = nexts[cursor]
+                        continue
+                else:
+                    exec_ctx, skipped = await self._call_hooked(hooks, cursor, exec_ctx, deadline)
+                    if skipped:
+                        self._check_exit(exec_ctx, cursor)
+                        cursor = nexts[cursor]
+                        continue
+
+                if exec_ctx.stop:
+                    if checkpointer is not None:
+                        checkpointer.complete(run_id)
+                    return exec_ctx
+
+                if exec_ctx.jump_to:
+                    cursor = self._resolve_jump(exec_ctx, cursor)
+                else:
+                    self._check_exit(exec_ctx, cursor)
+                    cursor = nexts[cursor]
+
+                if checkpointer is not None and cursor < n:
+                    checkpointer.record(run_id, cursor, fingerprint, exec_ctx)
+
+            if isinstance(exec_ctx.data, AsyncGeneratorType):
+                raise RuntimeError("Generator leak detected at the end of the flow.")
+
+        except WorkflowAbortException as e:
+            # The last checkpoint is kept so the run can be resumed
+            exec_ctx.stop = True
+            error = e
+            raise
+
+        except BaseException as e:
+            error = e
+            raise
+
+        finally:
+            for hook in hooks:
+                hook.on_run_end(self, exec_ctx, error)
+
+        if checkpointer is not None:
+            checkpointer.complete(run_id)
+        return exec_ctx
+
+    async def _call(self, cursor: int, exec_ctx: ExecContext, deadline: Optional[float]) -> ExecContext:
+        step = self._calls[cursor]
+        if self.is_async[cursor]:
+            if deadline is None:
+                return await step(exec_ctx)
+            try:
+                return await asyncio.wait_for(step(exec_ctx), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                raise WorkflowTimeoutException(f"Deadline exceeded in step '{self.names[cursor]}'") from None
+        result = step(exec_ctx)
+        if not isinstance(result, ExecContextBase) and inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def _call_hooked(self, hooks: Tuple[StepHook, ...], cursor: int, exec_ctx: ExecContext, deadline: Optional[float]) -> Tuple[ExecContext, bool]:
+        """Runs one step between ``on_step_start`` and ``on_step_end``; returns (ctx, skipped)."""
+        name = self._call_names[cursor]
+        for hook in hooks:
+            hook.on_step_start(name, cursor, exec_ctx)
+
+        started = time.perf_counter()
+        try:
+            result = await self._call(cursor, exec_ctx, deadline)
+        except WorkflowAllowException:
+            elapsed = time.perf_counter() - started
+            for hook in hooks:
+                hook.on_step_end(name, cursor, exec_ctx, elapsed, SKIP)
+            return exec_ctx, True
+        except BaseException as e:
+            elapsed = time.perf_counter() - started
+            outcome = ABORT if isinstance(e, WorkflowAbortException) else ERROR
+            for hook in hooks:
+                hook.on_step_end(name, cursor, exec_ctx, elapsed, outcome)
+            raise
+        elapsed = time.perf_counter() - started
+
+        outcome = STOP if result.stop else JUMP if result.jump_to else OK
+        for hook in hooks:
+            hook.on_step_end(name, cursor, result, elapsed, outcome)
+        return result, False
+
+    def _check_exit(self, exec_ctx: ExecContext, cursor: int) -> None:
+        exits = self._exits
+        if exits is not None and exits[cursor] and isinstance(exec_ctx.data, AsyncGeneratorType):
+            raise RuntimeError("Generator leak detected at the end of the flow.")
+
+    def _resolve_jump(self, exec_ctx: ExecContext, origin: int) -> int:
+        target = exec_ctx.jump_to
+        if isinstance(exec_ctx.data, AsyncGeneratorType):
+            raise RuntimeError("Jump is not allowed with active generators.")
+
+        labels = self._labels if self._scopes is None else self._scopes[origin]
+        cursor = labels.get(target, -1)
+        if cursor < 0:
+            raise WorkflowAbortException(
+                f"Invalid jump: The destination '{target}' does not exist in the registry. "
+                f"Available destinations: {list(labels.keys())}"
+            )
+        exec_ctx.jump_to = None
+        return cursor
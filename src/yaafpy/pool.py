@@ -0,0 +1,79 @@
+from typing import Any, Callable, Dict, List, Optional
+
+from yaafpy.types import CompactExecContext, ExecContextBase
+
+_FIELDS = frozenset(("jump_to", "stop", "workflow", "run_id", "deadline"))
+
+
+class ContextPool:
+    """
+    Free-list of contexts for high-rate callers.
+
+    ``acquire`` hands out a recycled context (fields reset) or a new one, and
+    ``release`` returns it. A released context must not be used again by the
+    caller::
+
+        pool = ContextPool()
+        contexts = (pool.acquire(data=item) for item in items)
+        async for result in workflow.run_many(contexts):
+            handle(result)
+            pool.release(result.ctx)
+
+    ``release`` never touches the context's ``shared_data`` dict, which may be
+    the caller's own (``acquire(shared_data=...)``) or one a step assigned:
+    the context gets a new empty dict instead, handed out by the next
+    ``acquire`` without ``shared_data``.
+
+    Recycling saves little on CPython, where building a CompactExecContext
+    is already cheap (``benchmarks/bench_memory.py`` may even show fresh
+    contexts ahead). The point of the pool is fewer allocations, and so
+    less GC work, when many contexts are in flight.
+
+    Not thread-safe: use one pool per event loop.
+    """
+
+    def __init__(self, max_size: int = 1024, factory: Callable[..., ExecContextBase] = CompactExecContext):
+        if max_size < 0:
+            raise ValueError("max_size must be >= 0")
+        self.max_size = max_size
+        self.factory = factory
+        self._free: List[ExecContextBase] = []
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, data: Any = None, shared_data: Optional[Dict[str, Any]] = None, **fields) -> ExecContextBase:
+        if fields and not _FIELDS.issuperset(fields):
+            raise TypeError(f"Unknown context fields: {sorted(set(fields) - _FIELDS)}")
+        free = self._free
+        if not free:
+            self.created += 1
+            return self.factory(data=data, shared_data=shared_data if shared_data is not None else {}, **fields)
+
+        self.reused += 1
+        ctx = free.pop()
+        ctx.data = data
+        # Otherwise keep the empty dict release() left behind
+        if shared_data is not None:
+            ctx.shared_data = shared_data
+        # release() already reset the other fields
+        if fields:
+            for name, value in fields.items():
+                setattr(ctx, name, value)
+        return ctx
+
+    def release(self, ctx: ExecContextBase) -> None:
+        if len(self._free) >= self.max_size:
+            return
+        # Drop references now so pooled contexts do not keep payloads alive
+        ctx.data = None
+        ctx.workflow = None
+        # Never clear the dict in place: it may belong to the caller
+        ctx.shared_data = {}
+        ctx.jump_to = None
+        ctx.stop = False
+        ctx.run_id = None
+        ctx.deadline = None
+        self._free.append(ctx)
+
+    def info(self) -> Dict[str, int]:
+        return {"created": self.created, "reused": self.reused, "free": len(self._free)}
@@ -0,0 +1,387 @@
+import asyncio
+import inspect
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Tuple, Type, Union
+
+from yaafpy.types import (
+    ExecContext,
+    Middleware,
+    WorkflowAbortException,
+    WorkflowAllowException,
+    WorkflowTimeoutException,
+)
+from yaafpy.plan import is_async_step, sync_impl
+
+logger = logging.getLogger("yaaf.resilience")
+
+
+# "abort", "skip" or a fallback middleware
+OnFailure = Union[str, Middleware]
+
+
+async def call_step(step: Middleware, ctx: ExecContext) -> ExecContext:
+    result = step(ctx)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def check_action(action: OnFailure, option: str) -> OnFailure:
+    if action in ("abort", "skip") or callable(action):
+        return action
+    raise ValueError(f"{option} must be 'abort', 'skip' or a fallback middleware, got {action!r}")
+
+
+async def apply_action(action: OnFailure, ctx: ExecContext, error: Exception) -> ExecContext:
+    """Resolves a failed step: re-raise, skip (keep ``ctx``) or run the fallback on ``ctx``."""
+    if action == "abort":
+        raise error
+    if action == "skip":
+        return ctx
+    return await call_step(action, ctx)
+
+
+def is_failure(error: BaseException) -> bool:
+    """
+    True for errors that say something about the backend's health.
+
+    Skips and deliberate aborts are control flow; an abort only counts when it
+    wraps an error (``middleware`` decorator) or reports a timeout.
+    """
+    if isinstance(error, WorkflowAllowException):
+        return False
+    if isinstance(error, WorkflowAbortException):
+        return error.__cause__ is not None or isinstance(error, WorkflowTimeoutException)
+    return isinstance(error, Exception)
+
+
+class CircuitOpenException(WorkflowAbortException):
+    """Abort raised when a step is called while its circuit breaker is open"""
+
+
+class TimeoutStep:
+    """
+    Bounds a step by ``timeout`` seconds and by the context deadline.
+
+    When the step timeout expires the step is cancelled and ``on_timeout``
+    decides what happens: ``"abort"`` raises WorkflowTimeoutException,
+    ``"skip"`` continues with the context as it was before the step and a
+    middleware is run as fallback on that same context. An expired context
+    deadline always aborts, since later steps have no budget left either.
+
+    Only async steps are accepted: a sync step holds the event loop until it
+    returns, so the timeout could never fire. Run it with ``blocking=True``
+    to bound it; the abandoned thread still runs to completion.
+    """
+
+    def __init__(self, middleware: Middleware, timeout: float, on_timeout: OnFailure = "abort"):
+        if timeout <= 0:
+            raise ValueError("timeout must be > 0")
+        if not is_async_step(sync_impl(middleware)):
+            raise ValueError(f"Sync step '{getattr(middleware, '__name__', middleware)}' cannot be interrupted; use blocking=True to bound it with a timeout")
+        self.middleware = middleware
+        self.timeout = timeout
+        self.on_timeout = check_action(on_timeout, "on_timeout")
+        self.__name__ = getattr(middleware, "__name__", type(middleware).__name__)
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        limit = self.timeout
+        left = ctx.time_left()
+        bound_by_deadline = left is not None and left < limit
+        if bound_by_deadline:
+            limit = max(left, 0)
+
+        # Skip/fallback need the pre-step state, so the step works on a fork
+        work = ctx if self.on_timeout == "abort" else ctx.fork()
+        try:
+            return await asyncio.wait_for(call_step(self.middleware, work), limit)
+        except asyncio.TimeoutError:
+            if bound_by_deadline:
+                raise WorkflowTimeoutException(f"Deadline exceeded in step '{self.__name__}'")
+            error = WorkflowTimeoutException(f"Step '{self.__name__}' timed out after {self.timeout}s")
+            logger.warning("%s", error)
+            return await apply_action(self.on_timeout, ctx, error)
+
+
+class HedgedStep:
+    """
+    Speculative execution for tail-latency sensitive steps.
+
+    The step runs on a fork of the context. If it has not finished after
+    ``hedge_after_ms``, a duplicate starts on another fork (up to
+    ``max_hedges`` duplicates, one per interval). The first attempt to
+    succeed wins and the others are cancelled. Failures only surface when
+    every attempt has failed.
+    """
+
+    def __init__(self, middleware: Middleware, hedge_after_ms: float, max_hedges: int = 1):
+        if hedge_after_ms <= 0:
+            raise ValueError("hedge_after_ms must be > 0")
+        if max_hedges < 1:
+            raise ValueError("max_hedges must be >= 1")
+        self.middleware = middleware
+        self.hedge_after = hedge_after_ms / 1000
+        self.max_hedges = max_hedges
+        self.__name__ = getattr(middleware, "__name__", type(middleware).__name__)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        self.calls += 1
+        attempts = [asyncio.ensure_future(call_step(self.middleware, ctx.fork()))]
+        pending = set(attempts)
+        error = None
+        try:
+            while pending:
+                can_hedge = len(attempts) <= self.max_hedges
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    self.hedges += 1
+                    hedge = asyncio.ensure_future(call_step(self.middleware, ctx.fork()))
+                    attempts.append(hedge)
+                    pending.add(hedge)
+                    continue
+
+                # Registration order decides between attempts finishing together
+                for attempt in attempts:
+                    if attempt not in done:
+                        continue
+                    if attempt.exception() is None:
+                        if attempt is not attempts[0]:
+                            self.hedge_wins += 1
+                        return attempt.result()
+                    error = error or attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                if not attempt.done():
+                    attempt.cancel()
+            await asyncio.gather(*attempts, return_exceptions=True)
+
+    def info(self) -> dict:
+        return {"calls": self.calls, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Retry settings for ``Workflow.use(..., retry=...)``.
+
+    Delays grow as ``base_delay * multiplier ** n`` up to ``max_delay`` and,
+    with ``jitter``, are drawn uniformly from ``[0, delay]`` (full jitter) so
+    concurrent runs do not retry in lockstep.
+
+    Attributes:
+        attempts: Total attempts, including the first one.
+        retry_on: Exception types worth retrying. Aborts raised by the
+            ``middleware`` decorator are matched on the wrapped error; other
+            aborts and skips are never retried unless listed explicitly.
+    """
+    attempts: int = 3
+    base_delay: float = 0.1
+    max_delay: float = 5.0
+    multiplier: float = 2.0
+    jitter: bool = True
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,)
+
+    def __post_init__(self):
+        if self.attempts < 1:
+            raise ValueError("attempts must be >= 1")
+
+    def delay(self, retry: int) -> float:
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** retry)
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def should_retry(self, error: BaseException) -> bool:
+        if isinstance(error, (WorkflowAbortException, WorkflowAllowException)):
+            explicit = tuple(t for t in self.retry_on if issubclass(t, (WorkflowAbortException, WorkflowAllowException)))
+            if explicit and isinstance(error, explicit):
+                return True
+            cause = error.__cause__
+            return (
+                cause is not None
+                and not isinstance(cause, (WorkflowAbortException, WorkflowAllowException))
+                and isinstance(cause, self.retry_on)
+            )
+        return isinstance(error, self.retry_on)
+
+
+class RetryStep:
+    """
+    Re-runs a failing step with jittered exponential backoff.
+
+    Every attempt starts from a fork of the original context, so a failed
+    attempt leaves nothing behind. Backoff never sleeps past ``ctx.deadline``.
+    """
+
+    def __init__(self, middleware: Middleware, policy: RetryPolicy):
+        self.middleware = middleware
+        self.policy = policy
+        self.__name__ = getattr(middleware, "__name__", type(middleware).__name__)
+        self.calls = 0
+        self.retries = 0
+        self.exhausted = 0
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        policy = self.policy
+        self.calls += 1
+        for attempt in range(policy.attempts):
+            try:
+                return await call_step(self.middleware, ctx.fork())
+            except Exception as e:
+                if attempt + 1 >= policy.attempts or not policy.should_retry(e):
+                    if attempt:
+                        self.exhausted += 1
+                    raise
+                delay = policy.delay(attempt)
+                left = ctx.time_left()
+                if left is not None and delay >= left:
+                    raise
+                self.retries += 1
+                logger.warning(
+                    "Attempt %d/%d of '%s' failed: %s. Retrying in %.3fs",
+                    attempt + 1, policy.attempts, self.__name__, e, delay,
+                )
+                await asyncio.sleep(delay)
+
+    def info(self) -> dict:
+        return {"calls": self.calls, "retries": self.retries, "exhausted": self.exhausted}
+
+
+class CircuitBreaker:
+    """
+    Classic closed/open/half-open breaker, safe to share across runs and threads.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    calls fail fast for ``reset_timeout`` seconds. Then up to
+    ``half_open_max_calls`` trial calls go through: a success closes the
+    breaker, a failure opens it again. A trial that ends without an outcome
+    (cancelled) gives its slot back with ``release()``, and trials still
+    unresolved after another ``reset_timeout`` are written off, so a lost
+    trial never keeps the breaker half-open forever.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be >= 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_at = 0.0
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._trials < self.half_open_max_calls:
+                self._trials += 1
+                self._trial_at = time.monotonic()
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trials = 0
+
+    def release(self) -> None:
+        """Gives back a trial slot taken by ``allow()`` for a call with no outcome."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trials = 0
+
+    def info(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+    def _refresh(self) -> None:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trials = 0
+        elif (
+            self._state == self.HALF_OPEN and self._trials >= self.half_open_max_calls
+            and time.monotonic() - self._trial_at >= self.reset_timeout
+        ):
+            # The trials never reported back: allow fresh ones
+            self._trials = 0
+
+
+class BreakerStep:
+    """
+    Guards a step with a CircuitBreaker.
+
+    While the breaker is open the step is not called: ``on_open`` decides
+    between failing fast (``"abort"``, raises CircuitOpenException),
+    ``"skip"`` or a fallback middleware.
+    """
+
+    def __init__(self, middleware: Middleware, breaker: CircuitBreaker, on_open: OnFailure = "abort"):
+        self.middleware = middleware
+        self.breaker = breaker
+        self.on_open = check_action(on_open, "on_open")
+        self.__name__ = getattr(middleware, "__name__", type(middleware).__name__)
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        if not self.breaker.allow():
+            error = CircuitOpenException(f"Circuit breaker for '{self.__name__}' is open")
+            return await apply_action(self.on_open, ctx, error)
+        try:
+            result = await call_step(self.middleware, ctx)
+        except Exception as e:
+            # Skips and deliberate aborts still mean the backend answered
+            if is_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            # Cancelled: no verdict on the backend, free the trial slot
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return result
@@ -0,0 +1,301 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Union
+
+from yaafpy.types import ExecContext, Middleware, WorkflowTimeoutException
+
+logger = logging.getLogger("yaaf.resources")
+
+Factory = Callable[[], Union[Any, Awaitable[Any]]]
+CloseFn = Callable[[Any], Union[None, Awaitable[None]]]
+
+SERVICE_KEY = "service"
+
+# Handed to a waiter when a slot frees up without an instance (failed factory)
+_CREATE = object()
+
+
+async def _maybe_await(value: Any) -> Any:
+    if inspect.isawaitable(value):
+        value = await value
+    return value
+
+
+class ResourcePool:
+    """
+    Up to ``size`` instances of a client (HTTP session, DB connection...)
+    shared by every run of a workflow.
+
+    Instances are created on demand, or up front by ``warmup()``, and reused
+    until ``aclose()``. A checkout waits when all of them are in use; with
+    ``timeout`` the wait is bounded and expiry raises WorkflowTimeoutException.
+
+    ``close`` releases an instance; by default its ``aclose()`` or ``close()``
+    method is used when it has one. Both ``factory`` and ``close`` may be async.
+
+    Not thread-safe: a pool serves the event loop it is used from.
+    """
+
+    def __init__(self, name: str, factory: Factory, close: Optional[CloseFn] = None, size: int = 1, timeout: Optional[float] = None):
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout must be > 0")
+        self.name = name
+        self.factory = factory
+        self.close = close
+        self.size = size
+        self.timeout = timeout
+        self._idle: List[Any] = []
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._closed = False
+        self.created = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    async def warmup(self) -> None:
+        """Creates the missing instances so the first runs do not pay for them."""
+        missing = self.size - self.created
+        if missing <= 0 or self._closed:
+            return
+        self.created += missing
+        results = await asyncio.gather(*(self._create() for _ in range(missing)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                self.created -= 1
+                self._free_slot()
+            else:
+                # Counted in use until _put() parks it or hands it to a waiter
+                self.in_use += 1
+                self._put(result)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+
+    async def acquire(self) -> Any:
+        if self._closed:
+            raise RuntimeError(f"Resource '{self.name}' is closed")
+        self.checkouts += 1
+        if self._idle:
+            instance = self._idle.pop()
+        elif self.created < self.size:
+            self.created += 1
+            instance = await self._create_or_free()
+        else:
+            instance = await self._wait()
+            if instance is not _CREATE:
+                # Handed over by release(): the slot was never counted free
+                self.peak_in_use = max(self.peak_in_use, self.in_use)
+                return instance
+            instance = await self._create_or_free()
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return instance
+
+    async def release(self, instance: Any) -> None:
+        if self._closed:
+            self.in_use -= 1
+            self.created -= 1
+            await self._close(instance)
+            return
+        self._put(instance)
+
+    @asynccontextmanager
+    async def checkout(self) -> AsyncIterator[Any]:
+        instance = await self.acquire()
+        try:
+            yield instance
+        finally:
+            await self.release(instance)
+
+    async def aclose(self) -> None:
+        """Closes idle instances now and checked-out ones when they are released."""
+        self._closed = True
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(RuntimeError(f"Resource '{self.name}' is closed"))
+        idle, self._idle = self._idle, []
+        self.created -= len(idle)
+        for instance in idle:
+            await self._close(instance)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "created": self.created,
+            "idle": len(self._idle),
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "utilization": self.in_use / self.size,
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "wait_time": self.wait_time,
+        }
+
+    async def _create(self) -> Any:
+        return await _maybe_await(self.factory())
+
+    async def _create_or_free(self) -> Any:
+        try:
+            return await self._create()
+        except BaseException:
+            self.created -= 1
+            self._free_slot()
+            raise
+
+    def _free_slot(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.created += 1
+                waiter.set_result(_CREATE)
+                return
+
+    def _put(self, instance: Any) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(instance)
+                return
+        self.in_use -= 1
+        self._idle.append(instance)
+
+    async def _wait(self) -> Any:
+        self.waits += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._give_back(waiter)
+            raise WorkflowTimeoutException(f"No '{self.name}' resource free within {self.timeout}s") from None
+        except BaseException:
+            self._give_back(waiter)
+            raise
+        finally:
+            self.wait_time += time.perf_counter() - started
+
+    def _give_back(self, waiter: asyncio.Future) -> None:
+        # The wait ended (timeout, cancellation) just as a slot was handed over
+        if not waiter.done() or waiter.cancelled() or waiter.exception() is not None:
+            waiter.cancel()
+            return
+        instance = waiter.result()
+        if instance is _CREATE:
+            self.created -= 1
+            self._free_slot()
+        elif self._closed:
+            self.in_use -= 1
+            self.created -= 1
+            asyncio.ensure_future(self._close(instance))
+        else:
+            self._put(instance)
+
+    async def _close(self, instance: Any) -> None:
+        close = self.close
+        if close is None:
+            close = getattr(instance, "aclose", None) or getattr(instance, "close", None)
+            if close is None:
+                return
+            call = close()
+        else:
+            call = close(instance)
+        try:
+            await _maybe_await(call)
+        except Exception:
+            logger.exception("Closing resource '%s' failed", self.name)
+
+
+class ResourceRegistry:
+    """
+    The resource pools declared on a workflow, by name.
+
+    Steps name the pools they need; for the duration of the step one instance
+    of each is checked out and exposed as ``ctx.shared_data["service"][name]``
+    (the key is removed again afterwards, so checkpoints never see clients).
+    """
+
+    def __init__(self, pools: Optional[Iterable[ResourcePool]] = None):
+        self._pools: Dict[str, ResourcePool] = {}
+        for pool in pools or ():
+            self.add(pool)
+
+    def add(self, pool: ResourcePool) -> None:
+        if pool.name in self._pools:
+            raise ValueError(f"Resource '{pool.name}' is already registered")
+        self._pools[pool.name] = pool
+
+    def resolve(self, names: Sequence[str]) -> List[ResourcePool]:
+        missing = [name for name in names if name not in self._pools]
+        if missing:
+            raise KeyError(f"Unknown resources {missing}; registered: {sorted(self._pools)}")
+        return [self._pools[name] for name in names]
+
+    async def warmup(self) -> None:
+        await asyncio.gather(*(pool.warmup() for pool in self._pools.values()))
+
+    async def aclose(self) -> None:
+        # Reverse declaration order, so later resources may depend on earlier ones
+        for pool in reversed(list(self._pools.values())):
+            await pool.aclose()
+
+    def info(self) -> Dict[str, Dict[str, Any]]:
+        return {name: pool.info() for name, pool in self._pools.items()}
+
+    def __bool__(self) -> bool:
+        return bool(self._pools)
+
+
+@asynccontextmanager
+async def checked_out(pools: Sequence[ResourcePool], ctx: ExecContext) -> AsyncIterator[ExecContext]:
+    """Checks out one instance per pool and exposes them in ``ctx.shared_data["service"]``."""
+    instances = []
+    try:
+        for pool in pools:
+            instances.append(await pool.acquire())
+        shared = ctx.shared_data
+        previous = shared.get(SERVICE_KEY)
+        # A new dict: forks share the outer one
+        services = dict(previous or {})
+        services.update((pool.name, instance) for pool, instance in zip(pools, instances))
+        shared[SERVICE_KEY] = services
+        try:
+            yield ctx
+        finally:
+            _restore(shared, previous)
+    finally:
+        for pool, instance in zip(pools, instances):
+            await pool.release(instance)
+
+
+class ResourceStep:
+    """Runs a step with instances of ``pools`` checked out, see ResourceRegistry."""
+
+    def __init__(self, middleware: Middleware, pools: Sequence[ResourcePool]):
+        self.middleware = middleware
+        self.pools = tuple(pools)
+        self.__name__ = getattr(middleware, "__name__", type(middleware).__name__)
+
+    async def __call__(self, ctx: ExecContext) -> ExecContext:
+        previous = ctx.shared_data.get(SERVICE_KEY)
+        async with checked_out(self.pools, ctx):
+            result = await _maybe_await(self.middleware(ctx))
+        if result is not None and result.shared_data is not ctx.shared_data:
+            _restore(result.shared_data, previous)
+        return result
+
+
+def _restore(shared: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    if previous is None:
+        shared.pop(SERVICE_KEY, None)
+    else:
+        shared[SERVICE_KEY] = previous
@@ -0,0 +1,130 @@
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Optional
+
+from yaafpy.types import WorkflowTimeoutException
+
+
+class SyncRunner:
+    """
+    Event loop in a background thread for callers without one.
+
+    Sync code (WSGI handlers, scripts) submits coroutines from any number of
+    threads and blocks on the result. The loop lives as long as the runner,
+    so batchers, breakers, caches and pooled connections stay warm between
+    calls instead of being rebuilt by ``asyncio.run`` every time::
+
+        runner = SyncRunner()
+        ctx = runner.run(workflow.run(ExecContext(data=payload)))
+        runner.close()
+
+    The loop thread starts on first use. ``Workflow.run_sync`` uses a shared
+    runner closed at interpreter exit.
+    """
+
+    def __init__(self, name: str = "yaaf-runner"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The runner's event loop, started if needed."""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    self._start()
+        return self._loop
+
+    def submit(self, awaitable: Awaitable[Any]) -> concurrent.futures.Future:
+        """Schedules ``awaitable`` on the loop and returns a thread-safe future."""
+        try:
+            loop = self.loop
+            if threading.current_thread() is self._thread:
+                raise RuntimeError("SyncRunner.run() called from its own loop thread; await the coroutine instead")
+        except BaseException:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise
+        return asyncio.run_coroutine_threadsafe(_await(awaitable), loop)
+
+    def run(self, awaitable: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """
+        Runs ``awaitable`` on the loop and blocks the calling thread for its result.
+
+        Raises:
+            WorkflowTimeoutException: ``timeout`` seconds passed; the run is cancelled.
+        """
+        future = self.submit(awaitable)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise WorkflowTimeoutException(f"Run did not finish within {timeout}s") from None
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Cancels pending runs, stops the loop and joins its thread."""
+        with self._lock:
+            self._closed = True
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        loop.close()
+
+    def __enter__(self) -> "SyncRunner":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _start(self) -> None:
+        if self._closed:
+            raise RuntimeError("SyncRunner is closed")
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def serve():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name=self.name, daemon=True)
+        self._thread.start()
+        ready.wait()
+        self._loop = loop
+
+
+async def _await(awaitable: Awaitable[Any]) -> Any:
+    return await awaitable
+
+
+async def _shutdown() -> None:
+    current = asyncio.current_task()
+    tasks = [task for task in asyncio.all_tasks() if task is not current]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.get_running_loop().shutdown_asyncgens()
+
+
+_default: Optional[SyncRunner] = None
+_default_lock = threading.Lock()
+
+
+def default_runner() -> SyncRunner:
+    """Process-wide runner used by ``Workflow.run_sync``, closed at exit."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = SyncRunner()
+                atexit.register(_default.close)
+    return _default
@@ -1,81 +1,550 @@
+import asyncio
+import hashlib
 import logging
-import inspect
-from typing import Callable, List, Dict, Optional, Awaitable, TypeAlias, Union
-from yaafpy.types import ExecContext, WorkflowAbortException, Middleware
+from concurrent.futures import Executor
+from typing import Any, Callable, List, Dict, Optional, Awaitable, Sequence, Tuple, TypeAlias, Union, Iterable, AsyncIterable, AsyncIterator
+from yaafpy.types import ExecContext, WorkflowAbortException, Middleware, RunResult
+from yaafpy.plan import ExecutionPlan, run_with_budget
+from yaafpy.batching import MicroBatcher, BatchFn
+from yaafpy.parallel import ParallelStep, Branch, MergeFn
+from yaafpy.loops import LoopStep, ConvergeKey
+from yaafpy.offload import BlockingLimiter, BlockingStep, is_blocking
+from yaafpy.runner import SyncRunner, default_runner
+from yaafpy.resources import ResourcePool, ResourceRegistry, ResourceStep
+from yaafpy.cache import CachePolicy, CachedStep
+from yaafpy.checkpoint import CheckpointStore, Checkpointer
+from yaafpy.resilience import TimeoutStep, HedgedStep, RetryPolicy, RetryStep, CircuitBreaker, BreakerStep, OnFailure
+from yaafpy.instrumentation import StepHook, StatsCollector, merge_step_info
+from yaafpy.tracing import Tracer, active_tracer
 
 logger = logging.getLogger("yaaf.workflow")
 
 
 
 class Workflow:
-    def __init__(self):
+    # Definition changes across all workflows; lets _get_plan skip checking inlined children
+    _changes = 0
+
+    def __init__(self, checkpoints: Optional[CheckpointStore] = None, stats: bool = False, tracer: Optional[Tracer] = None, executor: Optional[Executor] = None, max_blocking: Optional[int] = None, resources: Optional[Iterable[ResourcePool]] = None):
+        """
+        Args:
+            checkpoints: Optional store. When set, the context and cursor are
+                persisted after every step and ``resume(run_id)`` continues
+                an interrupted run. Writes happen in a background thread.
+            stats: Collect per-step latency histograms and outcome counts,
+                reported by ``stats()``. Off by default: a workflow without
+                hooks runs the uninstrumented loop.
+            tracer: Record run and step spans. Nested workflows join the
+                trace of the step that calls them.
+            executor: Thread pool for blocking steps. Defaults to the event
+                loop's default executor.
+            max_blocking: Most blocking calls this workflow keeps in flight;
+                further calls wait on the event loop. Unbounded by default.
+            resources: Client pools (HTTP sessions, DB connections...) created
+                once and checked out by the steps that name them in ``use``.
+                Close them with ``aclose()`` or ``async with workflow:``.
+        """
         self._middleware: List[Middleware] = []
         self._registry: Dict[str, tuple[int, Optional[str]]] = {}
-        
+        self._names: List[str] = []
+        self._jumps: List[bool] = []
+        self._plan: Optional[ExecutionPlan] = None
+        # Used instead of a flattened _plan when run inside someone else's trace
+        self._nested_plan: Optional[ExecutionPlan] = None
+        # Bumped on every definition change; parents that inlined this workflow recompile
+        self._version = 0
+        # Value of Workflow._changes when the plan's inlined children were last checked
+        self._checked = -1
+        # Stateful step wrappers (cache, hedge, retry, breaker) by registry name
+        self._policies: Dict[str, Dict[str, Any]] = {}
+        self._checkpointer: Optional[Checkpointer] = Checkpointer(checkpoints) if checkpoints is not None else None
+        self._hooks: List[StepHook] = []
+        self._stats: Optional[StatsCollector] = None
+        if stats:
+            self._stats = StatsCollector()
+            self._hooks.append(self._stats)
+        if tracer is not None:
+            self._hooks.append(tracer)
+        if max_blocking is not None and max_blocking < 1:
+            raise ValueError("max_blocking must be >= 1")
+        self._executor = executor
+        self._blocking_limiter = BlockingLimiter(max_blocking) if max_blocking is not None else None
+        self._resources = ResourceRegistry(resources)
+
 
     async def __call__(self, ctx: ExecContext) -> ExecContext:
         """Allows the workflow to be used as a middleware."""
         return await self.run(ctx)
 
 
-    def use(self, middleware: Middleware, name: Optional[str] = None, description: Optional[str] = None): # Coul be interesting add description to the middlewares
+    def use(self, middleware: Middleware, name: Optional[str] = None, description: Optional[str] = None, jumps: bool = True, cache: Optional[CachePolicy] = None, timeout: Optional[float] = None, on_timeout: OnFailure = "abort", hedge_after_ms: Optional[float] = None, max_hedges: int = 1, retry: Optional[RetryPolicy] = None, breaker: Union[CircuitBreaker, bool, None] = None, on_open: OnFailure = "abort", blocking: Optional[bool] = None, resources: Optional[Sequence[str]] = None): # Coul be interesting add description to the middlewares
+        """
+        Registers a middleware.
+
+        Args:
+            middleware: Sync or async callable receiving and returning an ExecContext.
+            name: Registry label used as jump target. Defaults to the function name.
+            description: Free text stored next to the label.
+            jumps: Set to False to promise the step never sets ``jump_to``.
+                Consecutive sync steps with ``jumps=False`` are fused into a single call.
+            cache: Memoize the step. On a hit the step is skipped and its cached
+                changes are applied to the context. See ``cache_info()``.
+            timeout: Seconds the step may take (also bounded by ``ctx.deadline``).
+                Sync steps need ``blocking=True``, the event loop cannot interrupt them.
+            on_timeout: ``"abort"`` (default), ``"skip"`` or a fallback middleware
+                run on the pre-step context when the step times out.
+            hedge_after_ms: Start a duplicate attempt when the step is still running
+                after this many milliseconds; the first to finish wins. See ``hedge_info()``.
+            max_hedges: Maximum number of duplicate attempts per call.
+            retry: Re-run the step on transient errors with jittered exponential backoff.
+            breaker: A CircuitBreaker, or True for the breaker already registered under
+                this name (a default one is created). Its state is shared by all runs.
+            on_open: ``"abort"`` (fail fast, default), ``"skip"`` or a fallback
+                middleware used while the breaker is open.
+            blocking: Run a sync step in the workflow's thread pool so it does
+                not stall concurrent runs. Defaults to True for steps marked
+                with ``@blocking``. See ``blocking_info()``.
+            resources: Names of workflow resources the step needs. One instance
+                of each is checked out per call and exposed as
+                ``ctx.shared_data["service"][name]`` while the step runs.
+
+        Wrappers apply from the inside out: blocking, resources, hedge, timeout,
+        breaker, retry, cache.
+        """
+        label = name or middleware.__name__
+        policies = self._policies.setdefault(label, {})
+        if blocking is None:
+            blocking = is_blocking(middleware)
+        if blocking:
+            middleware = policies["blocking"] = BlockingStep(middleware, self._executor, self._blocking_limiter)
+        if resources:
+            middleware = ResourceStep(middleware, self._resources.resolve(resources))
+        if hedge_after_ms is not None:
+            middleware = policies["hedge"] = HedgedStep(middleware, hedge_after_ms, max_hedges)
+        if timeout is not None:
+            middleware = TimeoutStep(middleware, timeout, on_timeout)
+        if breaker:
+            if breaker is True:
+                breaker = policies.get("breaker") or CircuitBreaker()
+            policies["breaker"] = breaker
+            middleware = BreakerStep(middleware, breaker, on_open)
+        if retry is not None:
+            middleware = policies["retry"] = RetryStep(middleware, retry)
+        if cache is not None:
+            middleware = policies["cache"] = CachedStep(middleware, cache)
+        if not policies:
+            del self._policies[label]
+
         self._middleware.append(middleware)
-        if name:
-            self._registry[name] = (len(self._middleware) - 1, description)
-        else:
-            self._registry[middleware.__name__] = (len(self._middleware) - 1, description)   
+        self._registry[label] = (len(self._middleware) - 1, description)
+        self._names.append(label)
+        self._jumps.append(jumps)
+        self._invalidate()
+        return self
+
+    def use_batched(self, fn: BatchFn, max_batch_size: int = 32, max_wait_ms: float = 5.0, name: Optional[str] = None, description: Optional[str] = None):
+        """
+        Registers a step that is executed once for a batch of concurrent runs.
+
+        Args:
+            fn: Receives a list of ExecContext gathered from in-flight runs and
+                returns None (updated in place) or one ExecContext per input.
+            max_batch_size: Flush as soon as this many contexts are waiting.
+            max_wait_ms: Longest time the first waiting context is held back.
+            name: Registry label. Defaults to the function name.
+            description: Free text stored next to the label.
+        """
+        return self.use(MicroBatcher(fn, max_batch_size, max_wait_ms), name=name, description=description)
+
+    def parallel(self, *branches: Branch, merge: Optional[MergeFn] = None, name: Optional[str] = None, description: Optional[str] = None):
+        """
+        Registers a fan-out/fan-in step.
+
+        Branches (child workflows or middlewares) run concurrently on forks of
+        the context and their results are merged back before the next step.
+        An abort or error in any branch cancels the others.
+
+        Args:
+            branches: Workflows or middlewares to run concurrently.
+            merge: ``merge(ctx, results) -> ctx``. Defaults to ``merge_branches``,
+                which applies each branch's changes in order (later branches win).
+            name: Registry label. Defaults to ``parallel:<branch names>``.
+            description: Free text stored next to the label.
+        """
+        return self.use(ParallelStep(branches, merge), name=name, description=description)
+
+    def loop(
+        self,
+        body: Union["Workflow", Middleware],
+        until: Optional[Callable[[ExecContext], bool]] = None,
+        max_iterations: int = 10,
+        max_elapsed: Optional[float] = None,
+        converge: Union[bool, ConvergeKey, None] = None,
+        on_limit: str = "abort",
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+    ):
+        """
+        Registers a bounded loop, e.g. a ReAct-style agent loop.
+
+        ``body`` (a child workflow or a middleware) runs until ``until(ctx)``
+        is true, the body stops the run or sets ``jump_to``, or, with
+        ``converge``, an iteration leaves the key unchanged.
+
+        Args:
+            body: Workflow or middleware executed once per iteration.
+            until: Exit condition checked after every iteration.
+            max_iterations: Hard bound on iterations.
+            max_elapsed: Seconds after which no new iteration starts.
+            converge: True to exit when ``ctx.data`` stops changing (value hash),
+                or a function returning the value to compare between iterations.
+            on_limit: ``"abort"`` (WorkflowBudgetException, default) or
+                ``"continue"`` with the last context when a bound is reached.
+            name: Registry label. Defaults to ``"loop:<body name>"``.
+            description: Free text stored next to the label.
+
+        Per-run iteration timings and the exit reason are written to
+        ``ctx.shared_data["metadata"]["loops"][name]``; totals are in ``loop_info()``.
+        """
+        step = LoopStep(body, until, max_iterations, max_elapsed, converge, on_limit, name)
+        self._policies.setdefault(step.__name__, {})["loop"] = step
+        return self.use(step, name=step.__name__, description=description)
+
+    def cache_info(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss/eviction counters of every cached step, keyed by registry name."""
+        return self._policy_info("cache")
+
+    def hedge_info(self) -> Dict[str, Dict[str, int]]:
+        """How often hedges fired and won for every hedged step, keyed by registry name."""
+        return self._policy_info("hedge")
+
+    def retry_info(self) -> Dict[str, Dict[str, int]]:
+        """Retry counters of every step with a retry policy, keyed by registry name."""
+        return self._policy_info("retry")
+
+    def breaker_info(self) -> Dict[str, Dict[str, Any]]:
+        """State and counters of every circuit breaker, keyed by registry name."""
+        return self._policy_info("breaker")
+
+    def loop_info(self) -> Dict[str, Dict[str, Any]]:
+        """Iteration totals and exit reasons of every loop, keyed by registry name."""
+        return self._policy_info("loop")
+
+    def blocking_info(self) -> Dict[str, Dict[str, Any]]:
+        """Thread-pool calls, waits for a free slot and in-flight counts of blocking steps."""
+        return self._policy_info("blocking")
+
+    def add_resource(self, pool: ResourcePool):
+        """Declares a resource pool that steps can name in ``use(..., resources=[...])``."""
+        self._resources.add(pool)
+        return self
+
+    async def warmup(self) -> None:
+        """Creates every resource instance up front instead of on first checkout."""
+        await self._resources.warmup()
+
+    async def aclose(self) -> None:
+        """Closes the workflow's resources; instances in use close when released."""
+        await self._resources.aclose()
+
+    async def __aenter__(self) -> "Workflow":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def resource_info(self) -> Dict[str, Dict[str, Any]]:
+        """Size, checkouts, waits and utilization of every resource pool, by name."""
+        return self._resources.info()
+
+    def add_hook(self, hook: StepHook):
+        """Installs a StepHook, called around every run and every step."""
+        self._hooks.append(hook)
+        self._invalidate()
         return self
 
-    async def run(self, ctx: Optional[ExecContext] = None) -> ExecContext:
-            
-            exec_ctx = ctx if ctx is not None else ExecContext()
-            exec_ctx.workflow = self
-            
-            # Determinamos inicio (cursor)
-            cursor = 0 if exec_ctx.jump_to is None else self._registry[exec_ctx.jump_to][0]
-            exec_ctx.jump_to = None
-            
-            n = len(self._middleware)
+    def remove_hook(self, hook: StepHook):
+        self._hooks.remove(hook)
+        self._invalidate()
+        return self
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-step latency and outcome counters, keyed by registry name.
+
+        Each step reports ``calls``, ``skips``, ``jumps``, ``stops``, ``aborts``,
+        ``errors``, latency totals and p50/p90/p99 estimates from a log2
+        histogram, plus the counters of its cache/hedge/retry/breaker/loop/blocking policies.
+        Steps fused with ``jumps=False`` are reported as one "a+b" entry.
+        Latency is only collected for workflows created with ``stats=True``.
+        """
+        snapshot = self._stats.snapshot() if self._stats is not None else {"runs": 0, "failed_runs": 0, "steps": {}}
+        for kind in ("cache", "hedge", "retry", "breaker", "loop", "blocking"):
+            merge_step_info(snapshot, self._policy_info(kind), kind)
+        return snapshot
+
+    def reset_stats(self) -> None:
+        if self._stats is not None:
+            self._stats.reset()
 
+    def _policy_info(self, kind: str) -> Dict[str, Dict[str, Any]]:
+        return {label: policies[kind].info() for label, policies in self._policies.items() if kind in policies}
+
+    def compile(self, flatten: bool = True) -> ExecutionPlan:
+        """
+        Freezes the current middleware list into an immutable ExecutionPlan.
+
+        Jump labels are resolved to indices and steps are classified as sync
+        or async once, so repeated runs of the same definition skip that work.
+
+        With ``flatten``, child workflows used as steps (directly or through
+        ``as_middleware``) are inlined into one flat step table, recursively,
+        so nesting costs nothing at run time. Inlined steps are named
+        ``"<child label>.<step>"`` and those names are also valid start labels;
+        jumps issued inside a child still resolve against the child's own
+        labels. Children with their own checkpoint store or hooks are kept
+        as nested runs, and so are all children of a workflow with a
+        checkpoint store: checkpoint cursors always index its own steps.
+        Changing an inlined child recompiles the parent.
+        Nothing is inlined into a workflow with a Tracer, and ``run`` falls
+        back to nested runs when called inside another workflow's trace, so
+        every child still gets its workflow and run spans.
+        Returns:
+            An ExecutionPlan exposing the same ``run`` contract as the workflow.
+        """
+        if flatten and self._checkpointer is None and not any(isinstance(hook, Tracer) for hook in self._hooks):
+            table = _FlatTable()
+            self._flatten("", (self,), table)
+            if table.children:
+                return ExecutionPlan(
+                    self, tuple(table.steps), tuple(table.names), table.labels, tuple(table.jumps),
+                    checkpointer=self._checkpointer, hooks=tuple(self._hooks),
+                    owners=tuple(table.owners), scopes=tuple(table.scopes), inlined=tuple(table.children),
+                    ends=tuple(table.ends), fingerprint=self._fingerprint(),
+                )
+
+        labels = {label: index for label, (index, _) in self._registry.items()}
+        return ExecutionPlan(
+            self, tuple(self._middleware), tuple(self._names), labels, tuple(self._jumps),
+            checkpointer=self._checkpointer, hooks=tuple(self._hooks), fingerprint=self._fingerprint(),
+        )
+
+    def _fingerprint(self) -> str:
+        # From the registered steps, not the compiled shape: flattened and
+        # nested plans of one definition resume each other's checkpoints
+        return hashlib.sha1("\x1f".join(self._names).encode()).hexdigest()
+
+    async def run(self, ctx: Optional[ExecContext] = None, max_steps: Optional[int] = None) -> ExecContext:
+        """
+        Args:
+            ctx: Context to run; a new one when omitted.
+            max_steps: Abort with WorkflowBudgetException once this many steps
+                have run, counting loop iterations and nested workflows.
+        """
+        plan = self._get_plan()
+        if plan.inlined and active_tracer() is not None:
+            plan = self._get_nested_plan()
+        if max_steps is None:
+            return await plan.run(ctx)
+        return await run_with_budget(plan, ctx, max_steps)
+
+    def run_sync(self, ctx: Optional[ExecContext] = None, max_steps: Optional[int] = None, timeout: Optional[float] = None, runner: Optional[SyncRunner] = None) -> ExecContext:
+        """
+        Runs the workflow from sync code and blocks until it finishes.
+
+        The run executes on the long-lived loop thread of ``runner`` (a shared
+        process-wide SyncRunner by default), so it is safe to call from many
+        threads at once and state kept by the workflow's steps stays warm
+        across calls. It blocks the calling thread, so async code should
+        ``await run()`` instead.
+
+        Args:
+            ctx: Context to run; a new one when omitted.
+            max_steps: See ``run``.
+            timeout: Seconds to wait before cancelling the run with
+                WorkflowTimeoutException.
+            runner: SyncRunner to execute on.
+        """
+        return (runner or default_runner()).run(self.run(ctx, max_steps=max_steps), timeout)
+
+    async def resume(self, run_id: str) -> ExecContext:
+        """
+        Continues a checkpointed run from the step after the last one completed.
+
+        Raises:
+            RuntimeError: The workflow was created without a checkpoint store.
+            KeyError: There is no checkpoint for ``run_id`` (never started or already finished).
+            ValueError: The checkpoint was written by a workflow with different steps.
+        """
+        if self._checkpointer is None:
+            raise RuntimeError("resume() needs a Workflow created with a checkpoint store.")
+
+        plan = self._get_plan()
+        checkpoint = await self._checkpointer.load(run_id)
+        if checkpoint is None:
+            raise KeyError(f"No checkpoint for run '{run_id}'")
+        if checkpoint.fingerprint != plan.fingerprint:
+            raise ValueError(f"Checkpoint for run '{run_id}' belongs to a different workflow definition.")
+
+        ctx = self._checkpointer.restore(checkpoint)
+        logger.info("Resuming run %s at step %s", run_id, plan.names[checkpoint.cursor])
+        return await plan.execute(ctx, checkpoint.cursor)
+
+    async def flush_checkpoints(self) -> None:
+        """Waits until all pending checkpoint writes have reached the store."""
+        if self._checkpointer is not None:
+            await self._checkpointer.flush()
+
+    def _get_plan(self) -> ExecutionPlan:
+        plan = self._plan
+        if plan is None:
+            plan = self._plan = self.compile()
+            self._checked = Workflow._changes
+        elif plan.inlined and self._checked != Workflow._changes:
+            # Some workflow changed since the last check: was it an inlined child?
+            if any(child._version != version for child, version in plan.inlined):
+                plan = self._plan = self.compile()
+            self._checked = Workflow._changes
+        return plan
+
+    def _get_nested_plan(self) -> ExecutionPlan:
+        plan = self._nested_plan
+        if plan is None:
+            plan = self._nested_plan = self.compile(flatten=False)
+        return plan
+
+    def _invalidate(self) -> None:
+        self._plan = None
+        self._nested_plan = None
+        self._version += 1
+        Workflow._changes += 1
+
+    def _flatten(self, prefix: str, stack: Tuple["Workflow", ...], table: "_FlatTable") -> None:
+        starts = []
+        own = []
+        for index, step in enumerate(self._middleware):
+            starts.append(len(table.steps))
+            name = self._names[index]
+            child = _inline_target(step)
+            if child is not None and child not in stack:
+                table.children.append((child, child._version))
+                child._flatten(f"{prefix}{name}.", stack + (child,), table)
+                table.ends.append(len(table.steps) - 1)
+                continue
+            own.append(len(table.steps))
+            table.steps.append(step)
+            table.names.append(prefix + name)
+            table.jumps.append(self._jumps[index])
+            table.owners.append(self)
+            table.scopes.append(None)
+
+        scope = {label: starts[index] for label, (index, _) in self._registry.items()}
+        for position in own:
+            table.scopes[position] = scope
+        for label, position in scope.items():
+            # Own labels win over namespaced child labels that happen to match
+            table.labels[prefix + label] = position
+
+    async def run_many(
+        self,
+        contexts: Union[Iterable[ExecContext], AsyncIterable[ExecContext]],
+        max_concurrency: int = 64,
+        ordered: bool = True,
+    ) -> AsyncIterator[RunResult]:
+        """
+        Runs the workflow over many contexts with bounded concurrency.
+
+        Contexts are pulled lazily from ``contexts`` (sync or async iterable),
+        so at most ``max_concurrency`` runs exist at any time. A failing run
+        never affects the others: its error is reported in the RunResult.
+
+        Args:
+            contexts: Contexts to execute.
+            max_concurrency: Upper bound of runs in flight. With ``ordered=True``
+                finished runs waiting for an earlier one also count, which keeps
+                memory bounded when the head of the batch is slow.
+            ordered: Yield results in submission order instead of completion order.
+        Yields:
+            One RunResult per submitted context.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+
+        if hasattr(contexts, "__aiter__"):
+            source = contexts.__aiter__()
+            is_async = True
+        else:
+            source = iter(contexts)
+            is_async = False
+
+        async def run_one(index: int, ctx: ExecContext) -> RunResult:
             try:
-                while cursor < n:
-                    
-                    # El decorador garantiza que aquí siempre recibimos un ExecContext 
-                    # o se lanza una WorkflowAbortException.
-                    exec_ctx = await self._middleware[cursor](exec_ctx)
-
-                    if exec_ctx.stop:
-                        return exec_ctx
-
-                    # Jump logic (Only solid data)
-                    if exec_ctx.jump_to:
-                        if inspect.isasyncgen(exec_ctx.data):
-                            raise RuntimeError("Jump is not allowed with active generators.")
-                        
-                        # 2. Validate the existence of the destination
-                        if exec_ctx.jump_to not in self._registry:
-                            # Abort with a message that helps the developer
-                            raise WorkflowAbortException(
-                                f"Invalid jump: The destination '{exec_ctx.jump_to}' does not exist in the registry. "
-                                f"Available destinations: {list(self._registry.keys())}"
-                            )
-                        
-                        cursor = self._registry[exec_ctx.jump_to][0]
-                        exec_ctx.jump_to = None
-                        continue
-
-                    cursor += 1
-
-                # Final Integrity Validation
-                if inspect.isasyncgen(exec_ctx.data):
-                    raise RuntimeError("Generator leak detected at the end of the flow.")
-
-            except WorkflowAbortException:
-                # The abort rises here, marks the stop and the finally cleans everything.
-                exec_ctx.stop = True
-                raise 
-
-            
-            return exec_ctx
-            
+                return RunResult(index, await self.run(ctx))
+            except WorkflowAbortException as e:
+                # The run may have aborted on a context a step returned in its place
+                ctx.stop = True
+                return RunResult(index, ctx, e)
+            except Exception as e:
+                return RunResult(index, ctx, e)
+
+        pending = set()
+        finished: Dict[int, RunResult] = {}
+        submitted = 0
+        next_index = 0
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and len(pending) + len(finished) < max_concurrency:
+                    try:
+                        ctx = await source.__anext__() if is_async else next(source)
+                    except (StopIteration, StopAsyncIteration):
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(run_one(submitted, ctx)))
+                    submitted += 1
+
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    result = task.result()
+                    if ordered:
+                        finished[result.index] = result
+                    else:
+                        yield result
+
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+        finally:
+            # Consumer stopped early (break/aclose) or got cancelled
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+
+class _FlatTable:
+    """Step table being built by ``Workflow._flatten``."""
+
+    def __init__(self):
+        self.steps: List[Middleware] = []
+        self.names: List[str] = []
+        self.jumps: List[bool] = []
+        self.owners: List[Workflow] = []
+        self.scopes: List[Optional[Dict[str, int]]] = []
+        self.labels: Dict[str, int] = {}
+        self.children: List[Tuple[Workflow, int]] = []
+        # Index of the last step of each inlined child
+        self.ends: List[int] = []
+
 
+def _inline_target(step: Any) -> Optional[Workflow]:
+    """The child workflow a step would run, when it can be inlined."""
+    child = step if isinstance(step, Workflow) else getattr(step, "_yaaf_workflow", None)
+    if type(child) is not Workflow or child._checkpointer is not None or child._hooks or not child._middleware:
+        return None
+    return child
@@ -1,7 +1,33 @@
 from yaafpy.types import Transform
+import asyncio
 import inspect
-from typing import Any, List, AsyncGenerator, Dict, Optional
-from yaafpy.types import ExecContext, Transform, StreamHandler, WorkflowAbortException
+import time
+from functools import partial
+from typing import Any, Callable, List, AsyncGenerator, Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
+from yaafpy.types import ExecContext, Transform, StreamHandler, WorkflowAbortException, WorkflowTimeoutException
+from yaafpy.tracing import STAGE, STREAM, Span, Tracer, open_span, traced_stream
+from yaafpy.resources import ResourcePool, ResourceRegistry, checked_out
+from yaafpy.plan import is_async_step
+
+# (source, ctx) -> the stage's async generator
+StageFactory = Callable[[AsyncGenerator, ExecContext], AsyncGenerator]
+
+
+class _StageSpec(NamedTuple):
+    """How a registered middleware runs, decided once in ``use()``."""
+    is_transform: bool
+    concurrency: int
+    ordered: bool
+    buffer: int
+    vectorized: bool = False
+
+
+def _require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("batch_format='numpy' needs NumPy: pip install 'yaafpy[numpy]'") from None
+    return numpy
 
 
 class StreamWorkflow:
@@ -18,17 +44,88 @@ class StreamWorkflow:
       because they can block the event loop.
     """
 
-    def __init__(self):
+    def __init__(self, tracer: Optional[Tracer] = None, resources: Optional[Iterable[ResourcePool]] = None, fuse: bool = True, batch_size: int = 256, batch_format: str = "list"):
+        """
+        Args:
+            tracer: Record a span for the stream and one per stage (item
+                counts, time from first pull to close). Streams started from
+                a traced step join that trace even without a tracer.
+            resources: Client pools created once and shared by every run.
+                Stages name the ones they need in ``use``; close them with
+                ``aclose()`` or ``async with workflow:``.
+            fuse: Run adjacent item handlers ``(item, ctx)`` in one loop
+                instead of one async generator each. Traced runs keep one
+                stage per handler so every handler gets its span.
+            batch_size: Items per batch handed to vectorized handlers.
+            batch_format: ``"list"`` or ``"numpy"`` (``numpy.asarray`` of the
+                items; needs the ``numpy`` extra).
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        if batch_format not in ("list", "numpy"):
+            raise ValueError(f"batch_format must be 'list' or 'numpy', got {batch_format!r}")
+        if batch_format == "numpy":
+            _require_numpy()
+        self._fuse = fuse
+        self._batch_size = batch_size
+        self._batch_format = batch_format
         self._middlewares: List[Transform] = []
+        self._specs: List[_StageSpec] = []
+        # Prebuilt stage factories by "traced" flag, dropped by use()
+        self._templates: Dict[bool, Tuple[Tuple[Optional[str], StageFactory], ...]] = {}
         self._registry: Dict[str, tuple[int, Optional[str]]] = {}
+        self._tracer = tracer
+        self._resources = ResourceRegistry(resources)
+        # Pools needed by any stage, checked out once per run
+        self._run_pools: List[ResourcePool] = []
         
 
     # ==========================================================
     # PUBLIC API
     # ==========================================================
 
-    def use(self, middleware: [Transform, StreamHandler], name: Optional[str] = None, description: Optional[str] = None): 
+    def use(self, middleware: [Transform, StreamHandler], name: Optional[str] = None, description: Optional[str] = None, resources: Optional[Sequence[str]] = None, concurrency: int = 1, ordered: bool = True, buffer: int = 0, vectorized: Optional[bool] = None):
+        """
+        Registers a stage.
+
+        Args:
+            resources: Names of workflow resources the stage needs. One
+                instance of each is checked out for the whole run (shared by
+                the stages naming it) and exposed as
+                ``ctx.shared_data["service"][name]``.
+            concurrency: Items an ``(item, ctx)`` handler may process at once.
+                Above 1 the stage keeps pulling upstream while earlier items
+                are still awaited. Async generator results are collected per item.
+            ordered: With ``concurrency``, emit results in input order (reorder
+                buffer) instead of completion order.
+            buffer: Run everything upstream of this stage in its own task,
+                feeding a queue of this many items, so the producer keeps
+                working while this and later stages process (backpressure
+                when the queue is full). 0 (default) keeps the stages in one
+                pull chain.
+            vectorized: The handler takes and returns a whole batch,
+                ``handler(batch, ctx) -> batch`` (see ``batch_size``). Items
+                are batched before the first of adjacent vectorized handlers
+                and unbatched after the last; the returned batch may change
+                length. Defaults to True for handlers marked ``@vectorized``.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        if buffer < 0:
+            raise ValueError("buffer must be >= 0")
+        is_transform = self._is_transform(middleware)
+        if is_transform and concurrency > 1:
+            raise ValueError("concurrency applies to (item, ctx) handlers, not Transforms")
+        if vectorized is None:
+            vectorized = getattr(middleware, "_yaaf_vectorized", False)
+        if vectorized and (is_transform or concurrency > 1):
+            raise ValueError("vectorized applies to sequential (batch, ctx) handlers")
+        for pool in self._resources.resolve(resources or ()):
+            if pool not in self._run_pools:
+                self._run_pools.append(pool)
         self._middlewares.append(middleware)
+        self._specs.append(_StageSpec(is_transform, concurrency, ordered, buffer, vectorized))
+        self._templates.clear()
         if name:
             self._registry[name] = (len(self._middlewares) - 1, description)
         else:
@@ -36,27 +133,90 @@ class StreamWorkflow:
         return self
 
 
+    def add_resource(self, pool: ResourcePool):
+        """Declares a resource pool that stages can name in ``use(..., resources=[...])``."""
+        self._resources.add(pool)
+        return self
+
+    async def warmup(self) -> None:
+        """Creates every resource instance up front instead of on first checkout."""
+        await self._resources.warmup()
+
+    async def aclose(self) -> None:
+        """Closes the workflow's resources; instances in use close when released."""
+        await self._resources.aclose()
+
+    async def __aenter__(self) -> "StreamWorkflow":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    def resource_info(self) -> Dict[str, Dict[str, Any]]:
+        """Size, checkouts, waits and utilization of every resource pool, by name."""
+        return self._resources.info()
+
+
     async def run(self, source: AsyncGenerator[Any, None], ctx: Optional[ExecContext] = None) -> AsyncGenerator[Any, None]:
-        
-        stream = await self._build(source, ctx)
-        
+
+        # Everything acquired below is released in the finally, whichever step fails
+        resources = None
+        span = None
+        stream = source
+        error = None
+
         try:
-            async for item in stream:
-                yield item
-        except WorkflowAbortException:
+            if self._run_pools:
+                if ctx is None:
+                    ctx = ExecContext(data=None)
+                checkout = checked_out(self._run_pools, ctx)
+                await checkout.__aenter__()
+                resources = checkout
+
+            span = open_span(self._tracer, type(self).__name__, STREAM, stages=len(self._middlewares))
+            stream = await self._build(source, ctx, span)
+            deadline = ctx.deadline if ctx is not None else None
+
+            if deadline is None:
+                async for item in stream:
+                    yield item
+            else:
+                # One timer for the whole iteration; expiry cancels the pending pull
+                timer = _PullDeadline(deadline)
+                try:
+                    while True:
+                        try:
+                            item = await timer.pull(stream)
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            ctx.stop = True
+                            raise WorkflowTimeoutException("Deadline exceeded while streaming") from None
+                        yield item
+                finally:
+                    timer.cancel()
+        except WorkflowTimeoutException as e:
+            # Unlike an abort raised by a handler, running out of time is not a
+            # normal end of the stream: the consumer must know it is truncated
+            error = e
+            raise
+        except WorkflowAbortException as e:
             # Silenciamos la interrupción controlada
+            error = e
             return
+        except Exception as e:
+            error = e
+            raise
         finally:
+            # Closing the built chain stops queue pumps and in-flight handlers
+            # now, not when the generators are garbage collected
+            await _close_quietly(stream)
             # Cerramos el último eslabón de la cadena
-            if hasattr(source, "aclose"):
-                    # Check if the generator is currently executing
-                    # This prevents the "already running" RuntimeError
-                    if inspect.getgeneratorstate(source) != inspect.GEN_RUNNING:
-                        try:
-                            await source.aclose()
-                        except RuntimeError:
-                            # Catch the "already running" error if the check above missed it
-                            pass
+            await _close_quietly(source)
+            if resources is not None:
+                await resources.__aexit__(None, None, None)
+            if span is not None:
+                span.end("error" if error is not None else "ok", error)
 
     
     # ==========================================================
@@ -97,18 +257,71 @@ class StreamWorkflow:
         return transform
 
 
-    async def _build(self, source: AsyncGenerator[Any, None], ctx: Optional[ExecContext] = None) -> AsyncGenerator[Any, None]:
+    async def _build(self, source: AsyncGenerator[Any, None], ctx: Optional[ExecContext] = None, span: Optional[Span] = None) -> AsyncGenerator[Any, None]:
         if ctx is None:
             ctx = ExecContext(data=None)
         stream = source
+        template = self._templates.get(span is not None)
+        if template is None:
+            template = self._templates[span is not None] = self._template(span is not None)
+        name = None
         try:
             # Build pipeline from last to fist Output(PostProc(LLM_Stream(PreProc(source))))
-            for handler in self._middlewares:
-                # Envolvemos CUALQUIER middleware para garantizar seguridad de cierre
-                stream = self._safe_wrap(handler, stream, ctx)
+            for name, stage in template:
+                stream = stage(stream, ctx)
+                if span is not None and name is not None:
+                    stream = traced_stream(stream, span, name, STAGE)
             return stream
         except Exception as e:
-            raise WorkflowAbortException(f"Error applying transform {handler.__name__}: {e}")
+            raise WorkflowAbortException(f"Error applying transform {name}: {e}")
+
+    def _template(self, traced: bool) -> Tuple[Tuple[Optional[str], StageFactory], ...]:
+        """
+        Stage factories ``(source, ctx) -> generator`` for the registered
+        middlewares, so a run only instantiates generators.
+
+        Adjacent handlers share one fused stage unless fusion is off or the
+        run is traced (one span per handler). Concurrent handlers always get
+        their own stage. Unnamed entries (no span) are the plumbing: a queue
+        boundary before a ``buffer`` stage and the batching/unbatching around
+        runs of vectorized handlers.
+        """
+        fuse = self._fuse and not traced
+        template = []
+        handlers = []
+        batched = False
+
+        def flush():
+            if handlers:
+                template.append(_handler_stage(handlers))
+                handlers.clear()
+
+        for handler, spec in zip(self._middlewares, self._specs):
+            if spec.vectorized != batched:
+                flush()
+                if spec.vectorized:
+                    pack = _require_numpy().asarray if self._batch_format == "numpy" else None
+                    template.append((None, partial(_batch_stage, self._batch_size, pack)))
+                else:
+                    template.append((None, _unbatch_stage))
+                batched = spec.vectorized
+            if spec.buffer:
+                flush()
+                template.append((None, partial(_buffered_stage, spec.buffer)))
+            if spec.is_transform:
+                flush()
+                template.append((_stage_name(handler), partial(_transform_stage, handler)))
+            elif spec.concurrency > 1:
+                flush()
+                template.append((_stage_name(handler), partial(_concurrent_stage, handler, spec.concurrency, spec.ordered)))
+            else:
+                handlers.append(handler)
+                if not fuse:
+                    flush()
+        flush()
+        if batched:
+            template.append((None, _unbatch_stage))
+        return tuple(template)
 
     def _is_transform(self, fn) -> bool:
         
@@ -126,43 +339,265 @@ class StreamWorkflow:
         return False
         
         
-    def _safe_wrap(self, handler, source: AsyncGenerator, ctx: ExecContext) -> AsyncGenerator:
-        """
-        Garantiza que no importa qué pase, el 'source' (upstream) se cierre.
-        """
-        async def safe_generator():
-            try:
-                if self._is_transform(handler):
-                    # Es un Transform nativo: async def (source, ctx)
-                    async for item in handler(source, ctx):
-                        yield item
+
+def _stage_name(handler) -> str:
+    return getattr(handler, "__name__", type(handler).__name__)
+
+
+async def _transform_stage(transform: Transform, source: AsyncGenerator, ctx: ExecContext) -> AsyncGenerator:
+    """Runs a Transform and guarantees its upstream is closed, whatever happens."""
+    try:
+        async for item in transform(source, ctx):
+            yield item
+    finally:
+        await _close_quietly(source)
+
+
+def _handler_stage(handlers: List[StreamHandler]) -> Tuple[str, StageFactory]:
+    """
+    One stage applying ``handlers`` to every item in sequence.
+
+    Behaves like one stage per handler: ``ctx.stop`` is checked before each
+    handler, awaitables are awaited, an async generator result fans out
+    through the remaining handlers, and the upstream is closed however the
+    stage ends. Async handlers are awaited without probing.
+    """
+    steps = tuple((handler, is_async_step(handler)) for handler in handlers)
+    return "+".join(_stage_name(handler) for handler in handlers), partial(_apply_handlers, steps, 0)
+
+
+async def _apply_handlers(steps: Tuple[Tuple[StreamHandler, bool], ...], start: int, source: AsyncGenerator, ctx: ExecContext) -> AsyncGenerator:
+    count = len(steps)
+    try:
+        async for item in source:
+            for index in range(start, count):
+                if ctx.stop:
+                    return
+                handler, is_async = steps[index]
+                if is_async:
+                    item = await handler(item, ctx)
                 else:
-                    # Es un StreamHandler simple: (item, ctx)
-                    async for item in source:
-                        if ctx.stop: break
-                        
-                        result = handler(item, ctx)
-                        if inspect.isawaitable(result):
-                            result = await result
-                            
-                        if inspect.isasyncgen(result):
-                            async for sub in result: yield sub
-                        else:
-                            yield result
-            except (WorkflowAbortException, GeneratorExit):
+                    item = handler(item, ctx)
+                    if inspect.isawaitable(item):
+                        item = await item
+                if inspect.isasyncgen(item):
+                    async for sub in _apply_handlers(steps, index + 1, item, ctx):
+                        yield sub
+                    if ctx.stop:
+                        return
+                    break
+            else:
+                yield item
+    finally:
+        await _close_quietly(source)
+
+
+async def _map_item(handler: StreamHandler, item: Any, ctx: ExecContext) -> Sequence[Any]:
+    result = handler(item, ctx)
+    if inspect.isawaitable(result):
+        result = await result
+    if inspect.isasyncgen(result):
+        return [sub async for sub in result]
+    return (result,)
+
+
+async def _concurrent_stage(handler: StreamHandler, limit: int, ordered: bool, source: AsyncGenerator, ctx: ExecContext) -> AsyncGenerator:
+    """
+    Applies ``handler`` to up to ``limit`` items at once.
+
+    The next upstream item is pulled while earlier ones are in flight. With
+    ``ordered`` finished results wait in a reorder buffer until every earlier
+    item has been emitted. Once ``ctx.stop`` is set the results already
+    finished (in order, if ordered) are emitted and the stage ends; an error is
+    raised as soon as its item fails. Either way, and when the consumer closes
+    the stream early, in-flight items are cancelled and awaited and the
+    upstream is closed.
+    """
+    iterator = source.__aiter__()
+    running: Dict[asyncio.Future, int] = {}
+    finished: Dict[int, Sequence[Any]] = {}
+    pull: Optional[asyncio.Future] = None
+    pulled = 0
+    emitted = 0
+    try:
+        while True:
+            if pull is None and iterator is not None and len(running) < limit and not ctx.stop:
+                pull = asyncio.ensure_future(iterator.__anext__())
+            if pull is None and not running:
+                break
+
+            waiting = set(running)
+            if pull is not None:
+                waiting.add(pull)
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                index = running.get(task)
+                if index is None:
+                    continue
+                # Raises the item's error; the rest are cancelled in finally
+                results = task.result()
+                del running[task]
+                if ordered:
+                    finished[index] = results
+                    continue
+                for result in results:
+                    yield result
+
+            while emitted in finished:
+                for result in finished.pop(emitted):
+                    yield result
+                emitted += 1
+            if ctx.stop:
+                return
+
+            if pull in done:
+                try:
+                    item = pull.result()
+                except StopAsyncIteration:
+                    iterator = None
+                else:
+                    running[asyncio.ensure_future(_map_item(handler, item, ctx))] = pulled
+                    pulled += 1
+                pull = None
+    finally:
+        pending = list(running)
+        if pull is not None:
+            pending.append(pull)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        await _close_quietly(source)
+
+
+async def _batch_stage(size: int, pack: Optional[Callable[[List[Any]], Any]], source: AsyncGenerator, ctx: ExecContext) -> AsyncGenerator:
+    """Groups items into lists of ``size`` (the last one may be shorter), packed with ``pack``."""
+    chunk = []
+    try:
+        async for item in source:
+            if ctx.stop:
+                return
+            chunk.append(item)
+            if len(chunk) == size:
+                yield pack(chunk) if pack is not None else chunk
+                chunk = []
+        if chunk and not ctx.stop:
+            yield pack(chunk) if pack is not None else chunk
+    finally:
+        await _close_quietly(source)
+
+
+async def _unbatch_stage(source: AsyncGenerator, ctx: ExecContext) -> AsyncGenerator:
+    """Yields the items (array rows) of every batch."""
+    try:
+        async for batch in source:
+            for item in batch:
+                if ctx.stop:
+                    return
+                yield item
+    finally:
+        await _close_quietly(source)
+
+
+# Queue markers of _buffered_stage: end of the upstream, upstream error
+_END = object()
+
+
+class _Failure:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def _buffered_stage(size: int, source: AsyncGenerator, ctx: ExecContext) -> AsyncGenerator:
+    """
+    Queue boundary: a pump task drains ``source`` into a queue of ``size``
+    items while downstream stages consume it.
+
+    The pump waits when the queue is full and stops pulling once ``ctx.stop``
+    is set. An upstream error is re-raised downstream in order. When the
+    consumer finishes, fails or is closed, the pump is cancelled and the
+    upstream closed.
+    """
+    queue: asyncio.Queue = asyncio.Queue(size)
+
+    async def pump():
+        try:
+            async for item in source:
+                await queue.put(item)
+                if ctx.stop:
+                    break
+        except Exception as e:
+            await queue.put(_Failure(e))
+            return
+        await queue.put(_END)
+
+    task = asyncio.ensure_future(pump())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                return
+            if type(item) is _Failure:
+                raise item.error
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await _close_quietly(source)
+
+
+class _PullDeadline:
+    """
+    Single timer bounding every pull of a stream by an absolute deadline.
+
+    ``asyncio.wait_for`` per item would wrap each pull in its own task; here
+    the pull runs in the consumer's task and only a pull still pending when
+    the timer fires is cancelled. ``pull()`` raises ``asyncio.TimeoutError``
+    once the deadline has passed.
+    """
+
+    def __init__(self, deadline: float):
+        loop = asyncio.get_running_loop()
+        self.expired = False
+        self._task: Optional[asyncio.Task] = None
+        self._handle = loop.call_at(loop.time() + (deadline - time.monotonic()), self._expire)
+
+    def _expire(self) -> None:
+        self.expired = True
+        if self._task is not None:
+            self._task.cancel()
+
+    async def pull(self, stream: AsyncGenerator) -> Any:
+        if self.expired:
+            raise asyncio.TimeoutError
+        # The consumer may resume the generator from a different task each time
+        task = self._task = asyncio.current_task()
+        try:
+            return await stream.__anext__()
+        except asyncio.CancelledError:
+            if not self.expired:
                 raise
-            except Exception as e:
-                # Opcional: Loguear error aquí
+            # Our own cancellation: withdraw it unless someone else cancelled too
+            uncancel = getattr(task, "uncancel", None)
+            if uncancel is not None and uncancel() > 0:
                 raise
-            finally:
-                if hasattr(source, "aclose"):
-                    # Check if the generator is currently executing
-                    # This prevents the "already running" RuntimeError
-                    if inspect.getgeneratorstate(source) != inspect.GEN_RUNNING:
-                        try:
-                            await source.aclose()
-                        except RuntimeError:
-                            # Catch the "already running" error if the check above missed it
-                            pass
-        
-        return safe_generator()
\ No newline at end of file
+            raise asyncio.TimeoutError from None
+        finally:
+            self._task = None
+
+    def cancel(self) -> None:
+        self._handle.cancel()
+
+
+async def _close_quietly(source) -> None:
+    if hasattr(source, "aclose"):
+        # Check if the generator is currently executing
+        # This prevents the "already running" RuntimeError
+        if not getattr(source, "ag_running", False):
+            try:
+                await source.aclose()
+            except RuntimeError:
+                # Catch the "already running" error if the check above missed it
+                pass
\ No newline at end of file
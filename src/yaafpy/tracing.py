@@ -0,0 +1,347 @@
+import abc
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from yaafpy.types import ExecContext
+from yaafpy.instrumentation import StepHook
+
+# Span kinds
+RUN = "run"
+STEP = "step"
+WORKFLOW = "workflow"
+STREAM = "stream"
+STAGE = "stage"
+
+
+class Span:
+    """
+    One timed operation of a trace.
+
+    ``start`` is wall-clock time (seconds since the epoch); ``duration`` is
+    measured with ``time.perf_counter`` and is None until the span ends.
+    """
+
+    __slots__ = (
+        "tracer", "trace_id", "span_id", "parent", "name", "kind",
+        "start", "duration", "status", "error", "attributes", "_t0", "_root",
+    )
+
+    def __init__(self, tracer: "Tracer", name: str, kind: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else random.getrandbits(128)
+        self.span_id = random.getrandbits(64)
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        # Root span of the trace holds the per-trace span budget
+        self._root = parent._root if parent is not None else self
+        if parent is None:
+            attributes.setdefault("spans", 1)
+
+    def end(self, status: str = "ok", error: Optional[BaseException] = None) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._t0
+        self.status = status
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.tracer.exporter.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": f"{self.trace_id:032x}",
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent.span_id:016x}" if self.parent is not None else None,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+    def __repr__(self) -> str:
+        return f"Span({self.kind}:{self.name}, status={self.status!r}, duration={self.duration!r})"
+
+
+class _Unsampled:
+    """Marks a trace that lost the sampling draw, so nested runs do not start a new one."""
+    __slots__ = ("depth",)
+
+    def __init__(self):
+        self.depth = 0
+
+
+_current: ContextVar[Union[Span, _Unsampled, None]] = ContextVar("yaaf_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    """The innermost active span of the running task, if the trace is sampled."""
+    span = _current.get()
+    return span if isinstance(span, Span) else None
+
+
+def active_tracer() -> Optional["Tracer"]:
+    """Tracer of the current span; nested plans use it to join the parent's trace."""
+    span = _current.get()
+    return span.tracer if isinstance(span, Span) else None
+
+
+# ==========================================================
+# EXPORTERS
+# ==========================================================
+
+class SpanExporter(abc.ABC):
+    """Receives every finished span. ``export`` runs on the event loop and must be cheap."""
+
+    @abc.abstractmethod
+    def export(self, span: Span) -> None:
+        """Handles one finished span."""
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+
+class RingBufferExporter(SpanExporter):
+    """Keeps the last ``capacity`` finished spans in memory."""
+
+    def __init__(self, capacity: int = 4096):
+        self._spans: "deque[Span]" = deque(maxlen=capacity)
+
+    def export(self, span: Span) -> None:
+        self._spans.append(span)
+
+    def spans(self) -> List[Span]:
+        return list(self._spans)
+
+    def clear(self) -> None:
+        self._spans.clear()
+
+
+class JsonlFileExporter(SpanExporter):
+    """
+    Appends spans to a file, one JSON object per line.
+
+    Lines are buffered and written ``batch_size`` at a time; call ``flush()``
+    or ``close()`` before reading the file.
+    """
+
+    def __init__(self, path: Union[str, Path], batch_size: int = 256):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=repr)
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) < self.batch_size:
+                return
+            self._write()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write()
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+    def _write(self) -> None:
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._file.flush()
+            self._buffer = []
+
+
+# ==========================================================
+# TRACER
+# ==========================================================
+
+class Tracer(StepHook):
+    """
+    Produces hierarchical spans for runs, steps and nested workflows.
+
+    Install it with ``Workflow(tracer=...)`` or ``StreamWorkflow(tracer=...)``.
+    The active span travels in a context variable, so child workflows called
+    through ``as_middleware`` (or used as steps) are traced under the parent
+    step without their own tracer.
+
+    Args:
+        exporter: Destination of finished spans. Defaults to a RingBufferExporter.
+        sample_rate: Fraction of traces recorded, decided once per root run.
+            Unsampled traces create no spans at all.
+        max_spans_per_trace: Spans beyond this budget are dropped (counted in
+            the root span's ``dropped_spans`` attribute), bounding the cost of
+            long loops.
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None, sample_rate: float = 1.0, max_spans_per_trace: int = 10_000):
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.exporter = exporter if exporter is not None else RingBufferExporter()
+        self.sample_rate = sample_rate
+        self.max_spans_per_trace = max_spans_per_trace
+
+    def start_span(self, name: str, kind: str, parent: Optional[Span] = None, **attributes) -> Optional[Span]:
+        """
+        Starts a span under ``parent`` (a new trace when None) without activating it.
+        Returns None when the per-trace budget is exhausted.
+        """
+        if parent is not None:
+            root = parent._root
+            if root.attributes["spans"] >= self.max_spans_per_trace:
+                root.attributes["dropped_spans"] = root.attributes.get("dropped_spans", 0) + 1
+                return None
+            root.attributes["spans"] += 1
+        return Span(self, name, kind, parent, attributes)
+
+    def sampled(self) -> bool:
+        rate = self.sample_rate
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+    # StepHook ------------------------------------------------
+
+    def on_run_start(self, plan, ctx: ExecContext) -> None:
+        parent = _current.get()
+        if isinstance(parent, _Unsampled):
+            parent.depth += 1
+            return
+        if parent is None and not self.sampled():
+            _current.set(_Unsampled())
+            return
+        span = self.start_span(type(plan.workflow).__name__, RUN, parent, steps=len(plan))
+        if span is not None:
+            if ctx.run_id is not None:
+                span.attributes["run_id"] = ctx.run_id
+            _current.set(span)
+
+    def on_run_end(self, plan, ctx: ExecContext, error: Optional[BaseException]) -> None:
+        span = _current.get()
+        if isinstance(span, _Unsampled):
+            if span.depth:
+                span.depth -= 1
+            else:
+                _current.set(None)
+            return
+        if span is None or span.kind != RUN:
+            return
+        span.end("error" if error is not None else "ok", error)
+        _current.set(span.parent)
+
+    def on_step_start(self, name: str, index: int, ctx: ExecContext) -> None:
+        parent = _current.get()
+        if not isinstance(parent, Span):
+            return
+        span = self.start_span(name, STEP, parent, index=index)
+        if span is not None:
+            _current.set(span)
+
+    def on_step_end(self, name: str, index: int, ctx: ExecContext, elapsed: float, outcome: str) -> None:
+        span = _current.get()
+        # No step span when the budget ran out: the run span is still current
+        if not isinstance(span, Span) or span.kind != STEP:
+            return
+        span.end(outcome)
+        _current.set(span.parent)
+
+
+# ==========================================================
+# HELPERS FOR ADAPTERS AND STREAMS
+# ==========================================================
+
+def enter_span(name: str, kind: str, **attributes):
+    """
+    Starts and activates a child of the current span.
+
+    Returns ``(span, token)`` to hand to ``exit_span``, or None when nothing is
+    being traced (a single context variable lookup).
+    """
+    parent = _current.get()
+    if not isinstance(parent, Span):
+        return None
+    span = parent.tracer.start_span(name, kind, parent, **attributes)
+    if span is None:
+        return None
+    return span, _current.set(span)
+
+
+def exit_span(entered, error: Optional[BaseException] = None) -> None:
+    span, token = entered
+    span.end("error" if error is not None else "ok", error)
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Token created in another context (e.g. an async generator closed elsewhere)
+        _current.set(span.parent)
+
+
+def open_span(tracer: Optional[Tracer], name: str, kind: str, **attributes) -> Optional[Span]:
+    """
+    Starts a span without activating it: a child of the current span, or a
+    new (sampled) trace of ``tracer`` when nothing is active.
+    """
+    parent = _current.get()
+    if isinstance(parent, Span):
+        return parent.tracer.start_span(name, kind, parent, **attributes)
+    if tracer is None or isinstance(parent, _Unsampled) or not tracer.sampled():
+        return None
+    return tracer.start_span(name, kind, None, **attributes)
+
+
+async def traced_stream(source: AsyncIterator[Any], parent: Span, name: str, kind: str) -> AsyncIterator[Any]:
+    """
+    Re-yields ``source`` inside a child span of ``parent``.
+
+    Async generators run in their consumer's context, so the span is only
+    made current while ``source`` is producing an item, never across a
+    ``yield``. The span counts items and ends when the stream does.
+    """
+    span = None
+    error = None
+    try:
+        span = parent.tracer.start_span(name, kind, parent)
+        if span is None:
+            async for item in source:
+                yield item
+            return
+        items = 0
+        while True:
+            token = _current.set(span)
+            try:
+                item = await source.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                _current.reset(token)
+            items += 1
+            span.attributes["items"] = items
+            yield item
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if span is not None:
+            span.end("error" if error is not None else "ok", error)
+        if hasattr(source, "aclose") and not getattr(source, "ag_running", False):
+            await source.aclose()
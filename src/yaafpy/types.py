@@ -1,6 +1,9 @@
 from typing import Any, Dict, Optional, List, Tuple
 from typing import Any, Dict, Optional
 from dataclasses import dataclass, field
+import copy
+import time
+from collections.abc import MutableMapping
 from typing import Callable, Awaitable, TypeAlias, Union, AsyncGenerator
 
 """
@@ -23,8 +26,121 @@ class WorkflowAbortException(Exception):
         super().__init__(message)        
 
 
+class WorkflowTimeoutException(WorkflowAbortException):
+    """Abort raised when a step timeout or the context deadline expires"""
+
+
+class WorkflowBudgetException(WorkflowAbortException):
+    """Abort raised when a run or a loop exceeds its step or iteration budget"""
+
+
+class SharedDataOverlay(dict):
+    """
+    Journaled working copy of a ``shared_data`` mapping.
+
+    A real dict (``isinstance``, ``json.dumps``, ``copy()``, ``|`` and ``|=``
+    behave as usual) holding a shallow copy of ``base``, taken at creation.
+    Every key written or deleted is journaled, so ``commit()`` writes back
+    O(keys written) and dropping the layer undoes the step for free. Only
+    top-level keys are journaled: mutating a value in place (e.g. appending
+    to a list read from ``base``) is not undone. ``copy()`` and ``|`` return
+    plain dicts; pickles and deep-copies as a plain dict.
+    """
+
+    __slots__ = ("base", "_dirty")
+
+    def __init__(self, base: "MutableMapping[str, Any]"):
+        super().__init__(base)
+        self.base = base
+        # Keys written or deleted, in order (a dict used as an ordered set)
+        self._dirty: Dict[str, None] = {}
+
+    def __setitem__(self, key, value) -> None:
+        dict.__setitem__(self, key, value)
+        self._dirty[key] = None
+
+    def __delitem__(self, key) -> None:
+        dict.__delitem__(self, key)
+        self._dirty[key] = None
+
+    def pop(self, key, *default):
+        if key in self:
+            self._dirty[key] = None
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._dirty[key] = None
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return dict.__getitem__(self, key)
+        self[key] = default
+        return default
+
+    def update(self, *args, **kwargs) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self) -> None:
+        self._dirty.update(dict.fromkeys(self))
+        dict.clear(self)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __repr__(self) -> str:
+        return f"SharedDataOverlay({dict(self)!r})"
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+    def commit(self) -> "MutableMapping[str, Any]":
+        """Applies the journaled keys to ``base`` and returns it; the journal is left empty."""
+        base = self.base
+        for key in self._dirty:
+            if key in self:
+                base[key] = dict.__getitem__(self, key)
+            else:
+                base.pop(key, None)
+        self._dirty = {}
+        return base
+
+
+class ExecContextBase:
+    """
+    Behaviour shared by ExecContext and CompactExecContext.
+
+    The engine accepts any subclass as a context; check against this class
+    rather than ExecContext when both representations must be accepted.
+    """
+
+    __slots__ = ()
+
+    def set_timeout(self, seconds: float) -> "ExecContext":
+        """Sets the deadline ``seconds`` from now. An earlier existing deadline is kept."""
+        deadline = time.monotonic() + seconds
+        if self.deadline is None or deadline < self.deadline:
+            self.deadline = deadline
+        return self
+
+    def time_left(self) -> Optional[float]:
+        """Seconds until the deadline (negative once expired), or None without a deadline."""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def fork(self) -> "ExecContext":
+        """Shallow copy with its own ``shared_data`` dict, for work that may be discarded."""
+        clone = copy.copy(self)
+        clone.shared_data = dict(self.shared_data)
+        return clone
+
+
 @dataclass
-class ExecContext:
+class ExecContext(ExecContextBase):
     # 1. The Payload: Business data that is transformed
     data: Any = None
     
@@ -39,6 +155,93 @@ class ExecContext:
     # - shared_data['auth']: Tokens or session info
     shared_data: Dict[str, Any] = field(default_factory=dict)
 
+    # 4. Execution Control: inherited by nested workflows (same context)
+    # - run_id: identifies the run for checkpointing/resume (assigned when missing)
+    # - deadline: absolute time.monotonic() instant after which the run is aborted
+    run_id: Optional[str] = None
+    deadline: Optional[float] = None
+
+    def __copy__(self) -> "ExecContext":
+        # Much cheaper than the generic __reduce_ex__ path; the decorator copies once per step
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        return clone
+
+
+class CompactExecContext(ExecContextBase):
+    """
+    Slotted ExecContext: same fields, same constructor, no per-instance ``__dict__``.
+
+    Roughly a quarter smaller than ExecContext and cheaper to copy, which
+    matters when contexts are created per request (see ``ContextPool`` to
+    recycle them). Arbitrary attributes cannot be set on it, and it is not an
+    ExecContext instance: code that must accept both should check
+    ExecContextBase.
+    """
+
+    __slots__ = ("data", "jump_to", "stop", "workflow", "shared_data", "run_id", "deadline")
+
+    def __init__(
+        self,
+        data: Any = None,
+        jump_to: Optional[str] = None,
+        stop: bool = False,
+        workflow: Optional['Workflow'] = None,
+        shared_data: Optional[Dict[str, Any]] = None,
+        run_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ):
+        self.data = data
+        self.jump_to = jump_to
+        self.stop = stop
+        self.workflow = workflow
+        self.shared_data = shared_data if shared_data is not None else {}
+        self.run_id = run_id
+        self.deadline = deadline
+
+    def __copy__(self) -> "CompactExecContext":
+        clone = CompactExecContext.__new__(type(self))
+        clone.data = self.data
+        clone.jump_to = self.jump_to
+        clone.stop = self.stop
+        clone.workflow = self.workflow
+        clone.shared_data = self.shared_data
+        clone.run_id = self.run_id
+        clone.deadline = self.deadline
+        return clone
+
+    def _fields(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+@dataclass
+class RunResult:
+    """Outcome of one context in a ``Workflow.run_many`` batch."""
+    # Position of the context in the submitted batch
+    index: int
+    # Final context on success, otherwise the submitted context (stop=True on abort)
+    ctx: ExecContextBase
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def aborted(self) -> bool:
+        return isinstance(self.error, WorkflowAbortException)
+
 Middleware: TypeAlias = Callable[
     [ExecContext],
     Union[ExecContext, Awaitable[ExecContext]]
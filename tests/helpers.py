@@ -0,0 +1,10 @@
+"""Step factories shared by the test modules."""
+
+
+def mark(label):
+    """A sync step named ``label`` that appends ``label`` to ``shared_data["ran"]``."""
+    def step(ctx):
+        ctx.shared_data.setdefault("ran", []).append(label)
+        return ctx
+    step.__name__ = label
+    return step
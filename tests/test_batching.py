@@ -0,0 +1,82 @@
+import pytest
+import asyncio
+from yaafpy.sequential_flows import Workflow
+from yaafpy.batching import MicroBatcher
+from yaafpy.types import ExecContext, WorkflowAbortException
+
+
+@pytest.mark.asyncio
+async def test_concurrent_runs_are_batched():
+    calls = []
+
+    async def embed(batch):
+        calls.append([ctx.data for ctx in batch])
+        for ctx in batch:
+            ctx.data = ctx.data * 10
+
+    wf = Workflow()
+    wf.use_batched(embed, max_batch_size=4, max_wait_ms=50)
+
+    results = await asyncio.gather(*(wf.run(ExecContext(data=i)) for i in range(8)))
+
+    assert [r.data for r in results] == [i * 10 for i in range(8)]
+    assert calls == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert "embed" in wf._registry
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_flushes_after_wait():
+    sizes = []
+
+    def classify(batch):
+        sizes.append(len(batch))
+        return [ExecContext(data=f"label:{ctx.data}") for ctx in batch]
+
+    wf = Workflow().use_batched(classify, max_batch_size=100, max_wait_ms=5)
+
+    results = await asyncio.gather(*(wf.run(ExecContext(data=i)) for i in range(3)))
+
+    assert [r.data for r in results] == ["label:0", "label:1", "label:2"]
+    assert sizes == [3]
+
+
+@pytest.mark.asyncio
+async def test_per_item_errors_only_fail_their_run():
+    def fn(batch):
+        return [WorkflowAbortException("bad") if ctx.data == 1 else ctx for ctx in batch]
+
+    wf = Workflow().use_batched(fn, max_batch_size=3, max_wait_ms=50)
+
+    results = await asyncio.gather(
+        *(wf.run(ExecContext(data=i)) for i in range(3)),
+        return_exceptions=True,
+    )
+
+    assert results[0].data == 0
+    assert isinstance(results[1], WorkflowAbortException)
+    assert results[2].data == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_failure_fails_all_waiters_and_counts():
+    def fn(batch):
+        raise RuntimeError("backend down")
+
+    batcher = MicroBatcher(fn, max_batch_size=2, max_wait_ms=50)
+    wf = Workflow().use(batcher)
+
+    results = await asyncio.gather(
+        *(wf.run(ExecContext(data=i)) for i in range(2)),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert batcher.info() == {"batches": 1, "items": 2, "avg_batch_size": 2.0}
+
+
+@pytest.mark.asyncio
+async def test_wrong_result_length_is_reported():
+    wf = Workflow().use_batched(lambda batch: [], max_batch_size=1)
+
+    with pytest.raises(ValueError):
+        await wf.run(ExecContext(data=1))
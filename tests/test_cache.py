@@ -0,0 +1,157 @@
+import pytest
+import asyncio
+from yaafpy.sequential_flows import Workflow
+from yaafpy.cache import CachePolicy, CachedStep
+from yaafpy.types import ExecContext
+
+
+def make_render(calls):
+    async def render(ctx):
+        calls.append(ctx.data)
+        await asyncio.sleep(0)
+        ctx.shared_data["prompt"] = f"<{ctx.data}>"
+        ctx.data = ctx.data.upper()
+        return ctx
+    return render
+
+
+@pytest.mark.asyncio
+async def test_hit_skips_step_and_replays_delta():
+    calls = []
+    wf = Workflow().use(make_render(calls), cache=CachePolicy(key=lambda ctx: ctx.data))
+
+    first = await wf.run(ExecContext(data="hi", shared_data={"other": 1}))
+    second = await wf.run(ExecContext(data="hi", shared_data={"other": 2}))
+
+    assert calls == ["hi"]
+    assert first.data == second.data == "HI"
+    assert second.shared_data == {"other": 2, "prompt": "<hi>"}
+    assert wf.cache_info()["render"]["hits"] == 1
+    assert wf.cache_info()["render"]["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_none_key_bypasses_cache():
+    calls = []
+    wf = Workflow().use(make_render(calls), cache=CachePolicy(key=lambda ctx: None))
+
+    await wf.run(ExecContext(data="a"))
+    await wf.run(ExecContext(data="a"))
+
+    assert calls == ["a", "a"]
+    assert wf.cache_info()["render"]["bypassed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_lru_and_byte_limits_evict():
+    calls = []
+    step = CachedStep(make_render(calls), CachePolicy(key=lambda ctx: ctx.data, max_entries=2))
+
+    for value in ["a", "b", "a", "c", "b"]:
+        await step(ExecContext(data=value))
+
+    # "b" was least recently used when "c" arrived
+    assert calls == ["a", "b", "c", "b"]
+    assert step.info()["entries"] == 2
+
+    tiny = CachedStep(make_render([]), CachePolicy(key=lambda ctx: ctx.data, max_bytes=10))
+    await tiny(ExecContext(data="x"))
+    assert tiny.info()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_ttl_expires_entries():
+    calls = []
+    step = CachedStep(make_render(calls), CachePolicy(key=lambda ctx: ctx.data, ttl=0.01))
+
+    await step(ExecContext(data="a"))
+    await asyncio.sleep(0.02)
+    await step(ExecContext(data="a"))
+
+    assert calls == ["a", "a"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_execution():
+    calls = []
+
+    async def slow(ctx):
+        calls.append(ctx.data)
+        await asyncio.sleep(0.02)
+        ctx.shared_data["label"] = "spam"
+        return ctx
+
+    wf = Workflow().use(slow, cache=CachePolicy(key=lambda ctx: ctx.data))
+
+    results = await asyncio.gather(*(wf.run(ExecContext(data="msg")) for _ in range(5)))
+
+    assert calls == ["msg"]
+    assert all(r.shared_data == {"label": "spam"} for r in results)
+    info = wf.cache_info()["slow"]
+    assert (info["hits"], info["misses"]) == (4, 1)
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached():
+    attempts = 0
+
+    def flaky(ctx):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("transient")
+        ctx.data = "ok"
+        return ctx
+
+    wf = Workflow().use(flaky, cache=CachePolicy(key=lambda ctx: "k"))
+
+    with pytest.raises(RuntimeError):
+        await wf.run(ExecContext())
+    assert (await wf.run(ExecContext())).data == "ok"
+    assert (await wf.run(ExecContext())).data == "ok"
+    assert attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_over_to_a_follower():
+    calls = []
+
+    async def slow(ctx):
+        calls.append(ctx.data)
+        await asyncio.sleep(0.02)
+        ctx.shared_data["label"] = "spam"
+        return ctx
+
+    step = CachedStep(slow, CachePolicy(key=lambda ctx: ctx.data))
+    leader = asyncio.ensure_future(step(ExecContext(data="msg")))
+    await asyncio.sleep(0)
+    followers = [asyncio.ensure_future(step(ExecContext(data="msg"))) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    results = await asyncio.gather(*followers)
+
+    assert calls == ["msg", "msg"]
+    assert all(r.shared_data == {"label": "spam"} for r in results)
+    assert (step.info()["hits"], step.info()["misses"]) == (2, 2)
+
+
+@pytest.mark.asyncio
+async def test_hits_hand_out_copies():
+    def render(ctx):
+        ctx.shared_data["messages"] = ["tmpl"]
+        return ctx
+
+    def add_user(ctx):
+        ctx.shared_data["messages"].append("user")
+        return ctx
+
+    wf = Workflow().use(render, cache=CachePolicy(key=lambda ctx: "k")).use(add_user)
+    results = [await wf.run(ExecContext()) for _ in range(3)]
+
+    assert all(r.shared_data["messages"] == ["tmpl", "user"] for r in results)
+
+    shared = CachedStep(render, CachePolicy(key=lambda ctx: "k", copy=None))
+    first = await shared(ExecContext())
+    second = await shared(ExecContext())
+    assert first.shared_data["messages"] is second.shared_data["messages"]
@@ -0,0 +1,112 @@
+import pytest
+import threading
+from yaafpy.sequential_flows import Workflow
+from yaafpy.checkpoint import CheckpointStore, SQLiteCheckpointStore, FileCheckpointStore
+from yaafpy.types import ExecContext, WorkflowAbortException
+
+
+def build(store, calls, fail_at=None):
+    wf = Workflow(checkpoints=store)
+
+    def make(label):
+        def step(ctx):
+            calls.append(label)
+            if label == fail_at:
+                raise WorkflowAbortException(f"crash in {label}")
+            ctx.shared_data.setdefault("done", []).append(label)
+            ctx.data += 1
+            return ctx
+        step.__name__ = label
+        return step
+
+    for label in ("s1", "s2", "s3", "s4"):
+        wf.use(make(label))
+    return wf
+
+
+@pytest.fixture(params=["sqlite", "file"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteCheckpointStore(tmp_path / "ckpt.db")
+    return FileCheckpointStore(tmp_path / "ckpt")
+
+
+@pytest.mark.asyncio
+async def test_resume_continues_after_last_completed_step(store):
+    calls = []
+    crashing = build(store, calls, fail_at="s3")
+
+    ctx = ExecContext(data=0, run_id="job-1")
+    with pytest.raises(WorkflowAbortException):
+        await crashing.run(ctx)
+    await crashing.flush_checkpoints()
+
+    # A fresh worker with the same definition picks the run up
+    calls.clear()
+    worker = build(store, calls)
+    result = await worker.resume("job-1")
+
+    assert calls == ["s3", "s4"]
+    assert result.data == 4
+    assert result.shared_data["done"] == ["s1", "s2", "s3", "s4"]
+    assert result.run_id == "job-1"
+
+
+@pytest.mark.asyncio
+async def test_finished_runs_are_removed(store):
+    wf = build(store, [])
+
+    result = await wf.run(ExecContext(data=0))
+    assert result.run_id is not None
+
+    with pytest.raises(KeyError):
+        await wf.resume(result.run_id)
+
+
+@pytest.mark.asyncio
+async def test_resume_rejects_other_definitions(store):
+    crashing = build(store, [], fail_at="s2")
+    with pytest.raises(WorkflowAbortException):
+        await crashing.run(ExecContext(data=0, run_id="job-2"))
+
+    other = Workflow(checkpoints=store).use(lambda ctx: ctx, name="different")
+    with pytest.raises(ValueError):
+        await other.resume("job-2")
+
+
+@pytest.mark.asyncio
+async def test_resume_without_store():
+    with pytest.raises(RuntimeError):
+        await Workflow().resume("x")
+
+
+@pytest.mark.asyncio
+async def test_unserializable_context_skips_checkpoint(store):
+    def lock(ctx):
+        ctx.shared_data["lock"] = threading.Lock()
+        return ctx
+
+    def release(ctx):
+        del ctx.shared_data["lock"]
+        ctx.data += 1
+        return ctx
+
+    def crash(ctx):
+        raise WorkflowAbortException("crash")
+
+    wf = Workflow(checkpoints=store).use(lock).use(release).use(crash)
+    with pytest.raises(WorkflowAbortException):
+        await wf.run(ExecContext(data=0, run_id="job-3"))
+
+    # The snapshot after "lock" was skipped, the one after "release" was kept
+    checkpoint = await wf._checkpointer.load("job-3")
+    assert checkpoint.cursor == 2
+
+
+def test_store_requires_write_and_load():
+    class WriteOnly(CheckpointStore):
+        def write(self, batch):
+            pass
+
+    with pytest.raises(TypeError):
+        WriteOnly()
@@ -0,0 +1,198 @@
+import pytest
+import asyncio
+import time
+from yaafpy.dag_flows import DagWorkflow
+from yaafpy.decorators import middleware
+from yaafpy.types import ExecContext, WorkflowAbortException, WorkflowAllowException
+
+
+def build_rag(log):
+    wf = DagWorkflow()
+
+    async def retrieve(ctx):
+        log.append("retrieve")
+        ctx.shared_data["docs"] = ["d1", "d2"]
+        return ctx
+
+    async def rerank(ctx):
+        await asyncio.sleep(0.05)
+        log.append("rerank")
+        ctx.shared_data["ranked"] = list(reversed(ctx.shared_data["docs"]))
+        return ctx
+
+    async def summarize(ctx):
+        await asyncio.sleep(0.05)
+        log.append("summarize")
+        ctx.shared_data["summary"] = "+".join(ctx.shared_data["docs"])
+        return ctx
+
+    def build_prompt(ctx):
+        log.append("build_prompt")
+        ctx.data = f"{ctx.shared_data['ranked']}|{ctx.shared_data['summary']}"
+        return ctx
+
+    wf.use(build_prompt, reads=["ranked", "summary"], writes=[DagWorkflow.DATA])
+    wf.use(rerank, reads=["docs"], writes=["ranked"])
+    wf.use(summarize, reads=["docs"], writes=["summary"])
+    wf.use(retrieve, reads=["query"], writes=["docs"])
+    return wf
+
+
+# ==========================================================
+# Scheduling
+# ==========================================================
+
+def test_dependencies_are_derived_from_keys():
+    wf = build_rag([])
+
+    assert wf.dependencies() == {
+        "build_prompt": ["rerank", "summarize"],
+        "rerank": ["retrieve"],
+        "summarize": ["retrieve"],
+        "retrieve": [],
+    }
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_overlap():
+    log = []
+    wf = build_rag(log)
+
+    start = time.perf_counter()
+    result = await wf.run(ExecContext(shared_data={"query": "q"}))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.09
+    assert log[0] == "retrieve"
+    assert log[-1] == "build_prompt"
+    assert result.data == "['d2', 'd1']|d1+d2"
+    assert result.workflow is wf
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap():
+    active = 0
+    peak = 0
+
+    async def work(ctx):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return ctx
+
+    wf = DagWorkflow(max_concurrency=2)
+    for i in range(5):
+        wf.use(work, name=f"w{i}", writes=[f"k{i}"])
+
+    await wf.run(ExecContext())
+    assert peak == 2
+
+
+def test_cycle_is_rejected():
+    wf = DagWorkflow()
+    wf.use(lambda ctx: ctx, name="a", reads=["y"], writes=["x"])
+    wf.use(lambda ctx: ctx, name="b", reads=["x"], writes=["y"])
+
+    with pytest.raises(ValueError, match="cycle"):
+        wf.dependencies()
+
+
+# ==========================================================
+# Commit semantics
+# ==========================================================
+
+@pytest.mark.asyncio
+async def test_only_declared_writes_are_committed():
+    def step(ctx):
+        ctx.shared_data["declared"] = 1
+        ctx.shared_data["undeclared"] = 2
+        ctx.data = "ignored"
+        return ctx
+
+    result = await DagWorkflow().use(step, writes=["declared"]).run(ExecContext(data="in"))
+
+    assert result.shared_data == {"declared": 1}
+    assert result.data == "in"
+
+
+@pytest.mark.asyncio
+async def test_skip_keeps_dependents_running():
+    def optional(ctx):
+        raise WorkflowAllowException("cache miss")
+
+    def consumer(ctx):
+        ctx.shared_data["out"] = ctx.shared_data.get("cached", "default")
+        return ctx
+
+    wf = DagWorkflow()
+    wf.use(optional, writes=["cached"])
+    wf.use(consumer, reads=["cached"], writes=["out"])
+
+    result = await wf.run(ExecContext())
+    assert result.shared_data == {"out": "default"}
+
+
+# ==========================================================
+# Abort / stop semantics
+# ==========================================================
+
+@pytest.mark.asyncio
+async def test_abort_cancels_in_flight_steps():
+    cancelled = False
+
+    async def slow(ctx):
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        return ctx
+
+    @middleware
+    async def failing(ctx):
+        raise ValueError("boom")
+
+    wf = DagWorkflow()
+    wf.use(slow, writes=["a"])
+    wf.use(failing, writes=["b"])
+
+    ctx = ExecContext()
+    with pytest.raises(WorkflowAbortException):
+        await wf.run(ctx)
+
+    assert cancelled is True
+    assert ctx.stop is True
+
+
+@pytest.mark.asyncio
+async def test_stop_ends_the_run():
+    ran = []
+
+    def stopper(ctx):
+        ctx.stop = True
+        return ctx
+
+    def later(ctx):
+        ran.append("later")
+        return ctx
+
+    wf = DagWorkflow()
+    wf.use(stopper, writes=["a"])
+    wf.use(later, reads=["a"])
+
+    result = await wf.run(ExecContext())
+    assert result.stop is True
+    assert ran == []
+
+
+@pytest.mark.asyncio
+async def test_jump_is_rejected():
+    def jumper(ctx):
+        ctx.jump_to = "elsewhere"
+        return ctx
+
+    with pytest.raises(WorkflowAbortException):
+        await DagWorkflow().use(jumper).run(ExecContext())
@@ -0,0 +1,203 @@
+import pytest
+import copy
+import json
+import pickle
+from yaafpy.sequential_flows import Workflow
+from yaafpy.decorators import middleware
+from yaafpy.types import ExecContext, SharedDataOverlay, WorkflowAbortException, WorkflowAllowException
+
+
+# =========================
+# ROLLBACK
+# =========================
+
+@pytest.mark.asyncio
+async def test_skip_drops_partial_writes():
+    @middleware
+    async def half_done(ctx):
+        ctx.shared_data["partial"] = True
+        del ctx.shared_data["keep"]
+        ctx.data = "changed"
+        raise WorkflowAllowException("not today")
+
+    ctx = ExecContext(data="original", shared_data={"keep": 1})
+    result = await half_done(ctx)
+
+    assert result is ctx
+    assert result.data == "original"
+    assert result.shared_data == {"keep": 1}
+    assert type(result.shared_data) is dict
+
+
+@pytest.mark.asyncio
+async def test_abort_leaves_original_untouched():
+    @middleware
+    def broken(ctx):
+        ctx.shared_data["partial"] = True
+        raise ValueError("boom")
+
+    ctx = ExecContext(shared_data={"keep": 1})
+    with pytest.raises(WorkflowAbortException):
+        await broken(ctx)
+
+    assert ctx.shared_data == {"keep": 1}
+
+
+@pytest.mark.asyncio
+async def test_success_commits_into_original_dict():
+    shared = {"a": 1, "b": 2}
+
+    @middleware
+    def step(ctx):
+        ctx.shared_data["a"] = 10
+        ctx.shared_data.pop("b")
+        ctx.shared_data["c"] = 3
+        return ctx
+
+    result = await step(ExecContext(shared_data=shared))
+
+    assert result.shared_data is shared
+    assert shared == {"a": 10, "c": 3}
+
+
+@pytest.mark.asyncio
+async def test_skipped_step_in_workflow_keeps_previous_state():
+    @middleware
+    def first(ctx):
+        ctx.shared_data["first"] = True
+        return ctx
+
+    @middleware
+    async def skipper(ctx):
+        ctx.shared_data["first"] = "overwritten"
+        raise WorkflowAllowException("skip")
+
+    @middleware
+    def last(ctx):
+        ctx.shared_data["last"] = True
+        return ctx
+
+    wf = Workflow().use(first).use(skipper).use(last)
+    ctx = await wf.run(ExecContext())
+
+    assert ctx.shared_data == {"first": True, "last": True}
+
+
+@pytest.mark.asyncio
+async def test_decorated_sync_step_stays_awaitable():
+    @middleware
+    def step(ctx):
+        ctx.data += 1
+        return ctx
+
+    @middleware
+    async def outer(ctx):
+        return await step(ctx)
+
+    assert (await step(ExecContext(data=1))).data == 2
+    assert (await outer(ExecContext(data=1))).data == 2
+
+
+# =========================
+# OVERLAY
+# =========================
+
+def test_overlay_reads_through_and_journals_writes():
+    base = {"a": 1, "b": 2}
+    layer = SharedDataOverlay(base)
+
+    layer["b"] = 20
+    layer["c"] = 3
+    del layer["a"]
+
+    assert dict(layer) == {"b": 20, "c": 3}
+    assert "a" not in layer and layer.get("a") is None
+    assert len(layer) == 2
+    assert base == {"a": 1, "b": 2}
+
+    with pytest.raises(KeyError):
+        del layer["a"]
+
+    layer["a"] = 100
+    assert layer.commit() is base
+    assert base == {"a": 100, "b": 20, "c": 3}
+
+
+def test_overlay_stacks_and_serializes_as_dict():
+    base = {"a": 1}
+    outer = SharedDataOverlay(base)
+    inner = SharedDataOverlay(outer)
+    inner["b"] = 2
+
+    assert dict(outer) == {"a": 1}
+    inner.commit()
+    assert dict(outer) == {"a": 1, "b": 2}
+    assert base == {"a": 1}
+
+    assert pickle.loads(pickle.dumps(outer)) == {"a": 1, "b": 2}
+    assert copy.deepcopy(outer) == {"a": 1, "b": 2}
+
+
+def test_overlay_is_a_dict():
+    base = {"a": 1}
+    layer = SharedDataOverlay(base)
+    layer["b"] = 2
+
+    assert isinstance(layer, dict)
+    assert json.loads(json.dumps(layer)) == {"a": 1, "b": 2}
+    assert json.dumps(SharedDataOverlay({"a": 1})) == '{"a": 1}'
+
+
+def test_overlay_copy_returns_plain_snapshot():
+    layer = SharedDataOverlay({"a": 1})
+
+    snapshot = layer.copy()
+    snapshot["b"] = 2
+
+    assert type(snapshot) is dict and snapshot == {"a": 1, "b": 2}
+    assert layer == {"a": 1}
+
+
+def test_overlay_merge_operators():
+    base = {"a": 1}
+    layer = SharedDataOverlay(base)
+
+    assert layer | {"b": 2} == {"a": 1, "b": 2}
+    assert {"b": 2} | layer == {"b": 2, "a": 1}
+    assert layer == {"a": 1}
+
+    layer |= {"a": 10, "c": 3}
+    assert layer == {"a": 10, "c": 3}
+    assert base == {"a": 1}
+    layer.commit()
+    assert base == {"a": 10, "c": 3}
+
+
+def test_overlay_dict_mutators_are_journaled():
+    base = {"a": 1, "b": 2, "c": 3}
+    layer = SharedDataOverlay(base)
+
+    layer.update(d=4)
+    layer.setdefault("e", 5)
+    layer.pop("a")
+    layer.popitem()
+
+    assert base == {"a": 1, "b": 2, "c": 3}
+    layer.commit()
+    assert base == dict(layer) == {"b": 2, "c": 3, "d": 4}
+
+    layer.clear()
+    layer.commit()
+    assert base == {}
+
+
+@pytest.mark.asyncio
+async def test_decorated_step_sees_a_dict():
+    @middleware
+    def step(ctx):
+        ctx.shared_data = ctx.shared_data | {"dumped": json.dumps(ctx.shared_data)}
+        return ctx
+
+    ctx = await Workflow().use(step).run(ExecContext(shared_data={"a": 1}))
+
+    assert ctx.shared_data == {"a": 1, "dumped": '{"a": 1}'}
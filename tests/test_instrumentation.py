@@ -0,0 +1,165 @@
+import pytest
+from yaafpy.sequential_flows import Workflow
+from yaafpy.cache import CachePolicy
+from yaafpy.instrumentation import StepHook, StepStats
+from yaafpy.types import ExecContext, WorkflowAbortException, WorkflowAllowException
+from helpers import mark
+
+
+class Recorder(StepHook):
+    def __init__(self):
+        self.events = []
+
+    def on_run_start(self, plan, ctx):
+        self.events.append(("run_start",))
+
+    def on_run_end(self, plan, ctx, error):
+        self.events.append(("run_end", type(error).__name__ if error else None))
+
+    def on_step_start(self, name, index, ctx):
+        self.events.append(("start", name))
+
+    def on_step_end(self, name, index, ctx, elapsed, outcome):
+        assert elapsed >= 0
+        self.events.append(("end", name, outcome))
+
+
+# =========================
+# HOOKS
+# =========================
+
+@pytest.mark.asyncio
+async def test_hooks_wrap_runs_and_steps():
+    recorder = Recorder()
+    wf = Workflow().use(mark("a")).use(mark("b")).add_hook(recorder)
+
+    await wf.run(ExecContext())
+
+    assert recorder.events == [
+        ("run_start",),
+        ("start", "a"), ("end", "a", "ok"),
+        ("start", "b"), ("end", "b", "ok"),
+        ("run_end", None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_hooks_report_abort():
+    recorder = Recorder()
+
+    async def boom(ctx):
+        raise WorkflowAbortException("stop here")
+
+    wf = Workflow().use(boom).add_hook(recorder)
+
+    with pytest.raises(WorkflowAbortException):
+        await wf.run(ExecContext())
+
+    assert ("end", "boom", "abort") in recorder.events
+    assert recorder.events[-1] == ("run_end", "WorkflowAbortException")
+
+
+@pytest.mark.asyncio
+async def test_removing_last_hook_restores_plain_plan():
+    recorder = Recorder()
+    wf = Workflow().use(mark("a")).add_hook(recorder)
+    assert wf.compile().hooks == (recorder,)
+
+    wf.remove_hook(recorder)
+    await wf.run(ExecContext())
+
+    assert wf.compile().hooks == ()
+    assert recorder.events == []
+
+
+# =========================
+# STATS
+# =========================
+
+@pytest.mark.asyncio
+async def test_stats_counts_outcomes_per_step():
+    def maybe_skip(ctx):
+        if ctx.data == "skip":
+            raise WorkflowAllowException("nothing to do")
+        return ctx
+
+    def loop_once(ctx):
+        if not ctx.shared_data.get("looped"):
+            ctx.shared_data["looped"] = True
+            ctx.jump_to = "maybe_skip"
+        return ctx
+
+    wf = Workflow(stats=True).use(maybe_skip).use(loop_once).use(mark("end"))
+
+    await wf.run(ExecContext(data="skip"))
+    await wf.run(ExecContext(data="go"))
+
+    stats = wf.stats()
+    steps = stats["steps"]
+    assert stats["runs"] == 2
+    assert steps["maybe_skip"]["calls"] == 4
+    assert steps["maybe_skip"]["skips"] == 2
+    assert steps["loop_once"]["calls"] == 4
+    assert steps["loop_once"]["jumps"] == 2
+    assert steps["end"]["calls"] == 2
+    assert steps["end"]["p99_s"] <= steps["end"]["max_s"]
+
+
+@pytest.mark.asyncio
+async def test_stats_failed_runs_and_reset():
+    async def boom(ctx):
+        raise ValueError("broken")
+
+    wf = Workflow(stats=True).use(boom)
+
+    with pytest.raises(ValueError):
+        await wf.run(ExecContext())
+
+    assert wf.stats()["failed_runs"] == 1
+    assert wf.stats()["steps"]["boom"]["errors"] == 1
+
+    wf.reset_stats()
+    assert wf.stats()["runs"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stats_include_policy_counters():
+    wf = Workflow(stats=True).use(mark("lookup"), cache=CachePolicy(key=lambda ctx: ctx.data))
+
+    await wf.run(ExecContext(data=1))
+    await wf.run(ExecContext(data=1))
+
+    lookup = wf.stats()["steps"]["lookup"]
+    assert lookup["calls"] == 2
+    assert lookup["cache"]["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stats_report_fused_group_once():
+    wf = Workflow(stats=True).use(mark("a"), jumps=False).use(mark("b"), jumps=False)
+
+    await wf.run(ExecContext())
+
+    assert list(wf.stats()["steps"]) == ["a+b"]
+
+
+def test_step_stats_percentiles():
+    stats = StepStats()
+    for _ in range(99):
+        stats.record(0.001, "ok")
+    stats.record(1.0, "ok")
+
+    assert stats.percentile(0.5) < 0.01
+    assert stats.percentile(1.0) == 1.0
+
+
+@pytest.mark.asyncio
+async def test_engine_skips_raw_allow_exception():
+    def skip(ctx):
+        ctx.data = "changed"
+        raise WorkflowAllowException("skip")
+
+    wf = Workflow().use(skip).use(mark("after"))
+    ctx = await wf.run(ExecContext(data="original"))
+
+    assert ctx.shared_data["ran"] == ["after"]
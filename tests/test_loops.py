@@ -0,0 +1,176 @@
+import pytest
+import asyncio
+from yaafpy.sequential_flows import Workflow
+from yaafpy.adapters import as_middleware
+from yaafpy.types import ExecContext, WorkflowBudgetException, WorkflowTimeoutException
+
+
+def count(ctx):
+    ctx.data = (ctx.data or 0) + 1
+    return ctx
+
+
+def saturate(ctx):
+    ctx.data = min((ctx.data or 0) + 1, 3)
+    return ctx
+
+
+# =========================
+# LOOP EXITS
+# =========================
+
+@pytest.mark.asyncio
+async def test_loop_until():
+    wf = Workflow().loop(count, until=lambda ctx: ctx.data >= 4, name="agent")
+
+    ctx = await wf.run(ExecContext(data=0))
+
+    assert ctx.data == 4
+    report = ctx.shared_data["metadata"]["loops"]["agent"]
+    assert report["iterations"] == 4 and report["exit"] == "until"
+    assert len(report["iteration_times"]) == 4
+    assert wf.loop_info()["agent"] == {"runs": 1, "iterations": 4, "exits": {"until": 1}}
+
+
+@pytest.mark.asyncio
+async def test_loop_converges_on_unchanged_data():
+    wf = Workflow().loop(saturate, converge=True, max_iterations=20)
+
+    ctx = await wf.run(ExecContext(data=0))
+
+    report = ctx.shared_data["metadata"]["loops"]["loop:saturate"]
+    assert ctx.data == 3
+    assert report == {**report, "iterations": 4, "exit": "converged"}
+
+
+@pytest.mark.asyncio
+async def test_loop_converge_key():
+    def step(ctx):
+        ctx.data["n"] += 1
+        ctx.data["plan"] = "final" if ctx.data["n"] > 1 else "draft"
+        return ctx
+
+    wf = Workflow().loop(step, converge=lambda ctx: ctx.data.get("plan"), name="plan")
+    ctx = await wf.run(ExecContext(data={"n": 0}))
+
+    assert ctx.data["n"] == 3
+    assert ctx.shared_data["metadata"]["loops"]["plan"]["exit"] == "converged"
+
+
+@pytest.mark.asyncio
+async def test_loop_limit_aborts_or_continues():
+    wf = Workflow().loop(count, max_iterations=3)
+    with pytest.raises(WorkflowBudgetException, match="max_iterations"):
+        await wf.run(ExecContext(data=0))
+
+    wf = Workflow().loop(count, max_iterations=3, on_limit="continue", name="soft")
+    ctx = await wf.run(ExecContext(data=0))
+    assert ctx.data == 3
+    assert ctx.shared_data["metadata"]["loops"]["soft"]["exit"] == "max_iterations"
+
+
+@pytest.mark.asyncio
+async def test_loop_max_elapsed():
+    async def slow(ctx):
+        await asyncio.sleep(0.02)
+        return ctx
+
+    wf = Workflow().loop(slow, max_iterations=1000, max_elapsed=0.05, on_limit="continue", name="slow")
+    ctx = await wf.run(ExecContext())
+
+    report = ctx.shared_data["metadata"]["loops"]["slow"]
+    assert report["exit"] == "max_elapsed"
+    assert 2 <= report["iterations"] < 10
+
+
+@pytest.mark.asyncio
+async def test_loop_stop_and_jump_leave_the_loop():
+    def stopper(ctx):
+        ctx.stop = True
+        return ctx
+
+    def jumper(ctx):
+        ctx.data = "jumped"
+        ctx.jump_to = "end"
+        return ctx
+
+    def skipped(ctx):
+        ctx.data = "not skipped"
+        return ctx
+
+    def end(ctx):
+        ctx.shared_data["end"] = True
+        return ctx
+
+    ctx = await Workflow().loop(stopper).use(end).run(ExecContext())
+    assert ctx.shared_data["metadata"]["loops"]["loop:stopper"]["exit"] == "stop"
+    assert "end" not in ctx.shared_data
+
+    ctx = await Workflow().loop(jumper).use(skipped).use(end).run(ExecContext())
+    assert ctx.data == "jumped" and ctx.shared_data["end"] is True
+
+
+@pytest.mark.asyncio
+async def test_loop_body_workflow():
+    body = Workflow().use(count).use(count)
+    wf = Workflow().loop(body, until=lambda ctx: ctx.data >= 6, name="body")
+
+    ctx = await wf.run(ExecContext(data=0))
+
+    assert ctx.data == 6
+    assert ctx.shared_data["metadata"]["loops"]["body"]["iterations"] == 3
+
+
+@pytest.mark.asyncio
+async def test_loop_respects_deadline():
+    async def slow(ctx):
+        await asyncio.sleep(0.02)
+        return ctx
+
+    wf = Workflow().loop(slow, max_iterations=1000)
+    with pytest.raises(WorkflowTimeoutException):
+        await wf.run(ExecContext().set_timeout(0.05))
+
+
+def test_loop_rejects_bad_bounds():
+    with pytest.raises(ValueError):
+        Workflow().loop(count, max_iterations=0)
+    with pytest.raises(ValueError):
+        Workflow().loop(count, on_limit="retry")
+
+
+# =========================
+# STEP BUDGET
+# =========================
+
+@pytest.mark.asyncio
+async def test_max_steps_stops_jump_cycle():
+    def again(ctx):
+        ctx.data = (ctx.data or 0) + 1
+        ctx.jump_to = "again"
+        return ctx
+
+    wf = Workflow().use(again)
+    with pytest.raises(WorkflowBudgetException, match="again"):
+        await wf.run(ExecContext(data=0), max_steps=5)
+
+
+@pytest.mark.asyncio
+async def test_max_steps_counts_nested_and_loop_steps():
+    child = Workflow().use(count).use(count)
+    wf = Workflow().use(as_middleware(child, inline=False), name="child").loop(count, max_iterations=3, on_limit="continue")
+
+    # 1 (child step) + 2 (child body) + 3 (loop iterations) + 1 (loop step)
+    ctx = await wf.run(ExecContext(data=0), max_steps=7)
+    assert ctx.data == 5
+
+    with pytest.raises(WorkflowBudgetException):
+        await wf.run(ExecContext(data=0), max_steps=6)
+
+
+@pytest.mark.asyncio
+async def test_max_steps_fast_path_untouched():
+    wf = Workflow().use(count)
+
+    assert (await wf.run(ExecContext(data=0))).data == 1
+    assert (await wf.run(ExecContext(data=0), max_steps=1)).data == 1
@@ -0,0 +1,114 @@
+import pytest
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from yaafpy.sequential_flows import Workflow
+from yaafpy.decorators import blocking, middleware
+from yaafpy.types import ExecContext, WorkflowAllowException
+
+
+def slow_io(ctx):
+    time.sleep(0.05)
+    ctx.shared_data.setdefault("threads", []).append(threading.get_ident())
+    return ctx
+
+
+# =========================
+# OFFLOADING
+# =========================
+
+@pytest.mark.asyncio
+async def test_blocking_step_leaves_event_loop_free():
+    wf = Workflow(executor=ThreadPoolExecutor(4)).use(slow_io, blocking=True)
+
+    started = time.perf_counter()
+    results = [r async for r in wf.run_many((ExecContext() for _ in range(4)), max_concurrency=4)]
+    elapsed = time.perf_counter() - started
+
+    assert all(r.ok for r in results)
+    assert elapsed < 0.15
+    assert threading.get_ident() not in results[0].ctx.shared_data["threads"]
+
+
+@pytest.mark.asyncio
+async def test_marker_and_override():
+    @blocking
+    def marked(ctx):
+        ctx.data = threading.get_ident()
+        return ctx
+
+    ctx = await Workflow().use(marked).run(ExecContext())
+    assert ctx.data != threading.get_ident()
+
+    ctx = await Workflow().use(marked, blocking=False).run(ExecContext())
+    assert ctx.data == threading.get_ident()
+
+
+@pytest.mark.asyncio
+async def test_max_blocking_caps_in_flight_calls():
+    wf = Workflow(executor=ThreadPoolExecutor(8), max_blocking=2).use(slow_io, blocking=True)
+
+    async for result in wf.run_many((ExecContext() for _ in range(6)), max_concurrency=6):
+        assert result.ok
+
+    info = wf.blocking_info()["slow_io"]
+    assert info["calls"] == 6 and info["in_flight"] == 0
+    assert info["max_in_flight"] == 2 and info["waits"] >= 1
+    assert wf.stats()["steps"]["slow_io"]["blocking"] == info
+
+
+def test_async_step_cannot_block():
+    async def step(ctx):
+        return ctx
+
+    with pytest.raises(ValueError):
+        Workflow().use(step, blocking=True)
+    with pytest.raises(ValueError):
+        Workflow(max_blocking=0)
+
+
+# =========================
+# CONTEXT HANDOFF
+# =========================
+
+@pytest.mark.asyncio
+async def test_abandoned_call_leaves_context_untouched():
+    def slow_write(ctx):
+        time.sleep(0.1)
+        ctx.shared_data["late"] = True
+        return ctx
+
+    wf = Workflow().use(slow_write, blocking=True, timeout=0.02, on_timeout="skip")
+    ctx = await wf.run(ExecContext(shared_data={"keep": 1}))
+    await asyncio.sleep(0.15)
+
+    assert ctx.shared_data == {"keep": 1}
+
+
+@pytest.mark.asyncio
+async def test_writes_commit_into_caller_dict_and_skips_roll_back():
+    @blocking
+    @middleware
+    def skipper(ctx):
+        ctx.shared_data["partial"] = True
+        raise WorkflowAllowException("skip")
+
+    def writer(ctx):
+        ctx.shared_data["written"] = True
+        return ctx
+
+    shared = {}
+    ctx = await Workflow().use(writer, blocking=True).use(skipper).run(ExecContext(shared_data=shared))
+
+    assert ctx.shared_data is shared
+    assert shared == {"written": True}
+
+
+def test_limited_workflow_runs_under_several_loops():
+    wf = Workflow(max_blocking=1).use(slow_io, blocking=True)
+
+    for _ in range(2):
+        assert asyncio.run(wf.run(ExecContext())).shared_data["threads"]
+    assert wf.run_sync(ExecContext()).shared_data["threads"]
+    assert wf.blocking_info()["slow_io"]["calls"] == 3
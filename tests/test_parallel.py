@@ -0,0 +1,103 @@
+import pytest
+import asyncio
+import time
+from yaafpy.sequential_flows import Workflow
+from yaafpy.types import ExecContext, WorkflowAbortException, WorkflowAllowException
+
+
+@pytest.mark.asyncio
+async def test_branches_run_concurrently_and_merge():
+    async def memory(ctx):
+        await asyncio.sleep(0.05)
+        ctx.shared_data["memory"] = ["hi"]
+        return ctx
+
+    async def guardrail(ctx):
+        await asyncio.sleep(0.05)
+        ctx.shared_data["safe"] = True
+        return ctx
+
+    tools = Workflow()
+
+    def load_tools(ctx):
+        ctx.shared_data["tools"] = ["search"]
+        ctx.data = "with-tools"
+        return ctx
+
+    tools.use(load_tools)
+
+    wf = Workflow().parallel(memory, guardrail, tools)
+
+    start = time.perf_counter()
+    result = await wf.run(ExecContext(data="q", shared_data={"keep": 1}))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.09
+    assert result.shared_data == {"keep": 1, "memory": ["hi"], "safe": True, "tools": ["search"]}
+    assert result.data == "with-tools"
+    assert result.workflow is wf
+    assert "parallel:memory,guardrail,Workflow" in wf._registry
+
+
+@pytest.mark.asyncio
+async def test_branches_work_on_isolated_copies():
+    seen = []
+
+    async def writer(ctx):
+        ctx.shared_data["x"] = "a"
+        await asyncio.sleep(0.01)
+        return ctx
+
+    async def reader(ctx):
+        await asyncio.sleep(0.02)
+        seen.append(ctx.shared_data.get("x"))
+        return ctx
+
+    await Workflow().parallel(writer, reader).run(ExecContext())
+    assert seen == [None]
+
+
+@pytest.mark.asyncio
+async def test_abort_in_one_branch_cancels_the_others():
+    cancelled = False
+
+    async def slow(ctx):
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        return ctx
+
+    async def failing(ctx):
+        await asyncio.sleep(0.01)
+        raise WorkflowAbortException("guardrail tripped")
+
+    ctx = ExecContext()
+    wf = Workflow().parallel(slow, failing, name="fan")
+
+    start = time.perf_counter()
+    with pytest.raises(WorkflowAbortException):
+        await wf.run(ctx)
+
+    assert time.perf_counter() - start < 1
+    assert cancelled is True
+    assert ctx.stop is True
+
+
+@pytest.mark.asyncio
+async def test_custom_merge_and_skipped_branch():
+    def scored(ctx):
+        ctx.data = 3
+        return ctx
+
+    def skipped(ctx):
+        raise WorkflowAllowException("not needed")
+
+    def total(ctx, results):
+        ctx.data = sum(r.data for r in results if r is not None)
+        return ctx
+
+    result = await Workflow().parallel(scored, skipped, scored, merge=total).run(ExecContext(data=0))
+    assert result.data == 6
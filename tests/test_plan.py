@@ -0,0 +1,391 @@
+import pytest
+import asyncio
+from yaafpy.sequential_flows import Workflow
+from yaafpy.plan import ExecutionPlan, is_async_step, sync_impl
+from yaafpy.types import ExecContext, WorkflowAbortException, WorkflowAllowException
+
+
+# =========================
+# COMPILATION
+# =========================
+
+def test_compile_freezes_middleware():
+    wf = Workflow()
+
+    async def mw1(ctx):
+        return ctx
+
+    def mw2(ctx):
+        return ctx
+
+    wf.use(mw1).use(mw2, name="second")
+    plan = wf.compile()
+
+    assert isinstance(plan, ExecutionPlan)
+    assert plan.names == ("mw1", "second")
+    assert dict(plan.labels) == {"mw1": 0, "second": 1}
+    assert plan.is_async == (True, False)
+
+    # Later registrations do not leak into an existing plan
+    wf.use(mw1, name="third")
+    assert len(plan) == 2
+
+    with pytest.raises(TypeError):
+        plan.labels["x"] = 3
+
+
+def test_is_async_step_detects_callable_objects():
+    child = Workflow()
+
+    def sync_step(ctx):
+        return ctx
+
+    assert is_async_step(child) is True
+    assert is_async_step(sync_step) is False
+
+
+# =========================
+# EXECUTION PARITY
+# =========================
+
+@pytest.mark.asyncio
+async def test_plan_runs_sync_and_async_steps():
+    wf = Workflow()
+
+    async def add(ctx):
+        ctx.data += 1
+        return ctx
+
+    def double(ctx):
+        ctx.data *= 2
+        return ctx
+
+    wf.use(add).use(double)
+    plan = wf.compile()
+
+    result = await plan.run(ExecContext(data=1))
+    assert result.data == 4
+    assert result.workflow is wf
+
+
+@pytest.mark.asyncio
+async def test_plan_resolves_jumps():
+    wf = Workflow()
+
+    async def mw1(ctx):
+        ctx.jump_to = "mw3"
+        return ctx
+
+    async def mw2(ctx):
+        ctx.data = "wrong"
+        return ctx
+
+    async def mw3(ctx):
+        ctx.data = "correct"
+        return ctx
+
+    wf.use(mw1).use(mw2).use(mw3)
+    plan = wf.compile()
+
+    assert (await plan.run(ExecContext())).data == "correct"
+    assert (await plan.run(ExecContext(jump_to="mw2"))).data == "correct"
+
+
+@pytest.mark.asyncio
+async def test_plan_invalid_jump_aborts():
+    wf = Workflow()
+
+    async def mw(ctx):
+        ctx.jump_to = "nowhere"
+        return ctx
+
+    wf.use(mw)
+    ctx = ExecContext()
+
+    with pytest.raises(WorkflowAbortException):
+        await wf.compile().run(ctx)
+    assert ctx.stop is True
+
+
+@pytest.mark.asyncio
+async def test_plan_generator_leak_detection():
+    wf = Workflow()
+
+    async def gen():
+        yield 1
+
+    def mw(ctx):
+        ctx.data = gen()
+        return ctx
+
+    wf.use(mw)
+
+    with pytest.raises(RuntimeError):
+        await wf.compile().run(ExecContext())
+
+
+@pytest.mark.asyncio
+async def test_plan_concurrent_runs():
+    wf = Workflow()
+
+    async def mw(ctx):
+        await asyncio.sleep(0.01)
+        ctx.data += 1
+        return ctx
+
+    wf.use(mw)
+    plan = wf.compile()
+
+    results = await asyncio.gather(*(plan.run(ExecContext(data=i)) for i in range(3)))
+    assert [r.data for r in results] == [1, 2, 3]
+
+
+# =========================
+# SYNC FAST PATH / FUSION
+# =========================
+
+@pytest.mark.asyncio
+async def test_workflow_run_calls_sync_steps_directly():
+    wf = Workflow()
+
+    def step(ctx):
+        ctx.data += 1
+        return ctx
+
+    wf.use(step)
+    assert wf.compile().is_async == (False,)
+    assert (await wf.run(ExecContext(data=1))).data == 2
+
+
+def test_consecutive_non_jumping_sync_steps_are_fused():
+    wf = Workflow()
+
+    def a(ctx):
+        return ctx
+
+    def b(ctx):
+        return ctx
+
+    async def c(ctx):
+        return ctx
+
+    wf.use(a, jumps=False).use(b, jumps=False).use(c, jumps=False).use(a, name="a2")
+    plan = wf.compile()
+
+    assert plan._calls[0].__name__ == "a+b"
+    assert plan._next[0] == 2
+    assert plan._calls[2] is c
+    assert plan._calls[3] is a
+
+
+@pytest.mark.asyncio
+async def test_fused_steps_keep_order_stop_and_jump_targets():
+    wf = Workflow()
+    seen = []
+
+    def make(label, stop=False):
+        def step(ctx):
+            seen.append(label)
+            ctx.stop = stop
+            return ctx
+        step.__name__ = label
+        return step
+
+    wf.use(make("s1"), jumps=False)
+    wf.use(make("s2"), jumps=False)
+    wf.use(make("s3", stop=True), jumps=False)
+    wf.use(make("s4"), jumps=False)
+
+    result = await wf.run(ExecContext())
+    assert seen == ["s1", "s2", "s3"]
+    assert result.stop is True
+
+    seen.clear()
+    await wf.run(ExecContext(jump_to="s2"))
+    assert seen == ["s2", "s3"]
+
+
+@pytest.mark.asyncio
+async def test_skip_inside_fused_group_skips_only_that_step():
+    def make(label, skip=False):
+        def step(ctx):
+            if skip:
+                raise WorkflowAllowException("skip")
+            ctx.shared_data.setdefault("seen", []).append(label)
+            return ctx
+        step.__name__ = label
+        return step
+
+    fused = Workflow().use(make("a"), jumps=False).use(make("b", skip=True), jumps=False).use(make("c"), jumps=False)
+    plain = Workflow().use(make("a")).use(make("b", skip=True)).use(make("c"))
+
+    assert fused.compile()._calls[0].__name__ == "a+b+c"
+    assert (await fused.run(ExecContext())).shared_data["seen"] == ["a", "c"]
+    assert (await plain.run(ExecContext())).shared_data["seen"] == ["a", "c"]
+
+
+@pytest.mark.asyncio
+async def test_run_picks_up_new_steps_after_compile():
+    wf = Workflow()
+
+    def add(ctx):
+        ctx.data += 1
+        return ctx
+
+    wf.use(add, name="first")
+    assert (await wf.run(ExecContext(data=0))).data == 1
+
+    wf.use(add, name="second")
+    assert (await wf.run(ExecContext(data=0))).data == 2
+
+
+@pytest.mark.asyncio
+async def test_sync_middleware_decorator_runs_sync_in_plan():
+    from yaafpy.decorators import middleware
+
+    @middleware
+    def step(ctx):
+        ctx.data = "done"
+        return ctx
+
+    @middleware
+    def broken(ctx):
+        raise ValueError("boom")
+
+    assert is_async_step(sync_impl(step)) is False
+
+    wf = Workflow().use(step)
+    assert wf.compile().is_async == (False,)
+    assert (await wf.run(ExecContext())).data == "done"
+
+    with pytest.raises(WorkflowAbortException):
+        await Workflow().use(broken).run(ExecContext())
+
+
+# =========================
+# FLATTENING NESTED WORKFLOWS
+# =========================
+
+def track(label):
+    def step(ctx):
+        ctx.shared_data.setdefault("ran", []).append((label, ctx.workflow))
+        return ctx
+    step.__name__ = label
+    return step
+
+
+def nest(levels: int):
+    from yaafpy.adapters import as_middleware
+
+    innermost = Workflow().use(track("leaf"))
+    workflows = [innermost]
+    for level in range(levels - 1):
+        workflows.append(Workflow().use(track(f"pre{level}")).use(as_middleware(workflows[-1]), name="child"))
+    return workflows
+
+
+@pytest.mark.asyncio
+async def test_deep_nesting_compiles_to_flat_table():
+    workflows = nest(5)
+    root = workflows[-1]
+
+    plan = root.compile()
+    assert len(plan) == 5
+    assert plan.names[-1] == "child.child.child.child.leaf"
+    assert plan.labels["child.child.child.child.leaf"] == 4
+
+    ctx = await root.run(ExecContext())
+
+    # Each step still sees the workflow that owns it
+    owners = [owner for _, owner in ctx.shared_data["ran"]]
+    assert owners == [workflows[4], workflows[3], workflows[2], workflows[1], workflows[0]]
+
+
+@pytest.mark.asyncio
+async def test_inlined_child_jumps_use_child_labels():
+    from yaafpy.adapters import as_middleware
+
+    seen = []
+
+    def note(label, jump=None):
+        def step(ctx):
+            seen.append(label)
+            if jump and ctx.data < 2:
+                ctx.data += 1
+                ctx.jump_to = jump
+            return ctx
+        step.__name__ = label
+        return step
+
+    # Both workflows have a "start" label: the child's jump must stay inside the child
+    child = Workflow().use(note("child_start"), name="start").use(note("child_loop", jump="start"))
+    parent = Workflow().use(note("parent_start"), name="start").use(child, name="sub").use(note("end"))
+
+    await parent.run(ExecContext(data=0))
+
+    assert seen == ["parent_start", "child_start", "child_loop", "child_start", "child_loop", "child_start", "child_loop", "end"]
+
+    # Labels of the parent are not visible from the child, exactly as in a nested run
+    escape = Workflow().use(note("escape", jump="end"))
+    with pytest.raises(WorkflowAbortException):
+        await Workflow().use(as_middleware(escape)).use(note("end")).run(ExecContext(data=0))
+
+
+@pytest.mark.asyncio
+async def test_parent_recompiles_when_inlined_child_changes():
+    workflows = nest(3)
+    root = workflows[-1]
+    await root.run(ExecContext())
+
+    workflows[0].use(track("added"))
+    ctx = await root.run(ExecContext())
+
+    assert [label for label, _ in ctx.shared_data["ran"]] == ["pre1", "pre0", "leaf", "added"]
+
+
+@pytest.mark.asyncio
+async def test_inlined_child_still_checks_for_generator_leaks():
+    from yaafpy.adapters import as_middleware
+
+    async def gen():
+        yield 1
+
+    def leak(ctx):
+        ctx.data = gen()
+        return ctx
+
+    def consume(ctx):
+        ctx.data = "ok"
+        return ctx
+
+    child = Workflow().use(leak)
+    for inline in (False, True):
+        wf = Workflow().use(as_middleware(child, inline=inline), name="sub").use(consume)
+        with pytest.raises(RuntimeError, match="Generator leak"):
+            await wf.run(ExecContext())
+
+
+def test_fingerprint_ignores_plan_shape():
+    from yaafpy.adapters import as_middleware
+
+    wf = Workflow().use(track("a")).use(as_middleware(Workflow().use(track("b"))), name="sub")
+
+    assert wf.compile().names != wf.compile(flatten=False).names
+    assert wf.compile().fingerprint == wf.compile(flatten=False).fingerprint
+
+
+def test_children_that_cannot_be_inlined_stay_nested():
+    from yaafpy.adapters import as_middleware
+    from yaafpy.checkpoint import SQLiteCheckpointStore
+
+    plain = Workflow().use(track("a"))
+    checkpointed = Workflow(checkpoints=SQLiteCheckpointStore()).use(track("b"))
+
+    wf = Workflow().use(as_middleware(plain, inline=False), name="opt_out").use(checkpointed, name="durable")
+
+    assert wf.compile().names == ("opt_out", "durable")
+    assert len(Workflow().use(plain, name="p").compile(flatten=False)) == 1
+
+    # A checkpointed parent keeps children nested, so cursors index its own steps
+    durable = Workflow(checkpoints=SQLiteCheckpointStore()).use(plain, name="p").use(track("c"))
+    assert durable.compile().names == ("p", "c")
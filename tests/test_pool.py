@@ -0,0 +1,106 @@
+import pytest
+import copy
+import pickle
+from yaafpy.sequential_flows import Workflow
+from yaafpy.decorators import middleware
+from yaafpy.pool import ContextPool
+from yaafpy.types import CompactExecContext, ExecContext, ExecContextBase, WorkflowAllowException
+from helpers import mark
+
+
+# =========================
+# COMPACT CONTEXT
+# =========================
+
+def test_compact_context_has_no_instance_dict():
+    ctx = CompactExecContext(data=1)
+
+    assert not hasattr(ctx, "__dict__")
+    assert isinstance(ctx, ExecContextBase)
+    with pytest.raises(AttributeError):
+        ctx.extra = True
+
+
+def test_compact_context_copy_fork_and_pickle():
+    ctx = CompactExecContext(data=[1], shared_data={"k": "v"}, run_id="r1")
+
+    shallow = copy.copy(ctx)
+    assert shallow == ctx and shallow.shared_data is ctx.shared_data
+
+    forked = ctx.fork()
+    forked.shared_data["k"] = "changed"
+    assert ctx.shared_data["k"] == "v"
+
+    assert pickle.loads(pickle.dumps(ctx)) == ctx
+
+
+@pytest.mark.asyncio
+async def test_compact_context_runs_through_engine():
+    @middleware
+    def skipper(ctx):
+        ctx.shared_data["partial"] = True
+        raise WorkflowAllowException("skip")
+
+    wf = Workflow().use(mark("a"), jumps=False).use(mark("b"), jumps=False).use(skipper)
+    ctx = await wf.run(CompactExecContext().set_timeout(5))
+
+    assert type(ctx) is CompactExecContext
+    assert ctx.shared_data == {"ran": ["a", "b"]}
+
+
+# =========================
+# POOL
+# =========================
+
+def test_pool_recycles_and_resets():
+    pool = ContextPool(max_size=1)
+    first = pool.acquire(data="x", run_id="r1")
+    first.shared_data["key"] = 1
+    first.stop = True
+    shared = first.shared_data
+
+    pool.release(first)
+    second = pool.acquire(data="y")
+
+    assert second is first
+    assert second.data == "y" and second.run_id is None and second.stop is False
+    assert second.shared_data == {} and second.shared_data is not shared
+    # The released dict may still be referenced elsewhere: it is left as it was
+    assert shared == {"key": 1}
+    assert pool.info() == {"created": 1, "reused": 1, "free": 0}
+
+
+def test_pool_never_clears_caller_dicts():
+    pool = ContextPool(max_size=1)
+    mine = {"session": "abc"}
+
+    ctx = pool.acquire(shared_data=mine)
+    pool.release(ctx)
+    again = pool.acquire(run_id="r2")
+
+    assert mine == {"session": "abc"}
+    assert again.shared_data == {} and again.shared_data is not mine
+    assert again.run_id == "r2"
+
+
+def test_pool_respects_max_size_and_rejects_unknown_fields():
+    pool = ContextPool(max_size=1)
+    pool.release(pool.acquire())
+    pool.release(CompactExecContext())
+
+    assert pool.info()["free"] == 1
+    with pytest.raises(TypeError):
+        pool.acquire(colour="red")
+
+
+@pytest.mark.asyncio
+async def test_pool_with_run_many():
+    pool = ContextPool(factory=ExecContext)
+    wf = Workflow().use(mark("a"))
+
+    for _ in range(3):
+        async for result in wf.run_many((pool.acquire(data=i) for i in range(4)), max_concurrency=2):
+            assert result.ctx.shared_data == {"ran": ["a"]}
+            pool.release(result.ctx)
+
+    assert pool.info()["created"] <= 4
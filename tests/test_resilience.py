@@ -0,0 +1,357 @@
+import pytest
+import asyncio
+import time
+from yaafpy.sequential_flows import Workflow
+from yaafpy.adapters import as_middleware
+from yaafpy.types import ExecContext, WorkflowAbortException, WorkflowTimeoutException
+from helpers import mark
+
+
+async def slow(ctx):
+    ctx.shared_data["partial"] = True
+    await asyncio.sleep(10)
+    return ctx
+
+
+# =========================
+# DEADLINES
+# =========================
+
+@pytest.mark.asyncio
+async def test_deadline_aborts_slow_step():
+    wf = Workflow().use(mark("before")).use(slow).use(mark("after"))
+    ctx = ExecContext().set_timeout(0.05)
+
+    start = time.perf_counter()
+    with pytest.raises(WorkflowTimeoutException):
+        await wf.run(ctx)
+
+    assert time.perf_counter() - start < 1
+    assert ctx.stop is True
+
+
+@pytest.mark.asyncio
+async def test_deadline_is_inherited_by_nested_workflows():
+    child = Workflow().use(slow)
+    parent = Workflow().use(as_middleware(child))
+
+    with pytest.raises(WorkflowAbortException):
+        await parent.run(ExecContext().set_timeout(0.05))
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_aborts_before_next_step():
+    def burn(ctx):
+        time.sleep(0.02)
+        return ctx
+
+    wf = Workflow().use(burn).use(mark("never"))
+    ctx = ExecContext().set_timeout(0.01)
+
+    with pytest.raises(WorkflowTimeoutException, match="never"):
+        await wf.run(ctx)
+    assert "ran" not in ctx.shared_data
+
+
+def test_set_timeout_keeps_the_earliest_deadline():
+    ctx = ExecContext().set_timeout(1)
+    first = ctx.deadline
+    ctx.set_timeout(100)
+    assert ctx.deadline == first
+    assert 0 < ctx.time_left() <= 1
+    assert ExecContext().time_left() is None
+
+
+# =========================
+# PER-STEP TIMEOUTS
+# =========================
+
+@pytest.mark.asyncio
+async def test_step_timeout_abort():
+    wf = Workflow().use(slow, timeout=0.02)
+
+    with pytest.raises(WorkflowTimeoutException):
+        await wf.run(ExecContext())
+
+
+@pytest.mark.asyncio
+async def test_step_timeout_skip_discards_partial_writes():
+    wf = Workflow().use(slow, timeout=0.02, on_timeout="skip").use(mark("after"))
+
+    result = await wf.run(ExecContext())
+
+    assert result.shared_data == {"ran": ["after"]}
+
+
+@pytest.mark.asyncio
+async def test_step_timeout_fallback():
+    def cached_answer(ctx):
+        ctx.data = "fallback"
+        return ctx
+
+    wf = Workflow().use(slow, timeout=0.02, on_timeout=cached_answer)
+
+    result = await wf.run(ExecContext())
+    assert result.data == "fallback"
+    assert "partial" not in result.shared_data
+
+
+@pytest.mark.asyncio
+async def test_fast_step_within_timeout():
+    async def fast(ctx):
+        ctx.data = "ok"
+        return ctx
+
+    result = await Workflow().use(fast, timeout=1).run(ExecContext())
+    assert result.data == "ok"
+
+
+def test_invalid_on_timeout():
+    with pytest.raises(ValueError):
+        Workflow().use(slow, timeout=1, on_timeout="retry")
+
+
+def test_timeout_rejects_sync_step():
+    def busy(ctx):
+        return ctx
+
+    with pytest.raises(ValueError, match="blocking=True"):
+        Workflow().use(busy, timeout=1)
+    # In a thread the timeout can fire, so the blocking wrapper is accepted
+    Workflow().use(busy, timeout=1, blocking=True)
+
+
+# =========================
+# HEDGED EXECUTION
+# =========================
+
+@pytest.mark.asyncio
+async def test_hedge_wins_when_first_attempt_is_slow():
+    delays = [10, 0]
+    cancelled = []
+
+    async def flaky_backend(ctx):
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        ctx.data = f"slept {delay}"
+        return ctx
+
+    wf = Workflow().use(flaky_backend, hedge_after_ms=20)
+
+    start = time.perf_counter()
+    result = await wf.run(ExecContext())
+
+    assert time.perf_counter() - start < 1
+    assert result.data == "slept 0"
+    assert cancelled == [10]
+    assert wf.hedge_info()["flaky_backend"] == {"calls": 1, "hedges": 1, "hedge_wins": 1}
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_for_fast_calls():
+    async def fast(ctx):
+        ctx.data = "fast"
+        return ctx
+
+    wf = Workflow().use(fast, hedge_after_ms=50, max_hedges=3)
+
+    assert (await wf.run(ExecContext())).data == "fast"
+    assert wf.hedge_info()["fast"] == {"calls": 1, "hedges": 0, "hedge_wins": 0}
+
+
+@pytest.mark.asyncio
+async def test_hedge_failures_surface_only_when_all_attempts_fail():
+    outcomes = ["fail-slow", "ok"]
+
+    async def backend(ctx):
+        outcome = outcomes.pop(0)
+        if outcome == "fail-slow":
+            await asyncio.sleep(0.03)
+            raise ConnectionError("reset")
+        await asyncio.sleep(0.05)
+        ctx.data = "ok"
+        return ctx
+
+    wf = Workflow().use(backend, hedge_after_ms=10)
+    assert (await wf.run(ExecContext())).data == "ok"
+
+    async def always_fails(ctx):
+        await asyncio.sleep(0.02)
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        await Workflow().use(always_fails, hedge_after_ms=5, max_hedges=2).run(ExecContext())
+
+
+# =========================
+# RETRY
+# =========================
+
+from yaafpy.decorators import middleware
+from yaafpy.resilience import RetryPolicy, CircuitBreaker, CircuitOpenException
+
+
+@pytest.mark.asyncio
+async def test_retry_recovers_from_transient_errors_on_clean_context():
+    attempts = 0
+
+    @middleware
+    async def backend(ctx):
+        nonlocal attempts
+        attempts += 1
+        ctx.shared_data.setdefault("attempts_seen", []).append(attempts)
+        if attempts < 3:
+            raise ConnectionError("reset by peer")
+        ctx.data = "ok"
+        return ctx
+
+    wf = Workflow().use(backend, retry=RetryPolicy(attempts=3, base_delay=0.001))
+    result = await wf.run(ExecContext())
+
+    assert result.data == "ok"
+    assert result.shared_data["attempts_seen"] == [3]
+    assert wf.retry_info()["backend"] == {"calls": 1, "retries": 2, "exhausted": 0}
+
+
+@pytest.mark.asyncio
+async def test_retry_gives_up_and_skips_non_retryable_errors():
+    calls = 0
+
+    async def broken(ctx):
+        nonlocal calls
+        calls += 1
+        raise KeyError("bug")
+
+    wf = Workflow().use(broken, retry=RetryPolicy(attempts=5, base_delay=0.001, retry_on=(ConnectionError,)))
+    with pytest.raises(KeyError):
+        await wf.run(ExecContext())
+    assert calls == 1
+
+    async def deliberate(ctx):
+        nonlocal calls
+        calls += 1
+        raise WorkflowAbortException("policy says no")
+
+    calls = 0
+    with pytest.raises(WorkflowAbortException):
+        await Workflow().use(deliberate, retry=RetryPolicy(base_delay=0.001)).run(ExecContext())
+    assert calls == 1
+
+
+def test_retry_backoff_is_bounded():
+    policy = RetryPolicy(base_delay=1, max_delay=4, jitter=False)
+    assert [policy.delay(n) for n in range(4)] == [1, 2, 4, 4]
+    assert all(0 <= RetryPolicy(base_delay=1).delay(3) <= 5 for _ in range(20))
+
+
+# =========================
+# CIRCUIT BREAKER
+# =========================
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_fails_fast():
+    calls = 0
+
+    async def down(ctx):
+        nonlocal calls
+        calls += 1
+        raise ConnectionError("down")
+
+    wf = Workflow().use(down, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await wf.run(ExecContext())
+
+    with pytest.raises(CircuitOpenException):
+        await wf.run(ExecContext())
+
+    assert calls == 2
+    info = wf.breaker_info()["down"]
+    assert info["state"] == "open"
+    assert info["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_routes_to_fallback_and_recovers():
+    healthy = False
+
+    async def backend(ctx):
+        if not healthy:
+            raise ConnectionError("down")
+        ctx.data = "live"
+        return ctx
+
+    def fallback(ctx):
+        ctx.data = "degraded"
+        return ctx
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.02)
+    wf = Workflow().use(backend, breaker=breaker, on_open=fallback)
+
+    with pytest.raises(ConnectionError):
+        await wf.run(ExecContext())
+    assert (await wf.run(ExecContext())).data == "degraded"
+
+    healthy = True
+    await asyncio.sleep(0.03)
+    assert breaker.state == "half_open"
+    assert (await wf.run(ExecContext())).data == "live"
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_frees_half_open_slot():
+    async def hang(ctx):
+        await asyncio.sleep(10)
+        return ctx
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.02)
+    breaker.record_failure()
+    await asyncio.sleep(0.03)
+
+    trial = asyncio.ensure_future(Workflow().use(hang, breaker=breaker).run(ExecContext()))
+    await asyncio.sleep(0.01)
+    assert not breaker.allow()
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_stale_half_open_trial_expires():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.02)
+    breaker.record_failure()
+    await asyncio.sleep(0.03)
+
+    # A trial that never reports back
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    await asyncio.sleep(0.03)
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_breaker_is_shared_by_name_and_across_concurrent_runs():
+    async def down(ctx):
+        await asyncio.sleep(0.01)
+        raise ConnectionError("down")
+
+    wf = Workflow()
+    wf.use(down, name="llm", breaker=CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    wf.use(down, name="llm", breaker=True)
+
+    results = await asyncio.gather(*(wf.run(ExecContext()) for _ in range(5)), return_exceptions=True)
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+    with pytest.raises(CircuitOpenException):
+        await wf.run(ExecContext())
+    assert list(wf.breaker_info()) == ["llm"]
@@ -0,0 +1,189 @@
+import pytest
+import asyncio
+from yaafpy.sequential_flows import Workflow
+from yaafpy.stream_flows import StreamWorkflow
+from yaafpy.decorators import middleware
+from yaafpy.resources import ResourcePool
+from yaafpy.tracing import Tracer
+from yaafpy.types import ExecContext, WorkflowTimeoutException
+
+
+class Client:
+    created = 0
+
+    def __init__(self):
+        Client.created += 1
+        self.id = Client.created
+        self.closed = False
+        self.calls = 0
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def reset_clients():
+    Client.created = 0
+
+
+async def query(ctx):
+    client = ctx.shared_data["service"]["db"]
+    client.calls += 1
+    await asyncio.sleep(0.01)
+    ctx.data = client.id
+    return ctx
+
+
+async def source(n=3):
+    for i in range(n):
+        yield i
+
+
+# =========================
+# POOL
+# =========================
+
+@pytest.mark.asyncio
+async def test_pool_reuses_instances_up_to_size():
+    pool = ResourcePool("db", Client, size=2)
+    wf = Workflow(resources=[pool]).use(query, resources=["db"])
+
+    async for result in wf.run_many((ExecContext() for _ in range(10)), max_concurrency=5):
+        assert result.ok and "service" not in result.ctx.shared_data
+
+    info = wf.resource_info()["db"]
+    assert Client.created == 2
+    assert info["checkouts"] == 10 and info["in_use"] == 0 and info["idle"] == 2
+    assert info["peak_in_use"] == 2 and info["waits"] > 0
+
+
+@pytest.mark.asyncio
+async def test_warmup_and_deterministic_close():
+    clients = []
+
+    async def factory():
+        clients.append(Client())
+        return clients[-1]
+
+    async with Workflow(resources=[ResourcePool("db", factory, size=3)]).use(query, resources=["db"]) as wf:
+        await wf.warmup()
+        assert len(clients) == 3
+        await wf.run(ExecContext())
+        assert len(clients) == 3
+
+    assert all(client.closed for client in clients)
+    with pytest.raises(RuntimeError):
+        await wf.run(ExecContext())
+
+
+@pytest.mark.asyncio
+async def test_instance_in_use_closes_on_release():
+    closed = []
+    pool = ResourcePool("db", Client, close=lambda client: closed.append(client.id))
+    wf = Workflow(resources=[pool])
+
+    async def close_mid_step(ctx):
+        await wf.aclose()
+        assert closed == []
+        return ctx
+
+    await wf.use(close_mid_step, resources=["db"]).run(ExecContext())
+    assert closed == [1]
+
+
+@pytest.mark.asyncio
+async def test_checkout_timeout_and_factory_failure():
+    pool = ResourcePool("db", Client, timeout=0.02)
+    async with pool.checkout():
+        with pytest.raises(WorkflowTimeoutException):
+            await pool.acquire()
+    assert pool.info()["in_use"] == 0
+
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("down")
+        return Client()
+
+    wf = Workflow(resources=[ResourcePool("db", flaky)]).use(query, resources=["db"])
+    results = [r async for r in wf.run_many((ExecContext() for _ in range(3)), max_concurrency=3)]
+
+    assert [r.ok for r in results].count(True) == 2
+    assert wf.resource_info()["db"]["created"] == 1
+
+
+def test_unknown_resource_is_rejected():
+    with pytest.raises(KeyError):
+        Workflow().use(query, resources=["db"])
+    with pytest.raises(ValueError):
+        Workflow(resources=[ResourcePool("db", Client), ResourcePool("db", Client)])
+
+
+# =========================
+# INJECTION
+# =========================
+
+@pytest.mark.asyncio
+async def test_injection_with_middleware_decorator_and_existing_services():
+    @middleware
+    def step(ctx):
+        ctx.data = sorted(ctx.shared_data["service"])
+        return ctx
+
+    wf = Workflow(resources=[ResourcePool("db", Client)]).use(step, resources=["db"])
+    ctx = await wf.run(ExecContext(shared_data={"service": {"cache": "local"}}))
+
+    assert ctx.data == ["cache", "db"]
+    assert ctx.shared_data == {"service": {"cache": "local"}}
+
+
+@pytest.mark.asyncio
+async def test_stream_checks_out_once_per_run():
+    pool = ResourcePool("db", Client)
+
+    async def save(item, ctx):
+        client = ctx.shared_data["service"]["db"]
+        client.calls += 1
+        return (client.id, item)
+
+    def tag(item, ctx):
+        return ctx.shared_data["service"]["db"].id, item
+
+    async with StreamWorkflow(resources=[pool]).use(save, resources=["db"]).use(tag, resources=["db"]) as wf:
+        first = [item async for item in wf.run(source())]
+        second = [item async for item in wf.run(source())]
+
+        assert first == second == [(1, (1, i)) for i in range(3)]
+        assert wf.resource_info()["db"]["checkouts"] == 2
+        assert wf.resource_info()["db"]["in_use"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_releases_checkout_when_setup_fails():
+    class BrokenTracer(Tracer):
+        def start_span(self, *args, **kwargs):
+            raise RuntimeError("exporter down")
+
+    closed = False
+
+    async def items():
+        nonlocal closed
+        try:
+            yield 1
+        finally:
+            closed = True
+
+    def tag(item, ctx):
+        return item
+
+    pool = ResourcePool("db", Client)
+    started = items()
+    await started.__anext__()
+    async with StreamWorkflow(tracer=BrokenTracer(), resources=[pool]).use(tag, resources=["db"]) as wf:
+        with pytest.raises(RuntimeError, match="exporter down"):
+            [item async for item in wf.run(started)]
+
+        assert wf.resource_info()["db"]["in_use"] == 0
+        assert closed is True
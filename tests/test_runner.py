@@ -0,0 +1,82 @@
+import pytest
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from yaafpy.sequential_flows import Workflow
+from yaafpy.runner import SyncRunner
+from yaafpy.types import ExecContext, WorkflowAbortException, WorkflowTimeoutException
+
+
+async def record_loop(ctx):
+    await asyncio.sleep(0.01)
+    ctx.data = id(asyncio.get_running_loop())
+    return ctx
+
+
+# =========================
+# RUN SYNC
+# =========================
+
+def test_run_sync_reuses_one_loop():
+    wf = Workflow().use(record_loop)
+
+    with SyncRunner() as runner:
+        loops = {wf.run_sync(ExecContext(), runner=runner).data for _ in range(3)}
+
+    assert len(loops) == 1
+
+
+def test_run_sync_from_many_threads():
+    wf = Workflow().use(record_loop)
+
+    with SyncRunner() as runner, ThreadPoolExecutor(8) as callers:
+        results = list(callers.map(lambda _: wf.run_sync(runner=runner), range(16)))
+
+    assert len({ctx.data for ctx in results}) == 1
+
+
+def test_run_sync_default_runner_and_errors():
+    async def fail(ctx):
+        raise WorkflowAbortException("no")
+
+    assert Workflow().use(record_loop).run_sync().data is not None
+    with pytest.raises(WorkflowAbortException):
+        Workflow().use(fail).run_sync()
+
+
+def test_run_sync_keeps_loop_bound_state_warm():
+    # Batches form across calls submitted by different threads
+    sizes = []
+
+    async def batch(ctxs):
+        sizes.append(len(ctxs))
+
+    wf = Workflow().use_batched(batch, max_batch_size=4, max_wait_ms=50)
+    with SyncRunner() as runner, ThreadPoolExecutor(4) as callers:
+        list(callers.map(lambda _: wf.run_sync(runner=runner), range(4)))
+
+    assert sizes == [4]
+
+
+def test_run_sync_timeout_cancels_run():
+    cancelled = threading.Event()
+
+    async def hang(ctx):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with SyncRunner() as runner:
+        with pytest.raises(WorkflowTimeoutException):
+            Workflow().use(hang).run_sync(timeout=0.05, runner=runner)
+        assert cancelled.wait(1)
+
+
+def test_closed_runner_rejects_work():
+    runner = SyncRunner()
+    runner.close()
+
+    with pytest.raises(RuntimeError):
+        Workflow().use(record_loop).run_sync(runner=runner)
@@ -302,6 +302,107 @@ async def test_parallel_runs():
 
     assert all(r.data == 2 for r in results)
 
+# =========================
+# Batch Execution (run_many)
+# =========================
+
+@pytest.mark.asyncio
+async def test_run_many_ordered_results_and_error_isolation():
+    wf = Workflow()
+
+    async def mw(ctx):
+        await asyncio.sleep(0.01 * (3 - ctx.data))
+        if ctx.data == 1:
+            raise WorkflowAbortException("bad item")
+        ctx.data *= 10
+        return ctx
+
+    wf.use(mw)
+
+    results = [r async for r in wf.run_many(ExecContext(data=i) for i in range(3))]
+
+    assert [r.index for r in results] == [0, 1, 2]
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[1].aborted is True
+    assert results[1].ctx.stop is True
+    assert results[0].ctx.data == 0
+    assert results[2].ctx.data == 20
+
+
+@pytest.mark.asyncio
+async def test_run_many_abort_after_context_replaced_marks_submitted_stop():
+    def replace(ctx):
+        return ExecContext(data="replacement")
+
+    def abort(ctx):
+        raise WorkflowAbortException("bad item")
+
+    def fail(ctx):
+        raise ValueError("boom")
+
+    submitted = ExecContext(data=1)
+    [aborted] = [r async for r in Workflow().use(replace).use(abort).run_many([submitted])]
+
+    assert aborted.ok is False and aborted.aborted is True
+    assert aborted.ctx is submitted
+    assert aborted.ctx.stop is True
+
+    [failed] = [r async for r in Workflow().use(replace).use(fail).run_many([ExecContext(data=1)])]
+    assert failed.aborted is False
+    assert isinstance(failed.error, ValueError)
+
+
+@pytest.mark.asyncio
+async def test_run_many_unordered_respects_concurrency_cap():
+    wf = Workflow()
+    in_flight = 0
+    peak = 0
+
+    async def mw(ctx):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001 * (ctx.data % 3))
+        in_flight -= 1
+        return ctx
+
+    wf.use(mw)
+
+    async def contexts():
+        for i in range(50):
+            yield ExecContext(data=i)
+
+    results = [r async for r in wf.run_many(contexts(), max_concurrency=4, ordered=False)]
+
+    assert sorted(r.index for r in results) == list(range(50))
+    assert all(r.ok for r in results)
+    assert peak <= 4
+
+
+@pytest.mark.asyncio
+async def test_run_many_early_break_cancels_pending():
+    wf = Workflow()
+    cancelled = 0
+
+    async def mw(ctx):
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(0 if ctx.data == 0 else 10)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+        return ctx
+
+    wf.use(mw)
+
+    results = wf.run_many((ExecContext(data=i) for i in range(5)), max_concurrency=3, ordered=False)
+    async for result in results:
+        assert result.index == 0
+        break
+    await results.aclose()
+
+    assert cancelled == 2
+
 # =========================
 # Jump to Non-Existing Middleware
 # =========================
@@ -345,6 +446,60 @@ async def test_memory_stability():
     # Adjust threshold as needed
     assert peak < 10_000_000  # 10MB
 
+
+def _bytes_per(make, n=2000):
+    keep = []
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(n):
+        keep.append(make())
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / n
+
+
+async def _bytes_per_run(wf, make, n=1000):
+    # Footprint of one in-flight run: n concurrent runs, peak divided by n
+    contexts = [make() for _ in range(n)]
+    tracemalloc.start()
+    await asyncio.gather(*(wf.run(ctx) for ctx in contexts))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / n
+
+
+@pytest.mark.asyncio
+async def test_memory_per_context_and_run():
+    from yaafpy.types import CompactExecContext
+    from yaafpy.pool import ContextPool
+
+    wf = Workflow()
+
+    async def mw(ctx):
+        ctx.shared_data["seen"] = True
+        return ctx
+
+    wf.use(mw)
+    await wf.run(ExecContext())  # compile outside the measurement
+
+    per_ctx = _bytes_per(ExecContext)
+    per_compact = _bytes_per(CompactExecContext)
+
+    per_run = await _bytes_per_run(wf, ExecContext)
+    per_run_compact = await _bytes_per_run(wf, CompactExecContext)
+
+    print(
+        f"\nExecContext {per_ctx:.0f} B/ctx, {per_run:.0f} B/run | "
+        f"CompactExecContext {per_compact:.0f} B/ctx, {per_run_compact:.0f} B/run"
+    )
+    assert per_compact < per_ctx
+
+    # Sequential callers recycling through a pool allocate a single context
+    pool = ContextPool()
+    for _ in range(100):
+        pool.release(await wf.run(pool.acquire()))
+    assert pool.info()["created"] == 1
+
 # =========================
 # Performance Tests
 # =========================
@@ -3,8 +3,8 @@ import asyncio
 from typing import AsyncGenerator
 import inspect
 from yaafpy.stream_flows import StreamWorkflow
-from yaafpy.types import ExecContext, WorkflowAbortException
-from yaafpy.decorators import handler_to_transform, stream_transform
+from yaafpy.types import ExecContext, WorkflowAbortException, WorkflowTimeoutException
+from yaafpy.decorators import handler_to_transform, stream_transform, vectorized
 from functools import wraps
 import logging
 
@@ -287,6 +287,80 @@ async def test_run_with_explicit_context():
     assert ctx.data == "updated"
 
 
+# ==========================================================
+# Deadline
+# ==========================================================
+
+@pytest.mark.asyncio
+async def test_deadline_raises_and_closes_source():
+    closed = False
+
+    async def source():
+        nonlocal closed
+        try:
+            for i in range(10):
+                await asyncio.sleep(0.02)
+                yield i
+        finally:
+            closed = True
+
+    wf = StreamWorkflow()
+    wf.use(lambda item, ctx: item)
+
+    ctx = ExecContext().set_timeout(0.05)
+    result = []
+    with pytest.raises(WorkflowTimeoutException):
+        async for item in wf.run(source(), ctx):
+            result.append(item)
+
+    assert 0 < len(result) < 10
+    assert ctx.stop is True
+    assert closed is True
+
+
+@pytest.mark.asyncio
+async def test_deadline_does_not_spawn_a_task_per_item():
+    async def source():
+        for i in range(50):
+            yield i
+
+    wf = StreamWorkflow()
+    wf.use(lambda item, ctx: item)
+
+    created = []
+    loop = asyncio.get_running_loop()
+
+    def factory(loop, coro, **kwargs):
+        created.append(coro)
+        return asyncio.Task(coro, loop=loop, **kwargs)
+
+    loop.set_task_factory(factory)
+    try:
+        result = await collect(wf.run(source(), ExecContext().set_timeout(10)))
+    finally:
+        loop.set_task_factory(None)
+
+    assert result == list(range(50))
+    assert created == []
+
+
+@pytest.mark.asyncio
+async def test_deadline_passed_while_consumer_holds_an_item():
+    wf = StreamWorkflow()
+    wf.use(lambda item, ctx: item)
+
+    async def source():
+        for i in range(10):
+            yield i
+
+    stream = wf.run(source(), ExecContext().set_timeout(0.02))
+    assert await stream.__anext__() == 0
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(WorkflowTimeoutException):
+        await stream.__anext__()
+
+
 # ==========================================================
 # Empty stream behavior
 # ==========================================================
@@ -611,6 +685,410 @@ async def test_stop_closes_upstream():
     assert closed is True
 
 
+# ==========================================================
+# Handler fusion
+# ==========================================================
+
+def build_mixed(fuse):
+    async def double(item, ctx):
+        return item * 2
+
+    def inc(item, ctx):
+        return item + 1
+
+    async def split(item, ctx):
+        yield item
+        yield -item
+
+    async def passthrough(source, ctx):
+        async for item in source:
+            yield item
+
+    return StreamWorkflow(fuse=fuse).use(double).use(split).use(inc).use(passthrough).use(inc)
+
+
+@pytest.mark.asyncio
+async def test_fused_handlers_match_unfused():
+    fused = await collect(build_mixed(True).run(async_source()))
+    unfused = await collect(build_mixed(False).run(async_source()))
+
+    assert fused == unfused == [2, 2, 4, 0, 6, -2]
+
+
+@pytest.mark.asyncio
+async def test_fused_stop_between_handlers_closes_upstream():
+    closed = False
+    seen = []
+
+    async def source():
+        nonlocal closed
+        try:
+            for i in range(10):
+                yield i
+        finally:
+            closed = True
+
+    def stop_at_two(item, ctx):
+        if item == 2:
+            ctx.stop = True
+        return item
+
+    def record(item, ctx):
+        seen.append(item)
+        return item
+
+    result = await collect(StreamWorkflow().use(stop_at_two).use(record).run(source()))
+
+    assert result == seen == [0, 1]
+    assert closed is True
+
+
+@pytest.mark.asyncio
+async def test_fused_abort_closes_upstream():
+    closed = False
+
+    async def source():
+        nonlocal closed
+        try:
+            for i in range(10):
+                yield i
+        finally:
+            closed = True
+
+    def fail_at_one(item, ctx):
+        if item == 1:
+            raise WorkflowAbortException("stop")
+        return item
+
+    result = await collect(StreamWorkflow().use(lambda item, ctx: item).use(fail_at_one).run(source()))
+
+    assert result == [0]
+    assert closed is True
+
+
+@pytest.mark.asyncio
+async def test_stages_classified_once_and_template_rebuilt_on_use(monkeypatch):
+    wf = build_mixed(True)
+    await collect(wf.run(async_source()))
+
+    def fail(self, fn):
+        raise AssertionError("classified again")
+
+    monkeypatch.setattr(StreamWorkflow, "_is_transform", fail)
+    assert await collect(wf.run(async_source(1))) == [2, 2]
+
+    monkeypatch.undo()
+    wf.use(lambda item, ctx: item * 10)
+    assert await collect(wf.run(async_source(1))) == [20, 20]
+
+
+# ==========================================================
+# Concurrent stages
+# ==========================================================
+
+@pytest.mark.asyncio
+async def test_concurrent_stage_overlaps_and_keeps_order():
+    active = peak = 0
+
+    async def fetch(item, ctx):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01 * (5 - item % 5))
+        active -= 1
+        return item * 10
+
+    wf = StreamWorkflow().use(fetch, concurrency=4).use(lambda item, ctx: item + 1)
+    result = await collect(wf.run(async_source(10)))
+
+    assert result == [i * 10 + 1 for i in range(10)]
+    assert peak == 4
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stage_unordered_emits_on_completion():
+    async def fetch(item, ctx):
+        await asyncio.sleep(0.01 * (3 - item))
+        return item
+
+    async def fan_out(item, ctx):
+        yield item
+        yield item
+
+    wf = StreamWorkflow().use(fetch, concurrency=3, ordered=False).use(fan_out, concurrency=2)
+    assert await collect(wf.run(async_source(3))) == [2, 2, 1, 1, 0, 0]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_abort_cancels_in_flight_and_closes_upstream():
+    closed = False
+    cancelled = []
+
+    async def source():
+        nonlocal closed
+        try:
+            for i in range(10):
+                yield i
+        finally:
+            closed = True
+
+    async def fetch(item, ctx):
+        if item == 2:
+            raise WorkflowAbortException("bad item")
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+        return item
+
+    result = await collect(StreamWorkflow().use(fetch, concurrency=3).run(source()))
+
+    assert result == []
+    assert sorted(cancelled) == [0, 1]
+    assert closed is True
+
+
+@pytest.mark.asyncio
+async def test_concurrent_stop_stops_pulling():
+    pulled = []
+
+    async def source():
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    async def fetch(item, ctx):
+        await asyncio.sleep(0.001)
+        if item == 3:
+            ctx.stop = True
+        return item
+
+    result = await collect(StreamWorkflow().use(fetch, concurrency=2).run(source()))
+
+    assert result == [0, 1, 2, 3]
+    assert len(pulled) <= 6
+
+
+@pytest.mark.asyncio
+async def test_consumer_close_cancels_in_flight_handlers():
+    cancelled = []
+
+    async def fetch(item, ctx):
+        try:
+            await asyncio.sleep(0.005 if item == 0 else 1)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+        return item
+
+    before = asyncio.all_tasks()
+    stream = StreamWorkflow().use(fetch, concurrency=4).run(async_source(10))
+    assert await stream.__anext__() == 0
+    await stream.aclose()
+
+    assert sorted(cancelled) == [1, 2, 3]
+    assert asyncio.all_tasks() == before
+
+
+def test_concurrency_needs_item_handler():
+    async def transform(source, ctx):
+        async for item in source:
+            yield item
+
+    with pytest.raises(ValueError):
+        StreamWorkflow().use(transform, concurrency=2)
+    with pytest.raises(ValueError):
+        StreamWorkflow().use(lambda item, ctx: item, concurrency=0)
+
+
+# ==========================================================
+# Buffered stage boundaries
+# ==========================================================
+
+def closing_source(n, state):
+    async def source():
+        try:
+            for i in range(n):
+                state["produced"] = i + 1
+                yield i
+        finally:
+            state["closed"] = True
+    return source()
+
+
+@pytest.mark.asyncio
+async def test_buffer_overlaps_producer_and_consumer():
+    async def slow_source():
+        for i in range(10):
+            await asyncio.sleep(0.01)
+            yield i
+
+    async def slow_handler(item, ctx):
+        await asyncio.sleep(0.01)
+        return item
+
+    wf = StreamWorkflow().use(slow_handler, buffer=4)
+    started = asyncio.get_running_loop().time()
+    result = await collect(wf.run(slow_source()))
+    elapsed = asyncio.get_running_loop().time() - started
+
+    assert result == list(range(10))
+    assert elapsed < 0.17
+
+
+@pytest.mark.asyncio
+async def test_buffer_applies_backpressure():
+    state = {}
+    wf = StreamWorkflow().use(lambda item, ctx: item, buffer=2)
+    stream = wf.run(closing_source(100, state))
+
+    assert await stream.__anext__() == 0
+    await asyncio.sleep(0.01)
+    assert state["produced"] <= 4
+
+    await stream.aclose()
+    assert state["closed"] is True
+
+
+@pytest.mark.asyncio
+async def test_buffered_stream_closes_upstream():
+    state = {}
+    await collect(StreamWorkflow().use(lambda item, ctx: item, buffer=1).run(closing_source(2, state)))
+    assert state["closed"] is True
+
+    def stopper(item, ctx):
+        ctx.stop = True
+        return item
+
+    state = {}
+    result = await collect(StreamWorkflow().use(stopper, buffer=1).run(closing_source(10, state)))
+    assert result == [0]
+    assert state["closed"] is True
+
+
+@pytest.mark.asyncio
+async def test_early_close_stops_pump_and_awaiting_source():
+    state = {}
+
+    async def source():
+        try:
+            for i in range(100):
+                await asyncio.sleep(0.001)
+                yield i
+        finally:
+            state["closed"] = True
+
+    before = asyncio.all_tasks()
+    stream = StreamWorkflow().use(lambda item, ctx: item, buffer=2).run(source())
+    async for item in stream:
+        break
+    await stream.aclose()
+
+    assert state["closed"] is True
+    assert asyncio.all_tasks() == before
+
+
+@pytest.mark.asyncio
+async def test_buffered_upstream_errors_surface_downstream():
+    def fail_at_two(item, ctx):
+        if item == 2:
+            raise WorkflowAbortException("bad")
+        return item
+
+    wf = StreamWorkflow().use(fail_at_two).use(lambda item, ctx: item, buffer=8)
+    assert await collect(wf.run(async_source(5))) == [0, 1]
+
+    async def broken():
+        yield 1
+        raise ValueError("source failed")
+
+    with pytest.raises(ValueError):
+        await collect(StreamWorkflow().use(lambda item, ctx: item, buffer=2).run(broken()))
+
+    with pytest.raises(ValueError):
+        StreamWorkflow().use(lambda item, ctx: item, buffer=-1)
+
+
+# ==========================================================
+# Vectorized handlers
+# ==========================================================
+
+@pytest.mark.asyncio
+async def test_vectorized_handlers_mix_with_item_handlers():
+    sizes = []
+
+    @vectorized
+    def scale(batch, ctx):
+        sizes.append(len(batch))
+        return [x * 10 for x in batch]
+
+    @vectorized
+    async def drop_odd(batch, ctx):
+        return [x for x in batch if x % 20 == 0]
+
+    wf = StreamWorkflow(batch_size=4).use(lambda item, ctx: item + 1).use(scale).use(drop_odd).use(lambda item, ctx: -item)
+
+    assert await collect(wf.run(async_source(10))) == [-20, -40, -60, -80, -100]
+    assert sizes == [4, 4, 2]
+
+
+@pytest.mark.asyncio
+async def test_vectorized_stop_and_close():
+    closed = False
+
+    async def source():
+        nonlocal closed
+        try:
+            for i in range(100):
+                yield i
+        finally:
+            closed = True
+
+    def stop_at_five(item, ctx):
+        if item == 5:
+            ctx.stop = True
+        return item
+
+    wf = StreamWorkflow(batch_size=4).use(lambda batch, ctx: batch, vectorized=True).use(stop_at_five)
+
+    assert await collect(wf.run(source())) == [0, 1, 2, 3, 4, 5]
+    assert closed is True
+
+
+@pytest.mark.asyncio
+async def test_vectorized_numpy_batches():
+    np = pytest.importorskip("numpy")
+
+    @vectorized
+    def normalize(batch, ctx):
+        assert isinstance(batch, np.ndarray)
+        return batch / np.linalg.norm(batch, axis=1, keepdims=True)
+
+    async def vectors():
+        for i in range(5):
+            yield [3.0 * (i + 1), 4.0 * (i + 1)]
+
+    wf = StreamWorkflow(batch_size=2, batch_format="numpy").use(normalize)
+    rows = await collect(wf.run(vectors()))
+
+    assert len(rows) == 5
+    assert all(np.allclose(row, [0.6, 0.8]) for row in rows)
+
+
+def test_vectorized_options_are_validated():
+    async def transform(source, ctx):
+        async for item in source:
+            yield item
+
+    with pytest.raises(ValueError):
+        StreamWorkflow().use(transform, vectorized=True)
+    with pytest.raises(ValueError):
+        StreamWorkflow().use(lambda batch, ctx: batch, vectorized=True, concurrency=2)
+    with pytest.raises(ValueError):
+        StreamWorkflow(batch_format="tensor")
+
+
 # ==========================================================
 # Decorator compatibility — handler_to_transform
 # ==========================================================
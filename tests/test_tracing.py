@@ -0,0 +1,195 @@
+import pytest
+import json
+from yaafpy.sequential_flows import Workflow
+from yaafpy.stream_flows import StreamWorkflow
+from yaafpy.adapters import as_middleware
+from yaafpy.tracing import Tracer, SpanExporter, RingBufferExporter, JsonlFileExporter, current_span
+from yaafpy.types import ExecContext, WorkflowAbortException
+from helpers import mark
+
+
+def by_name(spans):
+    return {span.name: span for span in spans}
+
+
+async def source(n=3):
+    for i in range(n):
+        yield i
+
+
+# =========================
+# SEQUENTIAL WORKFLOWS
+# =========================
+
+@pytest.mark.asyncio
+async def test_run_and_step_spans():
+    exporter = RingBufferExporter()
+    wf = Workflow(tracer=Tracer(exporter)).use(mark("a")).use(mark("b"))
+
+    await wf.run(ExecContext())
+
+    spans = by_name(exporter.spans())
+    run = spans["Workflow"]
+    assert run.kind == "run" and run.parent is None
+    assert spans["a"].parent is run and spans["b"].parent is run
+    assert spans["a"].trace_id == run.trace_id
+    assert run.duration >= spans["a"].duration
+    assert current_span() is None
+
+
+@pytest.mark.asyncio
+async def test_nested_workflow_joins_parent_trace():
+    exporter = RingBufferExporter()
+    child = Workflow().use(mark("inner"))
+    parent = Workflow(tracer=Tracer(exporter)).use(as_middleware(child), name="call_child").use(mark("outer"))
+
+    await parent.run(ExecContext())
+
+    spans = exporter.spans()
+    step = next(s for s in spans if s.name == "call_child")
+    nested = next(s for s in spans if s.kind == "workflow")
+    child_run = next(s for s in spans if s.kind == "run" and s.parent is nested)
+    inner = next(s for s in spans if s.name == "inner")
+
+    assert nested.parent is step
+    assert inner.parent is child_run
+    assert len({s.trace_id for s in spans}) == 1
+
+
+@pytest.mark.asyncio
+async def test_inlined_children_are_nested_inside_a_trace():
+    exporter = RingBufferExporter()
+    child = Workflow().use(mark("inner"))
+    middle = Workflow().use(as_middleware(child), name="call_child")
+    outer = Workflow(tracer=Tracer(exporter)).use(as_middleware(middle, inline=False), name="call_middle")
+
+    # Untraced, the child is inlined into the middle workflow
+    assert middle.compile().names == ("call_child.inner",)
+    await outer.run(ExecContext())
+
+    spans = exporter.spans()
+    inner = next(s for s in spans if s.name == "inner")
+    assert inner.parent.kind == "run" and inner.parent.parent.kind == "workflow"
+    assert inner.parent.parent.parent.name == "call_child"
+
+
+@pytest.mark.asyncio
+async def test_failed_step_marks_spans():
+    exporter = RingBufferExporter()
+
+    async def boom(ctx):
+        raise WorkflowAbortException("no")
+
+    wf = Workflow(tracer=Tracer(exporter)).use(boom)
+
+    with pytest.raises(WorkflowAbortException):
+        await wf.run(ExecContext())
+
+    spans = by_name(exporter.spans())
+    assert spans["boom"].status == "abort"
+    assert spans["Workflow"].status == "error"
+    assert "no" in spans["Workflow"].error
+
+
+@pytest.mark.asyncio
+async def test_unsampled_traces_record_nothing():
+    exporter = RingBufferExporter()
+    child = Workflow(tracer=Tracer(exporter)).use(mark("inner"))
+    wf = Workflow(tracer=Tracer(exporter, sample_rate=0.0)).use(as_middleware(child))
+
+    await wf.run(ExecContext())
+
+    assert exporter.spans() == []
+
+
+@pytest.mark.asyncio
+async def test_span_budget_drops_extra_spans():
+    exporter = RingBufferExporter()
+    wf = Workflow(tracer=Tracer(exporter, max_spans_per_trace=3))
+    for i in range(5):
+        wf.use(mark(f"s{i}"))
+
+    ctx = await wf.run(ExecContext())
+
+    assert ctx.shared_data["ran"] == ["s0", "s1", "s2", "s3", "s4"]
+    run = by_name(exporter.spans())["Workflow"]
+    assert len(exporter.spans()) == 3
+    assert run.attributes["dropped_spans"] == 3
+
+
+# =========================
+# STREAMS
+# =========================
+
+@pytest.mark.asyncio
+async def test_stream_stage_spans():
+    exporter = RingBufferExporter()
+
+    async def double(item, ctx):
+        return item * 2
+
+    def inc(item, ctx):
+        return item + 1
+
+    wf = StreamWorkflow(tracer=Tracer(exporter)).use(double).use(inc)
+
+    out = [item async for item in wf.run(source(), ExecContext())]
+
+    assert out == [1, 3, 5]
+    spans = by_name(exporter.spans())
+    stream = spans["StreamWorkflow"]
+    assert stream.kind == "stream"
+    assert spans["double"].parent is stream
+    assert spans["inc"].attributes["items"] == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_inside_traced_step_joins_trace():
+    exporter = RingBufferExporter()
+    stream = StreamWorkflow().use(lambda item, ctx: item)
+
+    async def consume(ctx):
+        ctx.data = [item async for item in stream.run(source(), ctx)]
+        return ctx
+
+    wf = Workflow(tracer=Tracer(exporter)).use(consume)
+    await wf.run(ExecContext())
+
+    spans = exporter.spans()
+    step = next(s for s in spans if s.name == "consume")
+    assert next(s for s in spans if s.kind == "stream").parent is step
+
+
+# =========================
+# EXPORTERS
+# =========================
+
+@pytest.mark.asyncio
+async def test_jsonl_exporter(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = JsonlFileExporter(path, batch_size=100)
+    wf = Workflow(tracer=Tracer(exporter)).use(mark("a"))
+
+    await wf.run(ExecContext())
+    exporter.close()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r["name"] for r in records] == ["a", "Workflow"]
+    assert records[0]["parent_id"] == records[1]["span_id"]
+
+
+def test_ring_buffer_is_bounded():
+    exporter = RingBufferExporter(capacity=2)
+    tracer = Tracer(exporter)
+    for i in range(5):
+        tracer.start_span(f"s{i}", "run").end()
+
+    assert [s.name for s in exporter.spans()] == ["s3", "s4"]
+
+
+def test_exporter_must_implement_export():
+    class Incomplete(SpanExporter):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()